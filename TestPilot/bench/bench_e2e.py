@@ -0,0 +1,172 @@
+"""
+End-to-end throughput benchmark for TestPilot, run offline against the bundled mock LLM server.
+
+Starts mock_llm.MockLLMServer in-process, points the OpenRouter (or GLM) path at it with the
+base-URL override, and reports latency percentiles and files/sec for:
+  - file:   analyze_path on one file at a time
+  - folder: analyze_path on a synthetic project (--parallel per-file requests)
+  - webui:  POST /analyze then poll /jobs/<id> through Flask's test client (skipped if Flask is missing)
+
+The response cache is disabled for every call, so each run reaches the mock provider.
+Use --json and --min-files-per-sec in CI to record results and fail on throughput regressions.
+
+Usage:
+    python bench/bench_e2e.py [--provider openrouter] [--runs 20] [--files 40] [--latency 0.2]
+                              [--tokens-per-sec 400] [--error-rate 0] [--modes file folder webui]
+                              [--json results.json] [--min-files-per-sec 5]
+"""
+import os
+import io
+import sys
+import json
+import time
+import argparse
+import shutil
+import tempfile
+import contextlib
+
+TESTPILOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, TESTPILOT_DIR)
+
+from mock_llm import MockLLMServer
+
+MODES = ("file", "folder", "webui")
+MODEL_FOR_PROVIDER = {"openrouter": "openai", "glm": "glm"}
+MOCK_KEYS = {"openai": "mock-key", "glm": "mock.key"} # zhipuai expects "<id>.<secret>"
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile."""
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered) + 0.5) - 1))
+    return ordered[index]
+
+
+def make_project(root, count):
+    """Writes `count` small, distinct Python files (distinct so nothing is deduplicated)."""
+    for i in range(count):
+        with open(os.path.join(root, f"module_{i:03}.py"), "w", encoding="utf-8") as f:
+            f.write(f"def handler_{i}(data):\n    value = data.get('key_{i}')\n    return value.strip() + ' done'\n")
+
+
+def bench_file(main, model, files, runs):
+    latencies = []
+    errors = 0
+    for i in range(runs):
+        start = time.perf_counter()
+        response = main.analyze_path(files[i % len(files)], model, MOCK_KEYS, use_cache=False)
+        latencies.append(time.perf_counter() - start)
+        errors += main.is_error_response(response)
+    return latencies, runs, errors
+
+
+def bench_folder(main, model, folder, file_count, runs):
+    latencies = []
+    errors = 0
+    for _ in range(runs):
+        start = time.perf_counter()
+        response = main.analyze_path(folder, model, MOCK_KEYS, is_folder=True, use_cache=False, parallel=True)
+        latencies.append(time.perf_counter() - start)
+        errors += main.is_error_response(response)
+    return latencies, file_count * runs, errors
+
+
+def bench_webui(model, files, runs):
+    import ui_app
+    client = ui_app.app.test_client()
+    latencies = []
+    errors = 0
+    for i in range(runs):
+        start = time.perf_counter()
+        reply = client.post("/analyze", json={"path": files[i % len(files)], "model": model, "no_cache": True})
+        job_url = reply.get_json()["status_url"]
+        while (status := client.get(job_url).get_json()["status"]) not in ("done", "error"):
+            time.sleep(0.005)
+        latencies.append(time.perf_counter() - start)
+        errors += status == "error"
+    return latencies, runs, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline end-to-end TestPilot benchmark against a mock LLM")
+    parser.add_argument("--provider", choices=sorted(MODEL_FOR_PROVIDER), default="openrouter")
+    parser.add_argument("--runs", type=int, default=20, help="Requests per mode (folder mode: whole-folder runs, divided by 5)")
+    parser.add_argument("--files", type=int, default=40, help="Files in the synthetic project")
+    parser.add_argument("--latency", type=float, default=0.2, help="Mock delay before the first token (seconds)")
+    parser.add_argument("--tokens-per-sec", type=float, default=400.0, help="Mock generation rate")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of mock completions failing with 429/500")
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--json", metavar="PATH", help="Also write the results as JSON")
+    parser.add_argument("--min-files-per-sec", type=float, help="Exit with status 1 if any mode is slower than this")
+    args = parser.parse_args()
+
+    server = MockLLMServer(latency=args.latency, tokens_per_sec=args.tokens_per_sec, error_rate=args.error_rate, seed=0).start()
+    workdir = tempfile.mkdtemp(prefix="testpilot-bench-")
+    # Must be set before main is imported: these are read at import time
+    os.environ["TESTPILOT_OPENROUTER_BASE_URL"] = server.url
+    os.environ["TESTPILOT_GLM_BASE_URL"] = server.url
+    # The web UI reads keys via get_api_keys(); with the overrides above they only ever reach the local mock
+    os.environ["OPENAI_API_KEY"] = MOCK_KEYS["openai"]
+    os.environ["GLM_API_KEY"] = MOCK_KEYS["glm"]
+    os.environ["TESTPILOT_CACHE_DIR"] = os.path.join(workdir, "cache")
+    os.environ["TESTPILOT_PREWARM"] = "0"
+    os.environ.setdefault(f"TESTPILOT_RPM_{args.provider.upper()}", "100000") # Measure the engine, not our own rate limit
+
+    os.chdir(TESTPILOT_DIR)
+    import main as engine
+    model = MODEL_FOR_PROVIDER[args.provider]
+    if not (engine.HAS_OPENAI if args.provider == "openrouter" else engine.HAS_GLM):
+        server.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+        sys.exit(f"The {args.provider} SDK is not installed; see requirements.txt")
+
+    project = os.path.join(workdir, "project")
+    os.makedirs(project)
+    make_project(project, args.files)
+    files = sorted(os.path.join(project, name) for name in os.listdir(project))
+
+    results = {}
+    for mode in args.modes:
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                if mode == "file":
+                    latencies, done, errors = bench_file(engine, model, files, args.runs)
+                elif mode == "folder":
+                    latencies, done, errors = bench_folder(engine, model, project, args.files, max(1, args.runs // 5))
+                else:
+                    latencies, done, errors = bench_webui(model, files, args.runs)
+        except ImportError as e:
+            print(f"{mode:<7} skipped ({e})")
+            continue
+        total = sum(latencies)
+        results[mode] = {
+            "runs": len(latencies),
+            "files": done,
+            "failed_runs": errors,
+            "p50_ms": percentile(latencies, 50) * 1000,
+            "p95_ms": percentile(latencies, 95) * 1000,
+            "p99_ms": percentile(latencies, 99) * 1000,
+            "files_per_sec": done / total if total else 0.0,
+        }
+
+    server.stop()
+    shutil.rmtree(workdir, ignore_errors=True)
+    print(f"mock: {server.requests} request(s), {server.errors} injected error(s), latency {args.latency}s, {args.tokens_per_sec:g} tok/s")
+    print(f"{'mode':<7} {'runs':>5} {'failed':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'files/s':>9}")
+    for mode, r in results.items():
+        print(f"{mode:<7} {r['runs']:>5} {r['failed_runs']:>7} {r['p50_ms']:>9.1f} {r['p95_ms']:>9.1f} {r['p99_ms']:>9.1f} {r['files_per_sec']:>9.2f}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"provider": args.provider, "mock": {"latency": args.latency, "tokens_per_sec": args.tokens_per_sec,
+                       "error_rate": args.error_rate}, "results": results}, f, indent=2)
+
+    if args.min_files_per_sec is not None:
+        slow = [mode for mode, r in results.items() if r["files_per_sec"] < args.min_files_per_sec or r["failed_runs"] == r["runs"]]
+        if slow:
+            print(f"[FAIL] Below {args.min_files_per_sec} files/s: {', '.join(slow)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
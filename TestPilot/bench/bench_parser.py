@@ -0,0 +1,148 @@
+"""
+Parser micro-benchmark for TestPilot.
+
+Builds synthetic responses with hundreds of issues and times:
+  - markdown: the single-pass MarkdownParser (response_parser.parse_response)
+  - json:     the same response in JSON output mode (json.loads plus validation)
+  - legacy:   the previous regex cascade (re.split per issue, one re.search per field), for comparison
+  - stream / legacy stream: the same markdown fed in 64-character chunks to the incremental
+    parser, versus the previous approach of re-splitting the whole buffer whenever an issue starts
+
+Usage:
+    python bench/bench_parser.py [--issues 100 500 1000] [--runs 5]
+"""
+import os
+import re
+import sys
+import json
+import argparse
+import statistics
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from response_parser import MarkdownParser, parse_response
+
+STREAM_CHUNK = 64
+
+
+def make_markdown(count):
+    out = ["**Problem Summary:**", f"Synthetic response with {count} issues.", "", "**List of Issues:**"]
+    for i in range(1, count + 1):
+        out.append(f"{i}. **Issue Description**: Value may be None before use on line {i}")
+        out.append("- **Type**: runtime")
+        out.append(f"- **Severity**: {('MAJOR', 'MINOR', 'INFO')[i % 3]} | **Confidence**: {50 + i % 50}%")
+        out.append("- **Root Cause**: The lookup returns None when the key is missing,\n  and the result is used without a check.")
+        out.append("- **Fix**: Check for None before use.")
+        out.append("- **Suggested Fix (Optional)**:\n```python\nif value is None:\n    return default\n```")
+        out.append("")
+    out.append("**Test Case**: call lookup() with a missing key.")
+    return "\n".join(out)
+
+
+def make_json(count):
+    return json.dumps({
+        "summary": f"Synthetic response with {count} issues.",
+        "issues": [{
+            "description": f"Value may be None before use on line {i}",
+            "type": "runtime",
+            "severity": ("MAJOR", "MINOR", "INFO")[i % 3],
+            "confidence": 50 + i % 50,
+            "line": i,
+            "primary_failure": False,
+            "root_cause": "The lookup returns None when the key is missing, and the result is used without a check.",
+            "fix": "Check for None before use.",
+            "suggested_fix_code": "if value is None:\n    return default",
+        } for i in range(1, count + 1)],
+        "test_case": "call lookup() with a missing key.",
+        "notes": "",
+    })
+
+
+def legacy_parse(text):
+    """The regex cascade parse_ai_response used before the single-pass parser."""
+    text = re.sub(r'\x1b\[[0-9;]*m', '', text)
+    summary_match = re.search(r'(?:\*\*Problem Summary:\*\*|Problem Summary)([\s\S]*?)(?=(?:\*\*List of Issues|\*\*Issues|Issues:))', text, re.IGNORECASE)
+    summary = summary_match.group(1).strip() if summary_match else ""
+    issues = []
+    blocks = re.split(r'\d+\.\s+\*\*Issue Description\*\*:', text)
+    if len(blocks) < 2:
+        blocks = re.split(r'\*\*Issue Description\*\*:', text)
+    for block in blocks[1:]:
+        issue = {}
+        m = re.search(r'(.*?)(?=\n\s*- \*\*Type\*\*|\n\s*- \*\*Severity\*\*)', block, re.DOTALL)
+        issue['description'] = m.group(1).strip() if m else "N/A"
+        m = re.search(r'\*\*Type\*\*:\s*(.*)', block)
+        issue['type'] = m.group(1).strip() if m else "Unknown"
+        m = re.search(r'\*\*Severity\*\*:\s*([A-Z]+)', block)
+        issue['severity'] = m.group(1) if m else "INFO"
+        m = re.search(r'\*\*Confidence\*\*:\s*(\d+)%', block)
+        issue['confidence'] = m.group(1) if m else "0"
+        m = re.search(r'\*\*Root Cause\*\*:\s*(.*?)(?=\n\s*- \*\*Fix\*\*)', block, re.DOTALL)
+        issue['root_cause'] = m.group(1).strip() if m else "N/A"
+        m = re.search(r'\*\*Fix\*\*:\s*(.*?)(?=\n\s*- \*\*Suggested Fix)', block, re.DOTALL)
+        issue['fix'] = m.group(1).strip() if m else "N/A"
+        m = re.search(r'\b[Ll]ines?\s+(\d+)', block)
+        issue['line'] = int(m.group(1)) if m else None
+        m = re.search(r'\*\*Suggested Fix \(Optional\)\*\*:(.*)', block, re.DOTALL)
+        if m:
+            issue['suggested_fix_desc'] = m.group(1).strip()
+            code = re.search(r'```(?:\w+)?\n([\s\S]*?)\n```', issue['suggested_fix_desc'])
+            issue['suggested_fix_code'] = code.group(1) if code else None
+        issues.append(issue)
+    return {"summary": summary, "issues": issues}
+
+
+def stream_parse(text):
+    parser = MarkdownParser()
+    pending = ""
+    for i in range(0, len(text), STREAM_CHUNK):
+        pending += text[i:i + STREAM_CHUNK]
+        cut = pending.rfind("\n") + 1
+        if cut:
+            parser.feed(pending[:cut])
+            pending = pending[cut:]
+    return parser.feed(pending).close().issues
+
+
+def legacy_stream_parse(text):
+    buffer = ""
+    emitted = 0
+    for i in range(0, len(text), STREAM_CHUNK):
+        chunk = text[i:i + STREAM_CHUNK]
+        buffer += chunk
+        if "Issue Description" not in buffer[-(len(chunk) + 32):]:
+            continue
+        complete = re.split(r'\d+\.\s+\*\*Issue Description\*\*:', buffer)[1:-1]
+        emitted += len(legacy_parse("".join(f"1. **Issue Description**:{block}" for block in complete[emitted:]))["issues"])
+    return emitted
+
+
+def time_ms(fn, text, runs):
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn(text)
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure TestPilot response parsing time")
+    parser.add_argument("--issues", type=int, nargs="+", default=[100, 500, 1000], help="Issue counts to test")
+    parser.add_argument("--runs", type=int, default=5, help="Timed runs per case (median is reported)")
+    args = parser.parse_args()
+
+    print(f"{'issues':>7} {'KB':>7} {'markdown ms':>12} {'json ms':>8} {'legacy ms':>10} {'stream ms':>10} {'legacy stream ms':>17}")
+    for count in args.issues:
+        markdown = make_markdown(count)
+        as_json = make_json(count)
+        parsed = parse_response(markdown)
+        assert len(parsed["issues"]) == count and len(parse_response(as_json)["issues"]) == count
+        print(f"{count:>7} {len(markdown) / 1024:>7.0f} {time_ms(parse_response, markdown, args.runs):>12.2f} "
+              f"{time_ms(parse_response, as_json, args.runs):>8.2f} {time_ms(legacy_parse, markdown, args.runs):>10.2f} "
+              f"{time_ms(stream_parse, markdown, args.runs):>10.2f} {time_ms(legacy_stream_parse, markdown, args.runs):>17.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Cold-start benchmark for TestPilot.
+
+Each run starts a fresh Python process, so import costs are measured from scratch:
+  - cli:    `python main.py --help` (argument parsing exits before any prompt or network call)
+  - engine: `import main` (what scripts and ui_app.py pay)
+  - webui:  `import ui_app` with provider warm-up disabled (skipped if Flask is missing)
+
+Usage:
+    python bench/bench_startup.py [--runs 10] [--importtime]
+"""
+import os
+import sys
+import argparse
+import statistics
+import subprocess
+import time
+
+TESTPILOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+TARGETS = {
+    "cli": [sys.executable, "main.py", "--help"],
+    "engine": [sys.executable, "-c", "import main"],
+    "webui": [sys.executable, "-c", "import ui_app"],
+}
+
+
+def run_once(cmd, env):
+    start = time.perf_counter()
+    result = subprocess.run(cmd, cwd=TESTPILOT_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    elapsed = time.perf_counter() - start
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else f"exit code {result.returncode}")
+    return elapsed
+
+
+def slowest_imports(cmd, env, top=10):
+    """Runs cmd once under -X importtime and returns the `top` slowest imports (cumulative us, module)."""
+    result = subprocess.run([cmd[0], "-X", "importtime"] + cmd[1:], cwd=TESTPILOT_DIR, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, module = line[len("import time:"):].split("|", 2)
+        rows.append((int(cumulative_us), module.strip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure TestPilot cold-start time")
+    parser.add_argument("--runs", type=int, default=10, help="Fresh processes per target")
+    parser.add_argument("--importtime", action="store_true", help="Also list the slowest imports per target")
+    args = parser.parse_args()
+
+    env = dict(os.environ, TESTPILOT_PREWARM="0", PYTHONDONTWRITEBYTECODE="1")
+
+    print(f"{'target':<8} {'min ms':>8} {'median ms':>10} {'mean ms':>8}")
+    for name, cmd in TARGETS.items():
+        try:
+            run_once(cmd, env) # Warm the OS file cache so runs are comparable
+            times = [run_once(cmd, env) * 1000 for _ in range(args.runs)]
+        except RuntimeError as e:
+            print(f"{name:<8} skipped ({e})")
+            continue
+        print(f"{name:<8} {min(times):>8.1f} {statistics.median(times):>10.1f} {statistics.mean(times):>8.1f}")
+
+        if args.importtime:
+            for cumulative_us, module in slowest_imports(cmd, env):
+                print(f"    {cumulative_us / 1000:>8.1f} ms  {module}")
+
+
+if __name__ == "__main__":
+    main()
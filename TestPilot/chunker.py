@@ -0,0 +1,133 @@
+import re
+
+from response_parser import FILE_HEADER_RE, load_json_response, merge_json_responses
+
+# Rough chars-per-token ratio for code; good enough for budgeting without a tokenizer
+CHARS_PER_TOKEN = 4
+
+# Sections the system prompt asks for after the issue list
+TRAILING_SECTION_RE = re.compile(r'\n\s*(?:#+\s*|\*\*)?(?:Test Case|Bad Practices)', re.IGNORECASE)
+SUMMARY_RE = re.compile(r'(?:\*\*Problem Summary:\*\*|Problem Summary)([\s\S]*?)(?=(?:\*\*List of Issues|\*\*Issues|Issues:))', re.IGNORECASE)
+
+# Label suffix split_oversized gives the parts of a large file
+PART_SUFFIX_RE = re.compile(r' \(part \d+/\d+\)$')
+
+
+def estimate_tokens(text):
+    """Cheap local token estimate."""
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def split_oversized(label, text, budget):
+    """Splits one file's text on line boundaries into parts that fit the budget."""
+    max_chars = budget * CHARS_PER_TOKEN
+    parts = []
+    current = []
+    size = 0
+    for line in text.splitlines(keepends=True):
+        if current and size + len(line) > max_chars:
+            parts.append("".join(current))
+            current = []
+            size = 0
+        current.append(line)
+        size += len(line)
+    if current:
+        parts.append("".join(current))
+    if len(parts) == 1:
+        return [(label, parts[0])]
+    return [(f"{label} (part {i}/{len(parts)})", part) for i, part in enumerate(parts, 1)]
+
+
+def pack_batches(items, budget):
+    """
+    Packs [(label, text), ...] into batches whose estimated size stays under `budget` tokens.
+    Files are kept whole unless a single file exceeds the budget, in which case it is split.
+    Returns a list of batches, each a list of (label, text).
+    """
+    batches = []
+    current = []
+    used = 0
+    for label, text in items:
+        for part_label, part in split_oversized(label, text, budget):
+            tokens = estimate_tokens(part)
+            if current and used + tokens > budget:
+                batches.append(current)
+                current = []
+                used = 0
+            current.append((part_label, part))
+            used += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
+def batch_file(batch):
+    """The one file a batch of (label, text) covers (possibly as several parts), or None for mixed batches."""
+    files = {PART_SUFFIX_RE.sub("", label) for label, _ in batch}
+    return files.pop() if len(files) == 1 else None
+
+
+def _split_issue_blocks(text):
+    blocks = re.split(r'\d+\.\s+\*\*Issue Description\*\*:', text)
+    if len(blocks) < 2:
+        blocks = re.split(r'\*\*Issue Description\*\*:', text)
+    return blocks[1:]
+
+
+def _split_file_sections(response):
+    """[(file or None, text), ...] for one response; "## FILE: <path>" headers attribute what follows them."""
+    parts = FILE_HEADER_RE.split(response)
+    sections = [(None, parts[0])] + [(parts[i].strip(), parts[i + 1]) for i in range(1, len(parts), 2)]
+    return [(file_name, text) for file_name, text in sections if text.strip()]
+
+
+def _merge_markdown(responses):
+    """Merges markdown responses into one Problem Summary and one renumbered issue list."""
+    summaries = []
+    issues = []
+    notes = []
+    for response in responses:
+        match = SUMMARY_RE.search(response)
+        if match and match.group(1).strip():
+            summaries.append(match.group(1).strip())
+
+        blocks = _split_issue_blocks(response)
+        if blocks:
+            # Test Case / Bad Practices follow the last issue; keep them out of its fields
+            tail = TRAILING_SECTION_RE.search(blocks[-1])
+            if tail:
+                notes.append(blocks[-1][tail.start():].strip())
+                blocks[-1] = blocks[-1][:tail.start()]
+        issues.extend(block.strip() for block in blocks)
+
+    out = ["**Problem Summary:**", "\n\n".join(summaries) or "No summary provided.", "", "**List of Issues:**"]
+    for i, block in enumerate(issues, 1):
+        out.append(f"{i}. **Issue Description**: {block}")
+        out.append("")
+    if notes:
+        out.append("\n\n".join(notes))
+    return "\n".join(out).strip() + "\n"
+
+
+def merge_batch_responses(responses):
+    """
+    Merges per-batch AI responses into one markdown document in the layout parse_ai_response expects.
+    Unattributed responses share a single Problem Summary and one renumbered issue list; sections under
+    "## FILE: <path>" headers are merged per file and keep their header, so every issue still carries
+    its file for history and auto-fix lookups.
+    If any response is JSON (JSON output mode), everything is merged into one JSON document instead;
+    parse_response tags the issues of headed sections with their file on the way.
+    """
+    sections = [section for response in responses for section in _split_file_sections(response)]
+    if any(load_json_response(text) is not None for _, text in sections):
+        return merge_json_responses(responses)
+
+    by_file = {}
+    for file_name, text in sections:
+        by_file.setdefault(file_name, []).append(text)
+    out = []
+    if None in by_file or not by_file:
+        out.append(_merge_markdown(by_file.pop(None, [])))
+    for file_name, texts in by_file.items():
+        out.append(f"## FILE: {file_name}\n\n{_merge_markdown(texts)}")
+    return "\n".join(out)
@@ -0,0 +1,87 @@
+from chunker import estimate_tokens
+from response_parser import parse_response
+
+SUMMARY_ISSUES_PER_TURN = 8   # Issues of one reply listed in its summary
+MAX_SUMMARY_LINES = 48        # Oldest summary lines are dropped beyond this
+SNIPPET_CHARS = 120
+
+
+def _clip(text, limit=SNIPPET_CHARS):
+    text = " ".join(text.split())
+    return text if len(text) <= limit else text[:limit - 3] + "..."
+
+
+def summarize_turn(user_text, reply):
+    """A few lines standing in for one exchange once it leaves the verbatim window."""
+    lines = [line for line in user_text.splitlines() if line.strip()]
+    first = _clip(lines[0]) if lines else "(empty)"
+    summary = [f"User sent {len(lines)} line(s), starting: {first}"]
+    issues = parse_response(reply)["issues"]
+    for issue in issues[:SUMMARY_ISSUES_PER_TURN]:
+        where = f" ({issue['file']})" if issue.get("file") else ""
+        summary.append(f"- {issue.get('severity', 'INFO')} {issue.get('type') or 'Issue'}{where}: {_clip(issue.get('description') or '')}")
+    if len(issues) > SUMMARY_ISSUES_PER_TURN:
+        summary.append(f"- ... and {len(issues) - SUMMARY_ISSUES_PER_TURN} more issue(s)")
+    if not issues:
+        summary.append(f"- Reply: {_clip(reply)}")
+    return summary
+
+
+class Conversation:
+    """
+    Bounded history of one interactive session, as chat messages without the system prompt.
+    The latest `max_turns` exchanges (by default just the last one) are kept verbatim; older ones,
+    or any beyond `max_tokens`, are folded into a short summary message. With a larger max_turns
+    the oldest half is folded at once, which keeps the message prefix unchanged between
+    compactions so a provider's prefix cache stays usable for the following turns.
+    """
+
+    def __init__(self, max_turns=1, max_tokens=6000):
+        self.max_turns = max(1, max_turns)
+        self.max_tokens = max_tokens
+        self.turns = []         # [(user text, reply)], oldest first
+        self.summary_lines = []
+        self.summarized = 0     # Turns folded into the summary so far
+
+    def __len__(self):
+        return self.summarized + len(self.turns)
+
+    def messages(self):
+        """The history as [{"role", "content"}, ...], alternating user/assistant and starting with a user turn."""
+        messages = []
+        if self.summary_lines:
+            messages.append({"role": "user", "content": "Summary of our earlier conversation:\n" + "\n".join(self.summary_lines)})
+            messages.append({"role": "assistant", "content": "Understood. I will take it into account."})
+        for user_text, reply in self.turns:
+            messages.append({"role": "user", "content": user_text})
+            messages.append({"role": "assistant", "content": reply})
+        return messages
+
+    def tokens(self):
+        return sum(estimate_tokens(message["content"]) for message in self.messages())
+
+    def add(self, user_text, reply):
+        """Records a finished exchange and compacts the window if it grew too large."""
+        self.turns.append((user_text, reply))
+        if len(self.turns) > self.max_turns or self.tokens() > self.max_tokens:
+            self._compact()
+
+    def _compact(self):
+        # Keep the newest turn verbatim even if it alone is over the budget
+        fold = max(1, len(self.turns) // 2)
+        while fold < len(self.turns) - 1 and self._verbatim_tokens(fold) > self.max_tokens:
+            fold += 1
+        fold = min(fold, len(self.turns) - 1)
+        for user_text, reply in self.turns[:fold]:
+            self.summary_lines.extend(summarize_turn(user_text, reply))
+        self.summary_lines = self.summary_lines[-MAX_SUMMARY_LINES:]
+        self.summarized += fold
+        self.turns = self.turns[fold:]
+
+    def _verbatim_tokens(self, fold):
+        return sum(estimate_tokens(user_text) + estimate_tokens(reply) for user_text, reply in self.turns[fold:])
+
+    def clear(self):
+        self.turns = []
+        self.summary_lines = []
+        self.summarized = 0
@@ -0,0 +1,316 @@
+import re
+import time
+import queue
+import random
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+# Provider errors worth retrying: rate limits, server errors and timeouts
+RETRYABLE_ERROR_RE = re.compile(
+    r'\b(?:429|500|502|503|504)\b|rate.?limit|too many requests|resource.?exhausted|overloaded|timed? ?out|temporarily unavailable',
+    re.IGNORECASE,
+)
+
+
+def is_retryable_error(response):
+    """True if a provider's '[... API ERROR] ...' string describes a transient failure."""
+    if not isinstance(response, str):
+        return False
+    head = response.strip()
+    return head.startswith("[") and "ERROR" in head and bool(RETRYABLE_ERROR_RE.search(head))
+
+
+class TokenBucket:
+    """
+    Requests-per-minute limiter. Holds up to `capacity` tokens, refilled continuously;
+    acquire() blocks until a token is available.
+    """
+
+    def __init__(self, requests_per_minute, capacity=None, clock=time.monotonic, sleep=time.sleep):
+        self.rate = requests_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else max(1, requests_per_minute // 6)
+        self.tokens = float(self.capacity)
+        self._clock = clock
+        self._sleep = sleep
+        self._last = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if self.rate <= 0:
+            return  # Unlimited
+        while True:
+            with self._lock:
+                now = self._clock()
+                self.tokens = min(self.capacity, self.tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            self._sleep(wait)
+
+
+class ProviderGate:
+    """
+    Wraps calls to one provider with a concurrency cap, a requests-per-minute bucket
+    and retries with jittered exponential backoff on transient errors.
+    Safe to share between threads; every analysis for the provider should pass through it.
+    """
+
+    def __init__(self, max_concurrency=4, requests_per_minute=60, max_retries=4,
+                 base_delay=1.0, max_delay=30.0, should_retry=is_retryable_error, sleep=time.sleep):
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.should_retry = should_retry
+        self.bucket = TokenBucket(requests_per_minute, sleep=sleep)
+        self.retries = 0
+        self._sleep = sleep
+        self._semaphore = threading.BoundedSemaphore(max_concurrency)
+        self._lock = threading.Lock()
+
+    def backoff(self, attempt):
+        """Delay before retry number `attempt` (0-based): exponential, capped, with equal jitter."""
+        delay = min(self.max_delay, self.base_delay * (2 ** attempt))
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    def call(self, fn, *args, should_retry=None, **kwargs):
+        """Calls fn(*args, **kwargs) under the gate. `should_retry` overrides the gate's predicate for this call."""
+        should_retry = should_retry or self.should_retry
+        for attempt in range(self.max_retries + 1):
+            with self._semaphore:
+                self.bucket.acquire()
+                result = fn(*args, **kwargs)
+            if attempt == self.max_retries or not should_retry(result):
+                return result
+            with self._lock:
+                self.retries += 1
+            self._sleep(self.backoff(attempt))
+        return result
+
+
+def is_error_result(response):
+    """True for the '[... ERROR] ...' strings provider functions return instead of an analysis."""
+    return not isinstance(response, str) or (response.strip().startswith("[") and "ERROR" in response)
+
+
+class LatencyTracker:
+    """Sliding window of one provider's recent calls: latencies of successes and the success/failure mix."""
+
+    def __init__(self, window=50):
+        self.latencies = deque(maxlen=window)
+        self.outcomes = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, latency, ok):
+        with self._lock:
+            self.outcomes.append(ok)
+            if ok:
+                self.latencies.append(latency)
+
+    def percentile(self, pct, min_samples=5):
+        """Nearest-rank percentile of successful latencies, or None until min_samples calls succeeded."""
+        with self._lock:
+            ordered = sorted(self.latencies)
+        if len(ordered) < min_samples:
+            return None
+        return ordered[max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered) + 0.5) - 1))]
+
+    def error_rate(self):
+        with self._lock:
+            return (len(self.outcomes) - sum(self.outcomes)) / len(self.outcomes) if self.outcomes else 0.0
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures, so a broken provider is skipped
+    instead of costing every request a timeout. After `reset_timeout` seconds one trial
+    call is let through (half-open): success closes the breaker, failure re-opens it.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half-open"
+
+    def __init__(self, failure_threshold=3, reset_timeout=60.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+        self._clock = clock
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """True if a call may go out now. In half-open state only the single trial call is allowed."""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and self._clock() - self._opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                return True
+            return False
+
+    def record(self, ok):
+        with self._lock:
+            if ok:
+                self.state = self.CLOSED
+                self.failures = 0
+                return
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self._opened_at = self._clock()
+
+    def retry_in(self):
+        """Seconds until an open breaker lets a trial call through."""
+        with self._lock:
+            if self.state != self.OPEN:
+                return 0.0
+            return max(0.0, self.reset_timeout - (self._clock() - self._opened_at))
+
+
+class HedgedRouter:
+    """
+    Routes a request across providers in preference order.
+    - Failover: when a provider returns an error, the next one is tried.
+    - Hedging: when the running provider has not answered within its p95 latency
+      (never less than hedge_min_delay; hedge_default_delay until enough samples exist),
+      the next provider is started too and whichever succeeds first wins. The slower
+      call is left to finish in the background; its outcome still feeds the statistics.
+    - Circuit breakers skip providers that keep failing.
+    `notify(message)` is called for hedges, failovers and skipped providers.
+    """
+
+    def __init__(self, hedge_min_delay=2.0, hedge_default_delay=30.0, failure_threshold=3, reset_timeout=60.0,
+                 window=50, is_failure=is_error_result, notify=None, max_workers=32, clock=time.monotonic):
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_default_delay = hedge_default_delay
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.window = window
+        self.is_failure = is_failure
+        self.notify = notify or (lambda message: None)
+        self.hedges = 0
+        self.failovers = 0
+        self._clock = clock
+        self._trackers = {}
+        self._breakers = {}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="testpilot-route")
+
+    def tracker(self, provider):
+        with self._lock:
+            return self._trackers.setdefault(provider, LatencyTracker(self.window))
+
+    def breaker(self, provider):
+        with self._lock:
+            return self._breakers.setdefault(provider, CircuitBreaker(self.failure_threshold, self.reset_timeout, self._clock))
+
+    def hedge_delay(self, provider):
+        p95 = self.tracker(provider).percentile(95)
+        return self.hedge_default_delay if p95 is None else max(self.hedge_min_delay, p95)
+
+    def _record(self, provider, started, result):
+        ok = not self.is_failure(result)
+        self.tracker(provider).record(self._clock() - started, ok)
+        self.breaker(provider).record(ok)
+        return ok
+
+    def _next_allowed(self, pending):
+        while pending:
+            provider = pending.pop(0)
+            if self.breaker(provider).allow():
+                return provider
+            self.notify(f"[ROUTER] Skipping {provider.upper()}: circuit open ({self.breaker(provider).retry_in():.0f}s left)")
+        return None
+
+    def _all_open_error(self, providers):
+        return f"[ROUTER ERROR] All providers are failing (circuit open): {', '.join(p.upper() for p in providers)}"
+
+    def _run(self, provider, call_fn):
+        started = self._clock()
+        try:
+            result = call_fn(provider)
+        except Exception as e:
+            result = f"[{provider.upper()} API ERROR] {e}"
+        return provider, result, self._record(provider, started, result)
+
+    def call(self, providers, call_fn):
+        """Runs call_fn(provider) with hedging and failover; returns (result, provider that produced it)."""
+        pending = list(providers)
+        current = self._next_allowed(pending)
+        if current is None:
+            return self._all_open_error(providers), providers[0]
+
+        results = queue.Queue()
+        def launch(provider):
+            self._pool.submit(lambda: results.put(self._run(provider, call_fn)))
+
+        launch(current)
+        in_flight = 1
+        hedged = False
+        last = None
+        while True:
+            timeout = self.hedge_delay(current) if not hedged and pending and in_flight == 1 else None
+            try:
+                provider, result, ok = results.get(timeout=timeout)
+            except queue.Empty:
+                hedged = True
+                backup = self._next_allowed(pending)
+                if backup:
+                    self.notify(f"[HEDGE] {current.upper()} slower than its p95 ({timeout:.1f}s); also asking {backup.upper()}")
+                    with self._lock:
+                        self.hedges += 1
+                    launch(backup)
+                    in_flight += 1
+                continue
+            in_flight -= 1
+            if ok:
+                return result, provider
+            last = (result, provider)
+            if in_flight:
+                continue # A hedged call is still running
+            current = self._next_allowed(pending)
+            if current is None:
+                return last
+            self.notify(f"[FAILOVER] {provider.upper()} failed; retrying with {current.upper()}")
+            with self._lock:
+                self.failovers += 1
+            launch(current)
+            in_flight = 1
+
+    def call_in_order(self, providers, call_fn, can_failover=lambda: True):
+        """
+        Failover without hedging, for streamed calls where two racing streams would interleave.
+        Stops at the first failure once can_failover() is False (e.g. text has already been streamed).
+        """
+        pending = list(providers)
+        last = None
+        while True:
+            current = self._next_allowed(pending)
+            if current is None:
+                return last or (self._all_open_error(providers), providers[0])
+            if last:
+                self.notify(f"[FAILOVER] {last[1].upper()} failed; retrying with {current.upper()}")
+                with self._lock:
+                    self.failovers += 1
+            provider, result, ok = self._run(current, call_fn)
+            if ok or not can_failover():
+                return result, provider
+            last = (result, provider)
+
+    def stats(self):
+        with self._lock:
+            providers = sorted(set(self._trackers) | set(self._breakers))
+            summary = {"hedges": self.hedges, "failovers": self.failovers}
+        summary["providers"] = {
+            provider: {
+                "p50_seconds": self.tracker(provider).percentile(50, min_samples=1),
+                "p95_seconds": self.tracker(provider).percentile(95, min_samples=1),
+                "error_rate": self.tracker(provider).error_rate(),
+                "circuit": self.breaker(provider).state,
+            }
+            for provider in providers
+        }
+        return summary
@@ -0,0 +1,262 @@
+import os
+import re
+import json
+import time
+import shutil
+import tempfile
+
+# Only these are ever applied automatically; the system prompt withholds fixes for the rest
+LOW_RISK_SEVERITIES = ("MINOR", "INFO")
+
+# <<<<<<< SEARCH / ======= / >>>>>>> REPLACE blocks, the format the system prompt asks for
+SEARCH_REPLACE_RE = re.compile(
+    r'^<{7}[ \t]*SEARCH[ \t]*\n(?P<search>.*?)^={7}[ \t]*\n(?P<replace>.*?)^>{7}[ \t]*REPLACE[ \t]*$',
+    re.DOTALL | re.MULTILINE,
+)
+DIFF_HUNK_RE = re.compile(r'^@@[^\n]*@@[^\n]*$', re.MULTILINE)
+CODE_FENCE_RE = re.compile(r'^```[\w+-]*[ \t]*\n(.*?)\n?```[ \t]*$', re.DOTALL | re.MULTILINE)
+SNAPSHOT_ID_RE = re.compile(r'^[0-9]{8}-[0-9]{6}-[0-9a-f]{6}$')
+
+
+class Hunk:
+    """One anchored edit: replace the single occurrence of `search`, or append `replace` when search is None."""
+
+    __slots__ = ("search", "replace")
+
+    def __init__(self, search, replace):
+        self.search = search
+        self.replace = replace
+
+
+def _strip_fence(code):
+    match = CODE_FENCE_RE.search(code)
+    return match.group(1) if match else code
+
+
+def _diff_hunks(code):
+    """Unified diff hunks as Hunks: context and '-' lines form the anchor, context and '+' lines its replacement."""
+    hunks = []
+    headers = list(DIFF_HUNK_RE.finditer(code))
+    for i, header in enumerate(headers):
+        body = code[header.end() + 1:headers[i + 1].start() if i + 1 < len(headers) else len(code)]
+        search = []
+        replace = []
+        for line in body.splitlines():
+            if line.startswith(("--- ", "+++ ", "\\")):
+                continue
+            marker, text = (line[0], line[1:]) if line else (" ", "")
+            if marker in " -":
+                search.append(text)
+            if marker in " +":
+                replace.append(text)
+        if search:
+            hunks.append(Hunk("\n".join(search) + "\n", "\n".join(replace) + "\n" if replace else ""))
+    return hunks
+
+
+def parse_hunks(code):
+    """
+    Turns a suggested fix into Hunks. SEARCH/REPLACE blocks and unified diffs become anchored
+    replacements; any other snippet is treated as an append to the end of the file.
+    """
+    code = code.replace("\r\n", "\n")
+    blocks = list(SEARCH_REPLACE_RE.finditer(code))
+    if blocks:
+        return [Hunk(m.group("search"), m.group("replace")) for m in blocks]
+    code = _strip_fence(code)
+    if DIFF_HUNK_RE.search(code):
+        hunks = _diff_hunks(code)
+        if hunks:
+            return hunks
+    return [Hunk(None, code.strip("\n") + "\n")]
+
+
+def _find_once(content, text):
+    """
+    Offset of the single occurrence of `text` that starts a line, None if there is none, or -1
+    if it is ambiguous. Anchors are whole lines: "x = 1" must not match inside "max = 1".
+    """
+    found = None
+    start = content.find(text)
+    while start >= 0:
+        if start == 0 or content[start - 1] == "\n":
+            if found is not None:
+                return -1
+            found = start
+        start = content.find(text, start + 1)
+    return found
+
+
+def plan_fix(content, hunks, taken):
+    """
+    Locates every hunk of one fix in `content`. Returns (edits, None) with edits as
+    [(start, end, text)], or ([], reason) if any hunk cannot be placed safely: a fix is
+    applied whole or not at all. `taken` holds spans claimed by earlier fixes in the batch.
+    """
+    edits = []
+    for hunk in hunks:
+        if hunk.search is None:
+            if hunk.replace.strip() in content:
+                return [], "Fix already present in file."
+            edits.append((len(content), len(content), hunk.replace))
+            continue
+        if not hunk.search.strip():
+            return [], "Fix has an empty search block."
+        start = _find_once(content, hunk.search)
+        if start is None:
+            if hunk.replace.strip() and _find_once(content, hunk.replace) is not None:
+                return [], "Fix already present in file."
+            return [], "Code to replace was not found; the file has changed since the analysis."
+        if start < 0:
+            return [], "Code to replace occurs more than once; the fix is ambiguous."
+        edits.append((start, start + len(hunk.search), hunk.replace))
+
+    # Appends never conflict; replacement spans (never empty) must not overlap each other or earlier fixes
+    spans = sorted(taken + [(start, end) for start, end, _ in edits if start < end])
+    if any(next_start < prev_end for (_, prev_end), (next_start, _) in zip(spans, spans[1:])):
+        return [], "Conflicts with another fix to the same lines."
+    return edits, None
+
+
+def _apply_edits(content, edits):
+    """Applies non-overlapping edits; appends (start == len(content)) go last, in order."""
+    size = len(content)
+    appends = [text for start, end, text in edits if start == end == size]
+    replacements = sorted((e for e in edits if not e[0] == e[1] == size), key=lambda e: e[0], reverse=True)
+    for start, end, text in replacements:
+        content = content[:start] + text + content[end:]
+    for text in appends:
+        content += ("" if content.endswith("\n\n") else "\n" if content.endswith("\n") else "\n\n") + text
+    return content
+
+
+def atomic_write(path, content):
+    """Writes through a temp file in the same directory and renames it over `path`, keeping its mode."""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8", newline="") as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        shutil.copymode(path, tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class Snapshot:
+    """
+    One backup per batch: the original of every file the batch changes, saved once under
+    <backup_root>/<id>/ with a manifest, so the whole batch can be restored in one step.
+    The directory is only created if something is actually written.
+    """
+
+    def __init__(self, backup_root):
+        self.id = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.urandom(3).hex()}"
+        self.dir = os.path.join(backup_root, self.id)
+        self.files = {}
+
+    def save(self, path, content):
+        os.makedirs(self.dir, exist_ok=True)
+        name = f"{len(self.files):04}_{os.path.basename(path)}"
+        with open(os.path.join(self.dir, name), "w", encoding="utf-8", newline="") as f:
+            f.write(content)
+        self.files[path] = name
+        self._write_manifest()
+
+    def _write_manifest(self):
+        with open(os.path.join(self.dir, "manifest.json"), "w", encoding="utf-8") as f:
+            json.dump({"id": self.id, "created_at": time.time(), "files": self.files}, f, indent=2)
+
+
+def apply_fixes(fixes, backup_root):
+    """
+    Applies a batch of fixes, each {"file_path", "severity", "suggested_fix_code", ...}.
+    Fixes are grouped by file; each file is read once, every eligible fix is planned against
+    that one read (overlapping or unplaceable fixes are skipped), and the result is written
+    once, atomically. Originals go into a single Snapshot for the batch.
+    Returns {"applied": [fix, ...], "skipped": [(fix, reason), ...], "files": [paths], "snapshot": id or None}.
+    """
+    applied = []
+    skipped = []
+    by_file = {}
+    for fix in fixes:
+        if str(fix.get("severity", "")).upper() not in LOW_RISK_SEVERITIES:
+            skipped.append((fix, "Cannot auto-fix CRITICAL or MAJOR issues. Please apply manually."))
+        elif not fix.get("suggested_fix_code"):
+            skipped.append((fix, "No code fix available for this issue."))
+        elif not fix.get("file_path"):
+            skipped.append((fix, "Auto-fix needs the target file, which this folder analysis did not report (re-run it in parallel or incremental mode)."))
+        elif not os.path.isfile(fix["file_path"]):
+            skipped.append((fix, "Target file not found."))
+        else:
+            by_file.setdefault(os.path.realpath(fix["file_path"]), []).append(fix)
+
+    snapshot = Snapshot(backup_root)
+    changed = []
+    for path, file_fixes in by_file.items():
+        try:
+            before = os.stat(path)
+            with open(path, "r", encoding="utf-8", newline="") as f:
+                original = f.read()
+        except (OSError, UnicodeDecodeError) as e:
+            skipped.extend((fix, f"Could not read file: {e}") for fix in file_fixes)
+            continue
+
+        # Hunks come in with "\n"; match the file's own line endings
+        newline = "\r\n" if "\r\n" in original else "\n"
+        taken = []
+        appended = set()
+        edits = []
+        accepted = []
+        for fix in file_fixes:
+            hunks = parse_hunks(fix["suggested_fix_code"])
+            if newline != "\n":
+                hunks = [Hunk(h.search and h.search.replace("\n", newline), h.replace.replace("\n", newline)) for h in hunks]
+            fix_edits, reason = plan_fix(original, hunks, taken)
+            if reason:
+                skipped.append((fix, reason))
+                continue
+            appends = [text for start, end, text in fix_edits if start == end]
+            if appends and any(text in appended for text in appends):
+                skipped.append((fix, "Same fix already applied in this batch."))
+                continue
+            appended.update(appends)
+            taken.extend((start, end) for start, end, _ in fix_edits if start < end)
+            edits.extend(fix_edits)
+            accepted.append(fix)
+        if not accepted:
+            continue
+
+        after = os.stat(path)
+        if (after.st_mtime_ns, after.st_size) != (before.st_mtime_ns, before.st_size):
+            skipped.extend((fix, "File changed while the fixes were being applied.") for fix in accepted)
+            continue
+        try:
+            snapshot.save(path, original)
+            atomic_write(path, _apply_edits(original, edits))
+        except OSError as e:
+            skipped.extend((fix, f"Could not write file: {e}") for fix in accepted)
+            continue
+        applied.extend(accepted)
+        changed.append(path)
+
+    return {"applied": applied, "skipped": skipped, "files": changed, "snapshot": snapshot.id if snapshot.files else None}
+
+
+def restore_snapshot(backup_root, snapshot_id):
+    """Writes every file of a batch's snapshot back in place. Returns the restored paths."""
+    if not SNAPSHOT_ID_RE.match(snapshot_id or ""):
+        raise ValueError("Invalid snapshot id.")
+    snapshot_dir = os.path.join(backup_root, snapshot_id)
+    with open(os.path.join(snapshot_dir, "manifest.json"), encoding="utf-8") as f:
+        manifest = json.load(f)
+    restored = []
+    for path, name in manifest["files"].items():
+        with open(os.path.join(snapshot_dir, name), "r", encoding="utf-8", newline="") as f:
+            atomic_write(path, f.read())
+        restored.append(path)
+    return restored
@@ -0,0 +1,95 @@
+import os
+import re
+import subprocess
+
+HUNK_HEADER_RE = re.compile(r'^@@ -\d+(?:,\d+)? \+(\d+)(?:,\d+)? @@')
+DIFF_CONTEXT_LINES = 3
+
+
+class GitDiffError(Exception):
+    """Raised when git is missing, the folder is not in a repo, or the revision is unknown."""
+
+
+def _git(folder, *args):
+    try:
+        result = subprocess.run(["git", "-C", folder, *args], capture_output=True, text=True, encoding="utf-8", errors="replace")
+    except FileNotFoundError:
+        raise GitDiffError("git is not installed or not on PATH")
+    if result.returncode != 0:
+        raise GitDiffError(result.stderr.strip() or f"git {args[0]} failed")
+    return result.stdout
+
+
+def parse_unified_diff(diff_text):
+    """
+    Parses `git diff` output into {rel_path: [hunk_lines, ...]}.
+    Each hunk is a list of (new_line_number or None, marker, text) where marker is ' ', '+' or '-'.
+    Deleted files are left out since there is nothing left to analyze.
+    """
+    files = {}
+    current = None
+    hunk = None
+    new_line = 0
+    for line in diff_text.splitlines():
+        if line.startswith("diff --git"):
+            current = None
+            hunk = None
+        elif line.startswith("+++ "):
+            target = line[4:].strip()
+            current = None if target == "/dev/null" else target[2:] if target.startswith("b/") else target
+            if current:
+                files.setdefault(current, [])
+        elif line.startswith("@@") and current:
+            match = HUNK_HEADER_RE.match(line)
+            new_line = int(match.group(1)) if match else 1
+            hunk = []
+            files[current].append(hunk)
+        elif hunk is not None and line[:1] in (" ", "+", "-"):
+            marker, text = line[0], line[1:]
+            if marker == "-":
+                hunk.append((None, marker, text))
+            else:
+                hunk.append((new_line, marker, text))
+                new_line += 1
+    return {path: hunks for path, hunks in files.items() if hunks}
+
+
+def format_hunks(hunks):
+    """Renders hunks with current-file line numbers, so issues reported by line map straight back to the file."""
+    out = []
+    for hunk in hunks:
+        numbered = [n for n, _, _ in hunk if n is not None]
+        if numbered:
+            out.append(f"# lines {numbered[0]}-{numbered[-1]}")
+        for number, marker, text in hunk:
+            out.append(f"{number if number is not None else '':>5} {marker}| {text}")
+    return "\n".join(out)
+
+
+def changed_regions(folder, since, extensions=None, context=DIFF_CONTEXT_LINES):
+    """
+    Returns [(rel_path, text), ...] for code files under `folder` that changed since `since`
+    (committed or not), where text holds only the changed hunks plus `context` lines around them.
+    Untracked files are included whole, as they are entirely new.
+    """
+    _git(folder, "rev-parse", "--is-inside-work-tree") # Fails with git's own message outside a repo
+    try:
+        _git(folder, "rev-parse", "--verify", "--quiet", f"{since}^{{commit}}")
+    except GitDiffError:
+        raise GitDiffError(f"Unknown revision: {since}")
+    diff_text = _git(folder, "diff", "--no-color", "--no-ext-diff", f"--unified={context}", "--relative", since, "--", ".")
+    regions = {path: format_hunks(hunks) for path, hunks in parse_unified_diff(diff_text).items()}
+
+    untracked = _git(folder, "ls-files", "--others", "--exclude-standard", "--", ".").splitlines()
+    for rel_path in untracked:
+        try:
+            with open(os.path.join(folder, rel_path), "r", encoding="utf-8") as f:
+                lines = f.read().splitlines()
+        except (OSError, UnicodeDecodeError):
+            continue
+        regions[rel_path] = format_hunks([[(i, "+", text) for i, text in enumerate(lines, 1)]])
+
+    return [
+        (rel_path, text) for rel_path, text in sorted(regions.items())
+        if extensions is None or os.path.splitext(rel_path)[1].lower() in extensions
+    ]
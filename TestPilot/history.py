@@ -0,0 +1,198 @@
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS analyses (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    path TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    content_hash TEXT,
+    provider TEXT,
+    model TEXT,
+    created_at REAL NOT NULL,
+    summary TEXT,
+    issue_count INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_analyses_path ON analyses(path, created_at);
+CREATE INDEX IF NOT EXISTS idx_analyses_hash ON analyses(content_hash);
+
+CREATE TABLE IF NOT EXISTS issues (
+    id TEXT PRIMARY KEY,
+    analysis_id INTEGER NOT NULL REFERENCES analyses(id) ON DELETE CASCADE,
+    file_path TEXT,
+    line INTEGER,
+    severity TEXT NOT NULL,
+    type TEXT,
+    confidence INTEGER,
+    description TEXT,
+    root_cause TEXT,
+    fix TEXT,
+    suggested_fix_desc TEXT,
+    suggested_fix_code TEXT,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_issues_file ON issues(file_path);
+CREATE INDEX IF NOT EXISTS idx_issues_severity_file ON issues(severity, file_path);
+CREATE INDEX IF NOT EXISTS idx_issues_type_file ON issues(type, file_path);
+CREATE INDEX IF NOT EXISTS idx_issues_analysis ON issues(analysis_id);
+"""
+
+ISSUE_COLUMNS = ("id", "analysis_id", "file_path", "line", "severity", "type", "confidence", "description",
+                 "root_cause", "fix", "suggested_fix_desc", "suggested_fix_code", "created_at")
+
+
+def _norm(path):
+    return os.path.normcase(os.path.abspath(path)) if path else path
+
+
+def _under_clause(under):
+    """
+    SQL matching file_path equal to `under` or inside it, as an index range scan instead of a LIKE:
+    everything sorting between "<folder>/" and "<folder>0" (the character after the separator).
+    """
+    prefix = _norm(under)
+    base = prefix.rstrip(os.sep)
+    return "(file_path = ? OR (file_path >= ? AND file_path < ?))", [prefix, base + os.sep, base + chr(ord(os.sep) + 1)]
+
+
+def issue_id(content_hash, file_path, issue):
+    """
+    Stable id for an issue: the same finding on the same content gets the same id on every run,
+    so links and /apply-fix requests stay valid across restarts and re-analyses.
+    """
+    key = "\0".join(str(part) for part in (content_hash, file_path, issue.get("type"), issue.get("severity"), issue.get("description")))
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()[:16]
+
+
+class AnalysisHistory:
+    """
+    SQLite store of finished analyses and an index of their issues, queryable by
+    path prefix, severity and type without re-running the model.
+    One connection is shared between threads behind a lock; WAL keeps readers unblocked.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA foreign_keys=ON")
+            self._conn.executescript(SCHEMA)
+
+    def record(self, path, kind, issues, summary="", content_hash=None, provider=None, model=None, file_hashes=None):
+        """
+        Stores one analysis. Each issue's file_path is the analyzed file, or for folder runs
+        the folder joined with the issue's "file" tag (None if the issue names no file).
+        Issues stored earlier for the files this analysis covers (the file, the keys of file_hashes,
+        or everything under the folder) are replaced by the new ones.
+        file_hashes ({file_path: hash}) pins issue ids to each file's content; otherwise content_hash is used.
+        Returns (analysis_id, [issue ids in input order]).
+        """
+        now = time.time()
+        path = _norm(path)
+        file_hashes = {_norm(p): h for p, h in (file_hashes or {}).items()}
+        rows = []
+        ids = []
+        seen = set()
+        for issue in issues:
+            if kind == "file":
+                file_path = path
+            else:
+                file_path = _norm(os.path.join(path, issue["file"])) if issue.get("file") else None
+            iid = issue_id(file_hashes.get(file_path, content_hash), file_path, issue)
+            while iid in seen: # The same finding twice in one response
+                iid = hashlib.sha256(iid.encode("utf-8")).hexdigest()[:16]
+            seen.add(iid)
+            ids.append(iid)
+            rows.append((iid, file_path, issue.get("line"), issue.get("severity", "INFO"), issue.get("type"),
+                         int(issue.get("confidence") or 0), issue.get("description"), issue.get("root_cause"), issue.get("fix"),
+                         issue.get("suggested_fix_desc"), issue.get("suggested_fix_code"), now))
+
+        with self._lock, self._conn:
+            # The new analysis supersedes earlier findings for every file it covered, so fixed issues disappear
+            if kind == "file":
+                self._conn.execute("DELETE FROM issues WHERE file_path = ?", (path,))
+            else:
+                if file_hashes:
+                    covered = set(file_hashes) | {row[1] for row in rows if row[1]}
+                    self._conn.executemany("DELETE FROM issues WHERE file_path = ?", [(file_path,) for file_path in covered])
+                else:
+                    clause, values = _under_clause(path)
+                    self._conn.execute(f"DELETE FROM issues WHERE {clause}", values)
+                self._conn.execute(
+                    "DELETE FROM issues WHERE file_path IS NULL AND analysis_id IN (SELECT id FROM analyses WHERE path = ?)", (path,))
+            cursor = self._conn.execute(
+                "INSERT INTO analyses (path, kind, content_hash, provider, model, created_at, summary, issue_count) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (path, kind, content_hash, provider, model, now, summary, len(rows)),
+            )
+            analysis_id = cursor.lastrowid
+            # A re-found issue moves to the newest analysis
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO issues (id, analysis_id, file_path, line, severity, type, confidence, description, "
+                "root_cause, fix, suggested_fix_desc, suggested_fix_code, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [(row[0], analysis_id) + row[1:] for row in rows],
+            )
+        return analysis_id, ids
+
+    def get_issue(self, iid):
+        with self._lock:
+            row = self._conn.execute(f"SELECT {', '.join(ISSUE_COLUMNS)} FROM issues WHERE id = ?", (iid,)).fetchone()
+        return dict(row) if row else None
+
+    def find_issues(self, under=None, severity=None, issue_type=None, limit=200, offset=0):
+        """
+        Issues from the index, newest first. `under` restricts to files inside a folder (or that exact file).
+        """
+        clauses = []
+        params = []
+        if under:
+            clause, values = _under_clause(under)
+            clauses.append(clause)
+            params += values
+        if severity:
+            clauses.append("severity = ?")
+            params.append(severity.upper())
+        if issue_type:
+            clauses.append("type = ?")
+            params.append(issue_type)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        query = f"SELECT {', '.join(ISSUE_COLUMNS)} FROM issues {where} ORDER BY created_at DESC, file_path, line LIMIT ? OFFSET ?"
+        with self._lock:
+            rows = self._conn.execute(query, params + [limit, offset]).fetchall()
+        return [dict(row) for row in rows]
+
+    def count_issues(self, under=None):
+        """{severity: {type: count}} for issues under a path (or everywhere)."""
+        where = ""
+        params = []
+        if under:
+            clause, params = _under_clause(under)
+            where = f"WHERE {clause}"
+        with self._lock:
+            rows = self._conn.execute(f"SELECT severity, type, COUNT(*) FROM issues {where} GROUP BY severity, type", params).fetchall()
+        counts = {}
+        for severity, issue_type, count in rows:
+            counts.setdefault(severity, {})[issue_type or "unknown"] = count
+        return counts
+
+    def analyses(self, path=None, limit=50):
+        """Most recent analyses, optionally only those of one path."""
+        query = "SELECT id, path, kind, content_hash, provider, model, created_at, summary, issue_count FROM analyses"
+        params = []
+        if path:
+            query += " WHERE path = ?"
+            params.append(_norm(path))
+        query += " ORDER BY created_at DESC LIMIT ?"
+        with self._lock:
+            rows = self._conn.execute(query, params + [limit]).fetchall()
+        return [dict(row) for row in rows]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
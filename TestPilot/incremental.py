@@ -0,0 +1,75 @@
+import os
+import json
+import hashlib
+
+
+def hash_content(content):
+    """SHA-256 of a file's text content."""
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+class FolderManifest:
+    """
+    Per-project record of what was analyzed last time.
+
+    Maps each relative path to its size, mtime, content hash and the AI findings
+    for that file, so a folder run only re-sends files that were added or modified.
+    The manifest is discarded when the prompt key (system prompt + provider + model)
+    changes, since the stored findings would no longer match.
+    """
+
+    def __init__(self, project_root, manifest_dir, prompt_key):
+        self.project_root = os.path.abspath(project_root)
+        self.prompt_key = prompt_key
+        name = hashlib.sha256(self.project_root.encode("utf-8")).hexdigest()[:16]
+        self.path = os.path.join(manifest_dir, f"{name}.json")
+        self.files = {}
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get("prompt_key") != self.prompt_key:
+            return  # Different prompt/model: start fresh
+        self.files = data.get("files", {})
+
+    def save(self):
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"project": self.project_root, "prompt_key": self.prompt_key, "files": self.files}, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"[WARN] Failed to save manifest: {e}")
+
+    def findings_if_unchanged(self, rel_path, st):
+        """Fast path: stored findings if size and mtime match, without reading the file."""
+        entry = self.files.get(rel_path)
+        if entry and entry["size"] == st.st_size and entry["mtime"] == st.st_mtime_ns:
+            return entry["findings"]
+        return None
+
+    def findings_for_hash(self, rel_path, content_hash):
+        """Stored findings if the content is identical (e.g. the file was only touched)."""
+        entry = self.files.get(rel_path)
+        if entry and entry["hash"] == content_hash:
+            return entry["findings"]
+        return None
+
+    def record(self, rel_path, st, content_hash, findings):
+        self.files[rel_path] = {
+            "size": st.st_size,
+            "mtime": st.st_mtime_ns,
+            "hash": content_hash,
+            "findings": findings,
+        }
+
+    def prune(self, seen_paths):
+        """Drops entries for files that no longer exist in the project."""
+        for rel_path in list(self.files):
+            if rel_path not in seen_paths:
+                del self.files[rel_path]
@@ -0,0 +1,120 @@
+import time
+import uuid
+import threading
+import traceback
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+
+class QueueFullError(Exception):
+    """Raised when too many jobs are already waiting for a worker."""
+
+
+class Job:
+    """One analysis run and its result. Status goes queued -> running -> done | error."""
+
+    def __init__(self, **meta):
+        self.id = uuid.uuid4().hex
+        self.meta = meta
+        self.status = "queued"
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+
+    def start(self):
+        self.status = "running"
+        self.started = time.time()
+
+    def succeed(self, result):
+        self.result = result
+        self.finished = time.time()
+        self.status = "done"
+
+    def fail(self, error):
+        self.error = error
+        self.finished = time.time()
+        self.status = "error"
+
+    @property
+    def is_finished(self):
+        return self.status in ("done", "error")
+
+    def to_dict(self, include_result=True):
+        data = {
+            "job_id": self.id,
+            "status": self.status,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+            **self.meta,
+        }
+        if self.error:
+            data["error"] = self.error
+        if include_result and self.result is not None:
+            data["result"] = self.result
+        return data
+
+
+class JobQueue:
+    """
+    Bounded worker pool with per-job result storage.
+    submit() returns immediately; callers poll get(job_id) for status and result.
+    Only the most recent `max_jobs` jobs are kept (finished ones are dropped first).
+    """
+
+    def __init__(self, max_workers=4, max_pending=32, max_jobs=500):
+        self.max_pending = max_pending
+        self.max_jobs = max_jobs
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="testpilot-job")
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def create(self, **meta):
+        """Registers a job that the caller runs itself (e.g. a streaming request)."""
+        job = Job(**meta)
+        with self._lock:
+            self._add(job)
+        return job
+
+    def submit(self, fn, on_done=None, **meta):
+        """
+        Queues fn() on the worker pool. Raises QueueFullError if the backlog is full.
+        on_done(job) is called once the job has finished, whether it succeeded or failed.
+        """
+        job = Job(**meta)
+        # Check and insert under one lock so concurrent submits cannot overshoot max_pending
+        with self._lock:
+            queued = sum(1 for queued_job in self._jobs.values() if queued_job.status == "queued")
+            if queued >= self.max_pending:
+                raise QueueFullError(f"{queued} analyses are already waiting; try again shortly.")
+            self._add(job)
+        self._executor.submit(self._run, job, fn, on_done)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _run(self, job, fn, on_done=None):
+        job.start()
+        try:
+            job.succeed(fn())
+        except Exception as e:
+            traceback.print_exc()
+            job.fail(str(e))
+        if on_done:
+            on_done(job)
+
+    def _add(self, job):
+        """Stores a new job; the caller holds the lock."""
+        self._jobs[job.id] = job
+        self._trim()
+
+    def _trim(self):
+        excess = len(self._jobs) - self.max_jobs
+        if excess <= 0:
+            return
+        for job_id in [job_id for job_id, job in self._jobs.items() if job.is_finished][:excess]:
+            del self._jobs[job_id]
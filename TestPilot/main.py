@@ -2,6 +2,27 @@ import os
 import sys
 import argparse
 import io
+import json
+import atexit
+import time
+import datetime
+import threading
+import contextvars
+import importlib.util
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from response_cache import ResponseCache, DEFAULT_CACHE_DIR
+from incremental import FolderManifest, hash_content
+from chunker import estimate_tokens, pack_batches, batch_file, merge_batch_responses
+from engine import ProviderGate, HedgedRouter
+from walker import walk_project, read_text_file, collect_files, is_project_file
+from watcher import open_watcher, watch_changes
+import static_check
+from gitdiff import changed_regions, GitDiffError
+from history import AnalysisHistory
+from conversation import Conversation
+from metrics import span, STAGE_SECONDS, BYTES_SENT, BYTES_RECEIVED, PROVIDER_CALLS, CACHE_LOOKUPS, MODEL_SELECTIONS, PROMPT_TOKENS, CACHED_PROMPT_TOKENS, profile_summary
+from response_parser import ANALYSIS_SCHEMA, JSON_OUTPUT_INSTRUCTIONS, gemini_schema, parse_response
 
 # Ensure UTF-8 output for Windows terminals
 if sys.platform == "win32":
@@ -17,39 +38,159 @@ Provide a clear summary, root cause, and minimal fix.
 If the input is unclear, state assumptions.
 """
 
-# Try importing Google Generative AI
-try:
-    import google.generativeai as genai
-    HAS_GENAI = True
-except ImportError:
-    HAS_GENAI = False
-
-# Try importing ZhipuAI
-try:
-    from zhipuai import ZhipuAI
-    HAS_GLM = True
-except ImportError:
-    HAS_GLM = False
-
-# Try importing OpenAI
-try:
-    from openai import OpenAI
-    HAS_OPENAI = True
-except ImportError:
-    HAS_OPENAI = False
+# Model tiers per provider: with TESTPILOT_MODEL_ROUTING=1, select_model picks one per request from its estimated
+# input size. Tiers stay with the default model's vendor. Override with TESTPILOT_MODEL_<PROVIDER>[_SMALL|_LARGE];
+# an empty tier falls back to the default model.
+MODEL_TIERS = {
+    provider: {
+        "small": os.getenv(f"TESTPILOT_MODEL_{provider.upper()}_SMALL", small),
+        "default": os.getenv(f"TESTPILOT_MODEL_{provider.upper()}", default),
+        "large": os.getenv(f"TESTPILOT_MODEL_{provider.upper()}_LARGE", large),
+    }
+    for provider, (small, default, large) in {
+        "gemini": ("gemini-2.0-flash-lite", "gemini-2.0-flash", ""), # The default already has a 1M-token context
+        "glm": ("glm-4-flash", "glm-4", "glm-4-long"),
+        "openrouter": ("", "deepseek/deepseek-v3.2", ""), # Set tiers explicitly; a vendor swap changes cost and data policy
+    }.items()
+}
+# Default model of each provider
+MODEL_NAMES = {provider: tiers["default"] for provider, tiers in MODEL_TIERS.items()}
+# Opt-in: inputs up to SMALL_INPUT_TOKENS (estimated, system prompt excluded) use the small tier, inputs above LARGE_INPUT_TOKENS the large one
+MODEL_ROUTING = os.getenv("TESTPILOT_MODEL_ROUTING", "0") == "1"
+SMALL_INPUT_TOKENS = int(os.getenv("TESTPILOT_SMALL_INPUT_TOKENS", "1500"))
+LARGE_INPUT_TOKENS = int(os.getenv("TESTPILOT_LARGE_INPUT_TOKENS", "32000"))
+
+# Response cache settings (override via environment)
+CACHE_DIR = os.getenv("TESTPILOT_CACHE_DIR", DEFAULT_CACHE_DIR)
+CACHE_MAX_MB = float(os.getenv("TESTPILOT_CACHE_MAX_MB", "64"))
+CACHE_TTL_SECONDS = int(os.getenv("TESTPILOT_CACHE_TTL", str(7 * 24 * 60 * 60)))
+MANIFEST_DIR = os.path.join(CACHE_DIR, "manifests")
+HISTORY_ENABLED = os.getenv("TESTPILOT_HISTORY", "1") != "0"
+HISTORY_DB = os.getenv("TESTPILOT_HISTORY_DB", os.path.join(CACHE_DIR, "history.sqlite3"))
+BACKUP_DIR = os.getenv("TESTPILOT_BACKUP_DIR", os.path.join(CACHE_DIR, "backups")) # One snapshot per applied fix batch
+
+# Per-request token budget for folder prompts, and how many batches may be in flight at once
+TOKEN_BUDGETS = {
+    "gemini": int(os.getenv("TESTPILOT_TOKEN_BUDGET_GEMINI", "200000")),
+    "glm": int(os.getenv("TESTPILOT_TOKEN_BUDGET_GLM", "100000")),
+    "openrouter": int(os.getenv("TESTPILOT_TOKEN_BUDGET_OPENROUTER", "48000")),
+}
+MAX_CONCURRENCY = int(os.getenv("TESTPILOT_MAX_CONCURRENCY", "4"))
+
+# Watch mode: quiet period before a batch of saves is analyzed, polling interval when inotify is unavailable
+WATCH_DEBOUNCE_SECONDS = float(os.getenv("TESTPILOT_WATCH_DEBOUNCE", "0.5"))
+WATCH_POLL_SECONDS = float(os.getenv("TESTPILOT_WATCH_POLL", "1.0"))
+WATCH_BACKEND = os.getenv("TESTPILOT_WATCH_BACKEND", "auto") # auto, inotify or polling
+
+# Interactive mode: earlier exchanges kept verbatim in follow-ups (by default only the last one), and their
+# size limit before older ones are summarized
+SESSION_TURNS = int(os.getenv("TESTPILOT_SESSION_TURNS", "1"))
+SESSION_HISTORY_TOKENS = int(os.getenv("TESTPILOT_SESSION_HISTORY_TOKENS", "6000"))
+
+# Per-provider rate limits: concurrent requests and requests per minute (0 = unlimited)
+PROVIDER_LIMITS = {
+    provider: {
+        "concurrency": int(os.getenv(f"TESTPILOT_CONCURRENCY_{provider.upper()}", str(MAX_CONCURRENCY))),
+        "rpm": int(os.getenv(f"TESTPILOT_RPM_{provider.upper()}", rpm)),
+    }
+    for provider, rpm in (("gemini", "15"), ("glm", "60"), ("openrouter", "60"))
+}
+MAX_RETRIES = int(os.getenv("TESTPILOT_MAX_RETRIES", "4"))
+
+# Cross-provider routing: fail over to (and hedge with) the other configured providers
+FAILOVER = os.getenv("TESTPILOT_FAILOVER", "1") != "0"
+HEDGE_MIN_SECONDS = float(os.getenv("TESTPILOT_HEDGE_MIN_SECONDS", "2"))       # Never hedge sooner than this
+HEDGE_DEFAULT_SECONDS = float(os.getenv("TESTPILOT_HEDGE_DEFAULT_SECONDS", "30")) # Until a provider has a p95
+BREAKER_FAILURES = int(os.getenv("TESTPILOT_BREAKER_FAILURES", "3"))
+BREAKER_RESET_SECONDS = float(os.getenv("TESTPILOT_BREAKER_RESET_SECONDS", "60"))
+PROVIDER_ORDER = ("gemini", "openrouter", "glm") # Fallback order after the selected provider
+PROVIDER_KEY_NAMES = {"gemini": "gemini", "glm": "glm", "openrouter": "openai"} # Provider -> api_keys entry
+
+# Local static pre-pass modes (see prescan_files)
+PRESCAN_MODES = ("off", "full", "skip-clean", "regions")
+
+# Response layout requested from providers: markdown (system_prompt.md) or schema-constrained JSON
+OUTPUT_FORMATS = ("markdown", "json")
+OUTPUT_FORMAT = os.getenv("TESTPILOT_OUTPUT_FORMAT", "markdown")
+
+# File types collected in folder mode
+VALID_EXTENSIONS = {".py", ".js", ".html", ".css", ".java", ".cpp", ".c", ".h", ".ts", ".json"}
+
+# Provider SDKs are heavy to import and a session only uses one of them, so availability
+# is checked via importlib without importing; the SDK itself is loaded on first use (_load_sdk).
+def _is_installed(module_name):
+    try:
+        return importlib.util.find_spec(module_name) is not None
+    except (ImportError, ValueError):
+        return False
+
+HAS_GENAI = _is_installed("google.generativeai")
+HAS_GLM = _is_installed("zhipuai")
+HAS_OPENAI = _is_installed("openai")
+# httpx ships with zhipuai/openai; used to give their clients long-lived keep-alive pools
+HAS_HTTPX = _is_installed("httpx")
+
+genai = None
+ZhipuAI = None
+OpenAI = None
+httpx = None
+
+_SDK_LOCK = threading.Lock()
+
+def _load_sdk(provider):
+    """Imports the SDK a provider needs, once."""
+    global genai, ZhipuAI, OpenAI, httpx
+    with _SDK_LOCK:
+        if provider == "gemini" and genai is None:
+            import google.generativeai as genai
+        elif provider == "glm" and ZhipuAI is None:
+            from zhipuai import ZhipuAI
+        elif provider == "openrouter" and OpenAI is None:
+            from openai import OpenAI
+        elif provider == "httpx" and httpx is None:
+            import httpx
+
+# Base-URL overrides point the OpenAI-compatible paths elsewhere, e.g. at mock_llm.py for offline benchmarks
+OPENROUTER_BASE_URL = os.getenv("TESTPILOT_OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1")
+GLM_BASE_URL = os.getenv("TESTPILOT_GLM_BASE_URL") # None keeps the zhipuai SDK's default endpoint
+KEEPALIVE_SECONDS = 120
+# OpenRouter models that only cache a prompt prefix marked with cache_control; OpenAI, DeepSeek, GLM and
+# Gemini 2.5 models cache long repeated prefixes on their own, as long as the prefix stays byte-identical
+EXPLICIT_CACHE_MODEL_PREFIXES = ("anthropic/", "google/")
 
 # --- Helper Functions ---
 
+SYSTEM_PROMPT_PATH = os.path.join(os.path.dirname(__file__), "system_prompt.md")
+_SYSTEM_PROMPT = None # (mtime_ns, size, text) of the last read
+
 def get_system_prompt():
-    """Reads the system prompt from system_prompt.md or returns default."""
-    prompt_path = os.path.join(os.path.dirname(__file__), "system_prompt.md")
-    if os.path.exists(prompt_path):
-        try:
-            with open(prompt_path, "r", encoding="utf-8") as f:
-                return f.read().strip()
-        except Exception as e:
-            print(f"[WARN] Failed to read system_prompt.md: {e}")
-    return DEFAULT_SYSTEM_PROMPT
+    """
+    The system prompt from system_prompt.md (or the default). The file is read once and again only
+    when its mtime or size changes, so every request sends the identical, cacheable prefix.
+    """
+    global _SYSTEM_PROMPT
+    try:
+        st = os.stat(SYSTEM_PROMPT_PATH)
+    except OSError:
+        return DEFAULT_SYSTEM_PROMPT
+    loaded = _SYSTEM_PROMPT
+    if loaded and loaded[:2] == (st.st_mtime_ns, st.st_size):
+        return loaded[2]
+    try:
+        with open(SYSTEM_PROMPT_PATH, "r", encoding="utf-8") as f:
+            text = f.read().strip()
+    except Exception as e:
+        print(f"[WARN] Failed to read system_prompt.md: {e}")
+        return DEFAULT_SYSTEM_PROMPT
+    _SYSTEM_PROMPT = (st.st_mtime_ns, st.st_size, text)
+    return text
+
+def get_analysis_prompt():
+    """The system prompt actually sent: get_system_prompt() plus the JSON contract in JSON output mode."""
+    system_prompt = get_system_prompt()
+    if OUTPUT_FORMAT == "json":
+        return f"{system_prompt}\n{JSON_OUTPUT_INSTRUCTIONS}"
+    return system_prompt
 
 def get_multiline_input():
     """Reads multiline input from the user until specific terminator is found."""
@@ -102,141 +243,1076 @@ def get_api_keys():
             
     return keys
 
-def analyze_with_gemini(user_input, api_key):
+def select_model(provider, user_input):
+    """
+    Picks the model tier for one request from its locally estimated size: short inputs (interactive
+    snippets, single small files) go to the provider's small, fast model and very large ones (folder
+    batches) to its large-context model. Returns (tier, model name).
+    """
+    tiers = MODEL_TIERS[provider]
+    if MODEL_ROUTING:
+        tokens = estimate_tokens(user_input)
+        if tokens <= SMALL_INPUT_TOKENS and tiers["small"]:
+            return "small", tiers["small"]
+        if tokens > LARGE_INPUT_TOKENS and tiers["large"]:
+            return "large", tiers["large"]
+    return "default", tiers["default"]
+
+def model_signature(provider):
+    """Every model a provider may route to, and the thresholds; part of keys whose results depend on the model."""
+    if not MODEL_ROUTING:
+        return MODEL_NAMES[provider]
+    tiers = MODEL_TIERS[provider]
+    return f"{tiers['small']}<={SMALL_INPUT_TOKENS}|{tiers['default']}|{tiers['large']}>{LARGE_INPUT_TOKENS}"
+
+def normalize_provider(model_name):
+    """Maps a UI/CLI model name onto a provider key. Anything unknown (e.g. 'openai') is OpenRouter."""
+    if model_name in ("gemini", "glm"):
+        return model_name
+    return "openrouter"
+
+def is_error_response(response):
+    """True for the '[... ERROR] ...' strings returned instead of an analysis."""
+    return response.strip().startswith("[") and "ERROR" in response
+
+_RESPONSE_CACHE = None
+
+def get_response_cache():
+    """Returns the shared on-disk response cache, creating it on first use."""
+    global _RESPONSE_CACHE
+    if _RESPONSE_CACHE is None:
+        _RESPONSE_CACHE = ResponseCache(
+            cache_dir=CACHE_DIR,
+            max_bytes=int(CACHE_MAX_MB * 1024 * 1024),
+            ttl_seconds=CACHE_TTL_SECONDS,
+        )
+    return _RESPONSE_CACHE
+
+_HISTORY = None
+
+def get_history():
+    """Returns the shared SQLite analysis history, creating it on first use."""
+    global _HISTORY
+    if _HISTORY is None:
+        _HISTORY = AnalysisHistory(HISTORY_DB)
+    return _HISTORY
+
+def record_history(path, is_folder, model_name, parsed, file_hashes=None):
+    """
+    Persists a parsed analysis (parse_response output) and tags each issue with its stable "id".
+    Issue ids are tied to the content of the file each issue names, so they survive restarts and re-runs.
+    Folder callers that already know each file's hash ({file_path: hash}) pass file_hashes to skip re-reading the folder.
+    The provider and model recorded are the ones that actually answered (tier routing, failover), taken from
+    the trace started with start_trace(); without one, the selected provider's default model.
+    Returns the analysis id, or None if history is disabled or could not be written.
+    """
+    if not HISTORY_ENABLED:
+        return None
+    trace = _TRACE.get()
+    if trace and trace.models:
+        provider, model = ",".join(sorted(trace.providers)), ",".join(sorted(trace.models))
+    else:
+        provider = normalize_provider(model_name)
+        model = MODEL_NAMES[provider]
+    try:
+        if is_folder:
+            if file_hashes is None:
+                files = collect_files(path, VALID_EXTENSIONS)
+                file_hashes = {os.path.join(path, rel_path): hash_content(content) for rel_path, content in files}
+            content_hash = hash_content("\n".join(f"{file_path}:{file_hashes[file_path]}" for file_path in sorted(file_hashes)))
+        else:
+            with open(path, "r", encoding="utf-8") as f:
+                content_hash = hash_content(f.read())
+            file_hashes = None
+        analysis_id, ids = get_history().record(
+            path, "folder" if is_folder else "file", parsed["issues"], summary=parsed["summary"],
+            content_hash=content_hash, provider=provider, model=model, file_hashes=file_hashes,
+        )
+    except Exception as e:
+        print(f"[WARN] Could not save analysis history: {e}")
+        return None
+    for issue, iid in zip(parsed["issues"], ids):
+        issue["id"] = iid
+    return analysis_id
+
+_ROUTER = None
+
+def get_router():
+    """Returns the shared router that tracks provider latency/errors and handles hedging and failover."""
+    global _ROUTER
+    if _ROUTER is None:
+        _ROUTER = HedgedRouter(
+            hedge_min_delay=HEDGE_MIN_SECONDS,
+            hedge_default_delay=HEDGE_DEFAULT_SECONDS,
+            failure_threshold=BREAKER_FAILURES,
+            reset_timeout=BREAKER_RESET_SECONDS,
+            notify=print,
+        )
+    return _ROUTER
+
+_PROVIDER_GATES = {}
+
+def get_provider_gate(provider):
+    """Returns the shared concurrency/rate-limit gate for a provider."""
+    gate = _PROVIDER_GATES.get(provider)
+    if gate is None:
+        limits = PROVIDER_LIMITS[provider]
+        gate = _PROVIDER_GATES.setdefault(provider, ProviderGate(
+            max_concurrency=limits["concurrency"],
+            requests_per_minute=limits["rpm"],
+            max_retries=MAX_RETRIES,
+        ))
+    return gate
+
+# --- Provider Registry ---
+# Clients are created once per (provider, key) and reused, so repeat analyses
+# keep their HTTP connections instead of paying TLS setup on every call.
+
+_CLIENTS = {}
+_CLIENTS_LOCK = threading.Lock()
+_GENAI_CONFIGURED_KEY = None
+
+def _make_http_client():
+    if not HAS_HTTPX:
+        return None
+    _load_sdk("httpx")
+    return httpx.Client(
+        limits=httpx.Limits(max_connections=32, max_keepalive_connections=16, keepalive_expiry=KEEPALIVE_SECONDS),
+        timeout=httpx.Timeout(300.0, connect=10.0),
+    )
+
+def _create_client(provider, api_key, model=None, system_instruction=None):
+    global _GENAI_CONFIGURED_KEY
+    _load_sdk(provider)
+    if provider == "gemini":
+        # genai is configured process-wide; only reconfigure when the key changes
+        if _GENAI_CONFIGURED_KEY != api_key:
+            genai.configure(api_key=api_key)
+            _GENAI_CONFIGURED_KEY = api_key
+        # Gemini binds the model and system instruction to the client object, so there is one client per
+        # model tier and prompt; the instruction goes out as its own segment ahead of the contents
+        return genai.GenerativeModel(model or MODEL_NAMES["gemini"], system_instruction=system_instruction)
+    # ProviderGate is the only retry layer: SDK retries would bypass its RPM limit and backoff
+    options = {"max_retries": 0}
+    http_client = _make_http_client()
+    if http_client:
+        options["http_client"] = http_client
+    if provider == "glm":
+        if GLM_BASE_URL:
+            options["base_url"] = GLM_BASE_URL
+        return ZhipuAI(api_key=api_key, **options)
+    # OpenRouter uses the OpenAI client but with a specific base URL
+    return OpenAI(base_url=OPENROUTER_BASE_URL, api_key=api_key, **options)
+
+def get_client(provider, api_key, model=None, system_instruction=None):
+    """
+    Returns the shared client for a provider/key pair, creating it on first use.
+    Chat-style providers take the model and system prompt per request; Gemini clients are per model and prompt.
+    """
+    cache_key = (provider, api_key, model, system_instruction) if provider == "gemini" else (provider, api_key)
+    client = _CLIENTS.get(cache_key)
+    if client is None:
+        with _CLIENTS_LOCK:
+            client = _CLIENTS.get(cache_key)
+            if client is None:
+                client = _create_client(provider, api_key, model, system_instruction)
+                _CLIENTS[cache_key] = client
+    return client
+
+def warm_up_providers(api_keys, background=True):
+    """
+    Creates clients for every configured provider and opens a connection with a cheap request,
+    so the first real analysis does not pay connection setup. Failures are only logged.
+    """
+    def _warm():
+        for provider, key_name, available in (("gemini", "gemini", HAS_GENAI), ("glm", "glm", HAS_GLM), ("openrouter", "openai", HAS_OPENAI)):
+            api_key = api_keys.get(key_name)
+            if not api_key or not available:
+                continue
+            try:
+                if provider == "gemini":
+                    # The same client (model and system instruction) the analyses will use
+                    get_client(provider, api_key, MODEL_NAMES["gemini"], system_instruction=get_analysis_prompt())
+                    genai.get_model(f"models/{MODEL_NAMES['gemini']}")
+                elif provider == "openrouter":
+                    get_client(provider, api_key).models.list()
+                else:
+                    get_client(provider, api_key) # GLM has no cheap endpoint; creating the client is enough
+            except Exception as e:
+                print(f"[WARN] Warm-up failed for {provider}: {e}")
+
+    if background:
+        threading.Thread(target=_warm, name="testpilot-warmup", daemon=True).start()
+    else:
+        _warm()
+
+def _collect_stream(chunks, on_chunk, provider, start):
+    """Forwards each text chunk to on_chunk and returns the full text; records the time to the first chunk."""
+    parts = []
+    for text in chunks:
+        if text:
+            if not parts:
+                STAGE_SECONDS.observe(time.perf_counter() - start, stage="first_token", provider=provider)
+            parts.append(text)
+            on_chunk(text)
+    return "".join(parts)
+
+def _record_usage(provider, prompt_tokens, cached_tokens):
+    """Counts the prompt tokens a provider reports, and how many of them it served from its prefix cache."""
+    PROMPT_TOKENS.inc(prompt_tokens or 0, provider=provider)
+    CACHED_PROMPT_TOKENS.inc(cached_tokens or 0, provider=provider)
+
+def _record_gemini_usage(usage):
+    if usage is not None:
+        _record_usage("gemini", getattr(usage, "prompt_token_count", 0), getattr(usage, "cached_content_token_count", 0))
+
+def _record_chat_usage(provider, usage):
+    if usage is None:
+        return
+    details = getattr(usage, "prompt_tokens_details", None)
+    cached = getattr(details, "cached_tokens", None) if details is not None else None
+    if cached is None:
+        cached = getattr(usage, "prompt_cache_hit_tokens", 0) # DeepSeek reports its cache hits here
+    _record_usage(provider, getattr(usage, "prompt_tokens", 0), cached)
+
+def _gemini_chunks(response):
+    chunk = None
+    for chunk in response:
+        try:
+            yield chunk.text
+        except ValueError:
+            continue # Chunk without text parts (e.g. safety metadata)
+    if chunk is not None:
+        _record_gemini_usage(getattr(chunk, "usage_metadata", None)) # The last chunk carries the totals
+
+def _chat_chunks(response, provider):
+    for chunk in response:
+        if chunk.choices:
+            yield chunk.choices[0].delta.content
+        if getattr(chunk, "usage", None):
+            _record_chat_usage(provider, chunk.usage) # Sent with the final chunk
+
+def _json_mode_options(provider):
+    """Request options that constrain the reply to ANALYSIS_SCHEMA in JSON output mode."""
+    if OUTPUT_FORMAT != "json":
+        return {}
+    if provider == "gemini":
+        return {"generation_config": {"response_mime_type": "application/json", "response_schema": gemini_schema()}}
+    if provider == "glm":
+        return {"response_format": {"type": "json_object"}} # GLM has JSON mode but no schema enforcement
+    return {"response_format": {"type": "json_schema", "json_schema": {"name": "testpilot_analysis", "strict": True, "schema": ANALYSIS_SCHEMA}}}
+
+def _chat_messages(system_prompt, user_input, history=None, model=""):
+    """
+    Messages for the chat-style APIs: the system prompt, earlier turns of a session, then the new input.
+    The unchanging system message leads, so providers can serve it from their prefix cache.
+    """
+    if model.startswith(EXPLICIT_CACHE_MODEL_PREFIXES):
+        system = {"role": "system", "content": [{"type": "text", "text": system_prompt, "cache_control": {"type": "ephemeral"}}]}
+    else:
+        system = {"role": "system", "content": system_prompt}
+    return [system, *(history or ()), {"role": "user", "content": user_input}]
+
+def _gemini_contents(user_input, history=None):
+    """Gemini request contents (the system prompt is the client's system_instruction); with history, a multi-turn list."""
+    if not history:
+        return user_input
+    contents = [{"role": "user" if m["role"] == "user" else "model", "parts": [m["content"]]} for m in history]
+    contents.append({"role": "user", "parts": [user_input]})
+    return contents
+
+def analyze_with_gemini(user_input, api_key, on_chunk=None, model=None, history=None):
     if not HAS_GENAI:
         return "[ERROR] `google-generativeai` library not found."
     
     try:
-        genai.configure(api_key=api_key)
-        # Using a model known to be widely available or the one we verified earlier
-        model = genai.GenerativeModel("gemini-2.0-flash")
+        with span("connect", "gemini"):
+            client = get_client("gemini", api_key, model or MODEL_NAMES["gemini"], system_instruction=get_analysis_prompt())
         
-        system_prompt = get_system_prompt()
-        full_prompt = f"{system_prompt}\n\nUSER INPUT:\n{user_input}"
+        contents = _gemini_contents(user_input, history)
         
-        response = model.generate_content(full_prompt)
-        return response.text
+        with span("request", "gemini"):
+            start = time.perf_counter()
+            if on_chunk:
+                response = client.generate_content(contents, stream=True, **_json_mode_options("gemini"))
+                return _collect_stream(_gemini_chunks(response), on_chunk, "gemini", start)
+
+            response = client.generate_content(contents, **_json_mode_options("gemini"))
+            _record_gemini_usage(getattr(response, "usage_metadata", None))
+            return response.text
     except Exception as e:
         return f"[GEMINI API ERROR] {e}"
 
-def analyze_with_glm(user_input, api_key):
+def analyze_with_glm(user_input, api_key, on_chunk=None, model=None, history=None):
     if not HAS_GLM:
         return "[ERROR] `zhipuai` library not found. Please run: pip install zhipuai"
     
     try:
-        client = ZhipuAI(api_key=api_key) 
-        system_prompt = get_system_prompt()
+        with span("connect", "glm"):
+            client = get_client("glm", api_key)
+        system_prompt = get_analysis_prompt()
         
-        response = client.chat.completions.create(
-            model="glm-4", # Standard model
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_input},
-            ],
-        )
-        return response.choices[0].message.content
+        with span("request", "glm"):
+            start = time.perf_counter()
+            response = client.chat.completions.create(
+                model=model or MODEL_NAMES["glm"],
+                messages=_chat_messages(system_prompt, user_input, history),
+                stream=bool(on_chunk),
+                **_json_mode_options("glm"),
+            )
+            if on_chunk:
+                return _collect_stream(_chat_chunks(response, "glm"), on_chunk, "glm", start)
+            _record_chat_usage("glm", getattr(response, "usage", None))
+            return response.choices[0].message.content
     except Exception as e:
         return f"[GLM API ERROR] {e}"
 
-def analyze_with_openrouter(user_input, api_key):
+def analyze_with_openrouter(user_input, api_key, on_chunk=None, model=None, history=None):
     if not HAS_OPENAI:
         return "[ERROR] `openai` library not found. Please run: pip install openai"
     
     try:
-        # OpenRouter uses the OpenAI client but with a specific base URL
-        client = OpenAI(
-            base_url="https://openrouter.ai/api/v1",
-            api_key=api_key,
-        )
-        system_prompt = get_system_prompt()
+        with span("connect", "openrouter"):
+            client = get_client("openrouter", api_key)
+        system_prompt = get_analysis_prompt()
         
-        response = client.chat.completions.create(
-            model="deepseek/deepseek-v3.2", # OpenRouter requires vendor prefix usually, or maps standard names
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_input},
-            ],
-            extra_headers={
-                "HTTP-Referer": "https://github.com/TestPilot/MVP", # Required/Recommended by OpenRouter
-                "X-Title": "TestPilot MVP",
-            },
-        )
-        return response.choices[0].message.content
+        model = model or MODEL_NAMES["openrouter"] # OpenRouter model ids carry the vendor prefix
+        with span("request", "openrouter"):
+            start = time.perf_counter()
+            response = client.chat.completions.create(
+                model=model,
+                messages=_chat_messages(system_prompt, user_input, history, model),
+                extra_headers={
+                    "HTTP-Referer": "https://github.com/TestPilot/MVP", # Required/Recommended by OpenRouter
+                    "X-Title": "TestPilot MVP",
+                },
+                extra_body={"usage": {"include": True}}, # Usage with cached-token details, also when streaming
+                stream=bool(on_chunk),
+                **_json_mode_options("openrouter"),
+            )
+            if on_chunk:
+                return _collect_stream(_chat_chunks(response, "openrouter"), on_chunk, "openrouter", start)
+            _record_chat_usage("openrouter", getattr(response, "usage", None))
+            return response.choices[0].message.content
     except Exception as e:
         return f"[OPENROUTER API ERROR] {e}"
 
 
+def call_provider(user_input, provider, api_keys, on_chunk=None, history=None):
+    """
+    Calls the provider function through its gate (concurrency cap, RPM limit, retries on 429/5xx),
+    with the model tier select_model picks for this input (and the session history sent with it).
+    With on_chunk, the response is streamed to it as it arrives.
+    """
+    if provider == "gemini":
+        fn, key = analyze_with_gemini, api_keys.get('gemini')
+    elif provider == "glm":
+        fn, key = analyze_with_glm, api_keys.get('glm')
+    else:
+        fn, key = analyze_with_openrouter, api_keys.get('openai')
+    context = _history_text(history) + user_input
+    tier, model = select_model(provider, context)
+    MODEL_SELECTIONS.inc(provider=provider, tier=tier, model=model)
+    if model != MODEL_NAMES[provider]:
+        print(f"[MODEL] {provider.upper()}: using {tier}-tier {model} instead of {MODEL_NAMES[provider]} (~{estimate_tokens(context)} input tokens)")
+    gate = get_provider_gate(provider)
+    BYTES_SENT.inc(len(get_analysis_prompt().encode("utf-8")) + len(context.encode("utf-8")), provider=provider)
+    options = {"history": history} if history else {}
+    # "provider" includes waiting for the gate and retries; "request" (inside fn) is the network call alone
+    with span("provider", provider):
+        if not on_chunk:
+            response = gate.call(fn, user_input, key, model=model, **options)
+        else:
+            # Once text has been streamed out, a retry would repeat it; only retry failures before the first chunk
+            streamed = []
+            def forward(text):
+                streamed.append(True)
+                on_chunk(text)
+            response = gate.call(fn, user_input, key, on_chunk=forward, model=model, **options,
+                                 should_retry=lambda result: not streamed and gate.should_retry(result))
+    PROVIDER_CALLS.inc(provider=provider, outcome="error" if is_error_response(response) else "ok")
+    if isinstance(response, str):
+        BYTES_RECEIVED.inc(len(response.encode("utf-8")), provider=provider)
+    return response
+
+def _history_text(history):
+    return "".join(message["content"] for message in history or ())
+
+class AnalysisTrace:
+    """Cache hits/misses and answering providers and models for one top-level analysis, filled in by run_analysis."""
+
+    def __init__(self):
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.providers = set()
+        self.models = set()
+        self._lock = threading.Lock()
+
+    def record(self, provider, model, cache_hit=None):
+        with self._lock:
+            self.providers.add(provider)
+            self.models.add(model)
+            if cache_hit is True:
+                self.cache_hits += 1
+            elif cache_hit is False:
+                self.cache_misses += 1
+
+    @property
+    def cache_status(self):
+        if self.cache_hits and self.cache_misses:
+            return "partial"
+        if self.cache_hits:
+            return "hit"
+        return "miss" if self.cache_misses else "off"
+
+# The trace of the analysis running in this context (None until start_trace() is called)
+_TRACE = contextvars.ContextVar("testpilot_trace", default=None)
+
+def start_trace():
+    """Starts a new trace for the top-level analysis about to run in this context and returns it."""
+    trace = AnalysisTrace()
+    _TRACE.set(trace)
+    return trace
+
+def configured_providers(api_keys, primary):
+    """The selected provider first, then every other provider that has an API key and an installed SDK."""
+    installed = {"gemini": HAS_GENAI, "glm": HAS_GLM, "openrouter": HAS_OPENAI}
+    others = [p for p in PROVIDER_ORDER if p != primary and api_keys.get(PROVIDER_KEY_NAMES[p]) and installed[p]]
+    return [primary] + others
+
+def route_request(user_input, provider, api_keys, on_chunk=None, history=None):
+    """
+    Sends the request through the router: failover to the other configured providers on errors,
+    and (unless streaming) a hedged second request when the provider is slower than its p95.
+    Returns (response, provider that produced it).
+    """
+    providers = configured_providers(api_keys, provider)
+    if not FAILOVER:
+        return call_provider(user_input, provider, api_keys, on_chunk=on_chunk, history=history), provider
+
+    router = get_router()
+    if not on_chunk:
+        return router.call(providers, lambda p: call_provider(user_input, p, api_keys, history=history))
+
+    # Streamed text can't be taken back, so only fail over before the first chunk
+    streamed = []
+    def forward(text):
+        streamed.append(True)
+        on_chunk(text)
+    return router.call_in_order(providers, lambda p: call_provider(user_input, p, api_keys, on_chunk=forward, history=history),
+                                can_failover=lambda: not streamed)
+
+def run_analysis(user_input, model_name, api_keys, use_cache=True, on_chunk=None):
+    """
+    Sends the input to the selected provider and returns the AI response string.
+    Identical (input, system prompt, provider, model) requests are served from the response cache.
+    If on_chunk is given, text is passed to it as it streams in (a cache hit arrives as one chunk).
+    """
+    provider = normalize_provider(model_name)
+    _, model = select_model(provider, user_input)
+    cache = get_response_cache() if use_cache else None
+
+    if cache:
+        start = time.perf_counter()
+        with span("cache", provider):
+            key = ResponseCache.make_key(user_input, get_analysis_prompt(), provider, model)
+            cached = cache.get(key)
+        CACHE_LOOKUPS.inc(provider=provider, result="miss" if cached is None else "hit")
+        if cached is not None:
+            print(f"\n[CACHE] Hit for {provider.upper()} ({(time.perf_counter() - start) * 1000:.1f} ms)\n")
+            if trace := _TRACE.get():
+                trace.record(provider, model, cache_hit=True)
+            if on_chunk:
+                on_chunk(cached)
+            return cached
+
+    print(f"\nAnalyzing (via {model_name.upper()}, {model})...\n")
+    response, used = route_request(user_input, provider, api_keys, on_chunk=on_chunk)
+    if used != provider: # Cache and trace the answer under the failover provider and the model tier it used
+        provider = used
+        _, model = select_model(used, user_input)
+        key = ResponseCache.make_key(user_input, get_analysis_prompt(), provider, model) if cache else None
+    if trace := _TRACE.get():
+        trace.record(provider, model, cache_hit=False if cache else None)
+
+    if cache and not is_error_response(response):
+        cache.set(key, response, provider=provider, model=model)
+    return response
+
+class ChatSession:
+    """
+    Interactive conversation with one provider. The first message is a normal (cached) analysis;
+    follow-ups go out with a summary of the earlier turns plus the last exchange instead of as
+    one-shot requests, so "now check this fix" only needs the fix pasted.
+    """
+
+    def __init__(self, model_name, api_keys, use_cache=True, max_turns=SESSION_TURNS, max_tokens=SESSION_HISTORY_TOKENS):
+        self.model_name = model_name
+        self.provider = normalize_provider(model_name)
+        self.api_keys = api_keys
+        self.use_cache = use_cache
+        self.conversation = Conversation(max_turns, max_tokens)
+
+    def send(self, user_input, on_chunk=None):
+        """Returns the reply to user_input in the context of the conversation so far."""
+        history = self.conversation.messages()
+        if not history:
+            response = run_analysis(user_input, self.model_name, self.api_keys, use_cache=self.use_cache, on_chunk=on_chunk)
+        else:
+            summarized = f", {self.conversation.summarized} summarized" if self.conversation.summarized else ""
+            print(f"\n[SESSION] Follow-up #{len(self.conversation)} (~{estimate_tokens(_history_text(history))} history tokens{summarized})\n")
+            response, _ = route_request(user_input, self.provider, self.api_keys, on_chunk=on_chunk, history=history)
+        if not is_error_response(response):
+            self.conversation.add(user_input, response)
+        return response
+
+    def reset(self):
+        self.conversation.clear()
+
+def print_cache_stats():
+    stats = get_response_cache().stats()
+    print(f"Cache: {stats['hits']} hit(s), {stats['misses']} miss(es)")
+
+
+def merge_responses(sections):
+    """
+    Joins per-file responses [(rel_path, response), ...] into one document.
+    Each response keeps its own issue blocks, so parse_ai_response still finds all of them.
+    """
+    return "\n\n".join(f"## FILE: {rel_path}\n\n{response.strip()}" for rel_path, response in sections)
+
+
+def analyze_concurrently(inputs, model_name, api_keys, use_cache=True):
+    """
+    Runs run_analysis over many inputs on a thread pool sized to the provider's concurrency cap.
+    Returns the responses in input order (same strings as a single analysis).
+    """
+    if not inputs:
+        return []
+    gate = get_provider_gate(normalize_provider(model_name))
+    workers = max(1, min(gate.max_concurrency, len(inputs)))
+    # Each worker runs in a copy of the caller's context, so batch-mode traces see every request
+    contexts = [contextvars.copy_context() for _ in inputs]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(lambda ctx, text: ctx.run(run_analysis, text, model_name, api_keys, use_cache=use_cache), contexts, inputs))
+
+def format_folder_input(project_name, files):
+    """Builds the folder-mode prompt from [(rel_path, content), ...]."""
+    return "\n".join(f"PROJECT: {project_name}\nFILE: {rel_path}\n{content}\n" for rel_path, content in files)
+
+def analyze_in_batches(files, project_name, model_name, api_keys, use_cache=True, on_chunk=None):
+    """
+    Packs folder files into batches under the provider's token budget and analyzes them concurrently.
+    Small projects still go out as one request (streamed to on_chunk if given); larger ones get one merged response.
+    """
+    provider = normalize_provider(model_name)
+    with span("prompt"):
+        budget = max(TOKEN_BUDGETS[provider] - estimate_tokens(get_analysis_prompt()), 1000)
+        batches = pack_batches(files, budget)
+        inputs = [format_folder_input(project_name, batch) for batch in batches]
+    if len(batches) == 1:
+        return run_analysis(inputs[0], model_name, api_keys, use_cache=use_cache, on_chunk=on_chunk)
+
+    print(f"[BATCH] {len(files)} file(s) split into {len(batches)} batch(es)")
+    responses = analyze_concurrently(inputs, model_name, api_keys, use_cache=use_cache)
+
+    errors = [r for r in responses if is_error_response(r)]
+    if len(errors) == len(responses):
+        return errors[0]
+    for error in errors:
+        print(f"[WARN] A batch failed and was left out: {error}")
+    with span("merge"):
+        # A batch holding a single file (or parts of one) is attributed to it, like a per-file response
+        attributed = [merge_responses([(batch_file(batch), r)]) if batch_file(batch) else r
+                      for batch, r in zip(batches, responses) if not is_error_response(r)]
+        return merge_batch_responses(attributed)
+
+def analyze_files_parallel(files, project_name, model_name, api_keys, use_cache=True):
+    """
+    Analyzes each folder file as its own request, concurrently, and merges the results per file.
+    Failed files are reported and left out unless every file failed.
+    """
+    with span("prompt"):
+        inputs = [format_folder_input(project_name, [(rel_path, content)]) for rel_path, content in files]
+    print(f"[PARALLEL] {len(files)} file(s)")
+    responses = analyze_concurrently(inputs, model_name, api_keys, use_cache=use_cache)
+
+    sections = []
+    errors = []
+    for (rel_path, _), response in zip(files, responses):
+        if is_error_response(response):
+            errors.append(response)
+            print(f"[WARN] Analysis failed for {rel_path}: {response}")
+        else:
+            sections.append((rel_path, response))
+    if not sections:
+        return errors[0]
+    with span("merge"):
+        return merge_responses(sections)
+
+
+def prescan_files(files, mode):
+    """
+    Runs the local static pre-pass over the Python files in [(rel_path, content), ...].
+    Returns (files_to_send, local_reports); other file types always pass through.
+      full:       every file still goes to the AI, local findings are added to the result
+      skip-clean: Python files with no local findings are not sent to the AI
+      regions:    like skip-clean, and flagged files are reduced to the flagged regions
+    """
+    to_send = []
+    local_reports = []
+    for rel_path, content in files:
+        if mode == "off" or not rel_path.endswith(".py"):
+            to_send.append((rel_path, content))
+            continue
+        findings = static_check.check_python(content, rel_path)
+        if findings:
+            local_reports.append(merge_responses([(rel_path, static_check.format_findings(rel_path, findings))]))
+        if mode == "full":
+            to_send.append((rel_path, content))
+        elif findings and mode == "regions":
+            to_send.append((rel_path, static_check.extract_regions(content, findings)))
+        elif findings:
+            to_send.append((rel_path, content))
+    if mode != "off":
+        print(f"[PRESCAN] {len(local_reports)} file(s) with local findings, {len(files) - len(to_send)} clean file(s) not sent")
+    return to_send, local_reports
+
+def combine_with_local(local_reports, response):
+    """Adds local pre-pass findings to an AI response (AI errors are returned as-is)."""
+    if not local_reports or is_error_response(response):
+        return response
+    return merge_batch_responses(local_reports + [response])
+
+
 # --- Main CLI ---
 
-def analyze_path(path_arg, model_name, api_keys, is_folder=False):
+def iter_folder_files(path_arg):
+    """Yields (file_path, rel_path, stat) for every code file under path_arg (see walker.walk_project)."""
+    return walk_project(path_arg, VALID_EXTENSIONS)
+
+def _check_manifest(manifest, file_path, rel_path, st):
+    """
+    Looks a file up in the project manifest: returns (findings, None) when stored findings still apply
+    (unchanged stat or identical content), (None, pending) with pending = (rel_path, st, content_hash, content)
+    when it must be analyzed, or (None, None) if it cannot be read as text.
+    """
+    findings = manifest.findings_if_unchanged(rel_path, st)
+    if findings is not None:
+        return findings, None
+    try:
+        content = read_text_file(file_path)
+    except Exception as e:
+        print(f"[WARN] Skipped file {rel_path}: {e}")
+        return None, None
+    if content is None:
+        print(f"[WARN] Skipped file {rel_path}: binary or not UTF-8")
+        return None, None
+    content_hash = hash_content(content)
+    findings = manifest.findings_for_hash(rel_path, content_hash)
+    if findings is None:
+        return None, (rel_path, st, content_hash, content)
+    manifest.record(rel_path, st, content_hash, findings)
+    return findings, None
+
+def _analyze_pending(manifest, project_name, pending, model_name, api_keys, use_cache=True):
+    """
+    Analyzes manifest-pending files concurrently, one request per file, and records each success.
+    Returns ({rel_path: findings} for the files that succeeded, first error response or None).
+    """
+    with span("prompt"):
+        inputs = [format_folder_input(project_name, [(rel_path, content)]) for rel_path, _, _, content in pending]
+    responses = analyze_concurrently(inputs, model_name, api_keys, use_cache=use_cache)
+    results = {}
+    error = None
+    for (rel_path, st, content_hash, _), response in zip(pending, responses):
+        if is_error_response(response):
+            error = error or response
+            continue
+        manifest.record(rel_path, st, content_hash, response)
+        results[rel_path] = response
+    return results, error
+
+def open_manifest(path_arg, model_name):
+    provider = normalize_provider(model_name)
+    prompt_key = ResponseCache.make_key("", get_analysis_prompt(), provider, model_signature(provider))
+    return FolderManifest(path_arg, MANIFEST_DIR, prompt_key)
+
+def analyze_folder_incremental(path_arg, model_name, api_keys, use_cache=True):
+    """
+    Folder analysis that only sends added/modified files.
+    Findings for unchanged files come from the project manifest and are merged per file.
+    """
+    project_name = os.path.basename(os.path.abspath(path_arg))
+    manifest = open_manifest(path_arg, model_name)
+
+    findings_by_path = {}
+    pending = [] # (rel_path, st, content_hash, content) for added/modified files
+    with span("walk"): # Stats every file; reads and hashes only those whose size or mtime changed
+        for file_path, rel_path, st in iter_folder_files(path_arg):
+            findings, item = _check_manifest(manifest, file_path, rel_path, st)
+            if item:
+                pending.append(item)
+            if findings is not None or item:
+                findings_by_path[rel_path] = findings
+
+    # Only added/modified files go to the provider, concurrently
+    results, error = _analyze_pending(manifest, project_name, pending, model_name, api_keys, use_cache=use_cache)
+    findings_by_path.update(results)
+
+    manifest.prune(set(findings_by_path))
+    manifest.save() # Keeps progress for files that did succeed
+    if error:
+        return error
+
+    if not findings_by_path:
+        return "[WARN] No valid code files found in the folder."
+    print(f"[INCREMENTAL] {len(pending)} file(s) analyzed, {len(findings_by_path) - len(pending)} unchanged")
+    return merge_responses(list(findings_by_path.items()))
+
+def refresh_files(manifest, path_arg, rel_paths, model_name, api_keys, use_cache=True):
+    """
+    Brings the manifest up to date for just `rel_paths` (watch mode): changed files are re-analyzed,
+    files whose content is unchanged keep their findings, and deleted or no-longer-eligible files are dropped.
+    rel_paths=None rescans the whole folder (after an inotify overflow); a path ending in os.sep is a removed folder.
+    Returns ({rel_path: findings} for re-analyzed files, [removed rel_paths], first error response or None).
+    """
+    root = os.path.abspath(path_arg)
+    if rel_paths is None:
+        rel_paths = {rel_path for _, rel_path, _ in iter_folder_files(root)} | set(manifest.files)
+    candidates = set()
+    for rel_path in rel_paths:
+        if rel_path.endswith(os.sep):
+            candidates.update(known for known in manifest.files if known.startswith(rel_path))
+        else:
+            candidates.add(rel_path)
+
+    pending = []
+    removed = []
+    for rel_path in sorted(candidates):
+        file_path = os.path.join(root, rel_path)
+        if not is_project_file(root, rel_path, VALID_EXTENSIONS):
+            if manifest.files.pop(rel_path, None) is not None:
+                removed.append(rel_path)
+            continue
+        try:
+            st = os.stat(file_path)
+        except OSError:
+            continue # Deleted since the check; its own event follows
+        _, item = _check_manifest(manifest, file_path, rel_path, st)
+        if item:
+            pending.append(item)
+
+    results, error = _analyze_pending(manifest, os.path.basename(root), pending, model_name, api_keys, use_cache=use_cache)
+    manifest.save()
+    return results, removed, error
+
+def print_watch_update(changed, removed, parsed):
+    """Default watch-mode output: the new findings of each re-analyzed file, then a project total."""
+    if changed:
+        print(f"\n[WATCH] Re-analyzed: {', '.join(changed)}")
+        print_response(merge_responses(list(changed.items())))
+    if removed:
+        print(f"[WATCH] Removed: {', '.join(removed)}")
+    print(f"[WATCH] {len(parsed['issues'])} issue(s) in the project. Watching for changes (Ctrl+C to stop)...")
+
+def watch_folder(path_arg, model_name, api_keys, use_cache=True, debounce=WATCH_DEBOUNCE_SECONDS, on_update=None, stop=None, backend=WATCH_BACKEND):
+    """
+    Watch mode: an incremental analysis of the folder, then, on every debounced batch of saves,
+    re-analysis of only the files that changed. Untouched files keep their manifest findings.
+    on_update(changed, removed, parsed) is called after the first pass and each batch, with
+    {rel_path: raw findings} of re-analyzed files, removed rel_paths and the parsed whole-project
+    result (issue ids included when history is on); it defaults to printing. Runs until `stop` is set
+    (a threading.Event) or the process is interrupted.
+    """
+    if not os.path.isdir(path_arg):
+        return f"[ERROR] Folder not found or invalid: {path_arg}"
+    root = os.path.abspath(path_arg)
+    on_update = on_update or print_watch_update
+    # Open the watcher before the first pass, so saves made while it runs are not missed
+    watcher = open_watcher(root, VALID_EXTENSIONS, backend=backend, poll_interval=WATCH_POLL_SECONDS)
+    print(f"[WATCH] Watching {root} ({watcher.name})")
+    try:
+        manifest = open_manifest(root, model_name)
+        start_trace() # Each round's history entry names the models that answered in that round
+        changed, removed, error = refresh_files(manifest, root, None, model_name, api_keys, use_cache=use_cache)
+        if error:
+            print(f"[WARN] Some files could not be analyzed: {error}")
+        on_update(changed, removed, _watch_result(root, manifest, model_name))
+        for rel_paths in watch_changes(watcher, debounce=debounce, stop=stop):
+            start_trace()
+            changed, removed, error = refresh_files(manifest, root, rel_paths, model_name, api_keys, use_cache=use_cache)
+            if error:
+                print(f"[WARN] Some files could not be analyzed: {error}")
+            if changed or removed:
+                on_update(changed, removed, _watch_result(root, manifest, model_name))
+    finally:
+        watcher.close()
+    return None
+
+def _watch_result(root, manifest, model_name):
+    """Parses the manifest's findings into one project result and records it in the history store."""
+    sections = sorted((rel_path, entry["findings"]) for rel_path, entry in manifest.files.items())
+    parsed = parse_response(merge_responses(sections))
+    file_hashes = {os.path.join(root, rel_path): entry["hash"] for rel_path, entry in manifest.files.items()}
+    record_history(root, True, model_name, parsed, file_hashes=file_hashes)
+    return parsed
+
+def analyze_diff(path_arg, since, model_name, api_keys, use_cache=True):
+    """
+    Analyzes only what changed under path_arg since the git revision `since`.
+    Each changed file is sent as its hunks (with current line numbers) and the results are merged per file.
+    """
+    try:
+        changes = changed_regions(path_arg, since, VALID_EXTENSIONS)
+    except GitDiffError as e:
+        return f"[ERROR] git diff failed: {e}"
+    if not changes:
+        return f"[WARN] No code files changed since {since}."
+
+    project_name = os.path.basename(os.path.abspath(path_arg))
+    header = f"CHANGES SINCE {since} (only changed hunks shown; numbers are current line numbers, '+' added, '-' removed):\n"
+    print(f"[DIFF] {len(changes)} changed file(s) since {since}")
+    return analyze_files_parallel([(rel_path, header + text) for rel_path, text in changes], project_name, model_name, api_keys, use_cache=use_cache)
+
+def analyze_path(path_arg, model_name, api_keys, is_folder=False, use_cache=True, incremental=False, parallel=False, on_chunk=None, prescan="off", since=None):
     """
     Analyzes a file or folder path using the specified model.
     Returns the AI response string.
+    With incremental=True, folder mode analyzes files individually and skips unchanged ones.
+    With parallel=True, folder mode analyzes every file as its own concurrent request.
+    prescan selects the local static pre-pass for Python files (one of PRESCAN_MODES; not used by incremental mode).
+    With since set to a git revision, folder mode only analyzes the changes since that revision.
+    on_chunk receives streamed text for single-request analyses; multi-request folder runs only return the merged result.
     """
     if has_glm := api_keys.get('glm'): pass # ensure imports don't flag unused if only this function used
     
     # 1. Gather Content
-    full_content = []
-    
     if is_folder:
         if not os.path.exists(path_arg) or not os.path.isdir(path_arg):
              return f"[ERROR] Folder not found or invalid: {path_arg}"
         
+        if since:
+            return analyze_diff(path_arg, since, model_name, api_keys, use_cache=use_cache)
+        
+        if incremental:
+            try:
+                return analyze_folder_incremental(path_arg, model_name, api_keys, use_cache=use_cache)
+            except Exception as e:
+                return f"[ERROR] Failed to read folder: {e}"
+        
         project_name = os.path.basename(os.path.abspath(path_arg))
-        valid_extensions = {".py", ".js", ".html", ".css", ".java", ".cpp", ".c", ".h", ".ts", ".json"}
         
         try:
-            for root, dirs, files in os.walk(path_arg):
-                dirs[:] = [d for d in dirs if not d.startswith('.')] # Skip hidden
-                for file in files:
-                    _, ext = os.path.splitext(file)
-                    if ext.lower() not in valid_extensions:
-                        continue
-                    file_path = os.path.join(root, file)
-                    rel_path = os.path.relpath(file_path, path_arg)
-                    try:
-                        with open(file_path, "r", encoding="utf-8") as f:
-                            content = f.read()
-                            full_content.append(f"PROJECT: {project_name}\nFILE: {rel_path}\n{content}\n")
-                    except Exception as e:
-                        print(f"[WARN] Skipped file {rel_path}: {e}")
+            with span("walk"):
+                folder_files = collect_files(path_arg, VALID_EXTENSIONS)
             
-            if not full_content:
+            if not folder_files:
                 return "[WARN] No valid code files found in the folder."
             
-            final_input = "\n".join(full_content)
-            
         except Exception as e:
              return f"[ERROR] Failed to read folder: {e}"
 
+        with span("prescan"):
+            folder_files, local_reports = prescan_files(folder_files, prescan)
+        if not folder_files: # Every file was clean locally
+            return merge_batch_responses(local_reports) if local_reports else static_check.clean_report(project_name)
+
+        # 2. Call AI (per file, or batched if the project exceeds the provider's token budget)
+        if parallel:
+            response = analyze_files_parallel(folder_files, project_name, model_name, api_keys, use_cache=use_cache)
+        else:
+            response = analyze_in_batches(folder_files, project_name, model_name, api_keys, use_cache=use_cache, on_chunk=on_chunk)
+        return combine_with_local(local_reports, response)
+
     else: # File mode
         if not os.path.exists(path_arg):
             return f"[ERROR] File not found: {path_arg}"
         try:
-            with open(path_arg, "r", encoding="utf-8") as f:
+            with span("read"), open(path_arg, "r", encoding="utf-8") as f:
                 content = f.read()
             filename = os.path.basename(path_arg)
             _, ext = os.path.splitext(filename)
             file_type = ext.lstrip('.') if ext else "unknown"
-            final_input = f"FILE NAME: {filename}\nFILE TYPE: {file_type}\nFILE CONTENT:\n{content}"
         except Exception as e:
             return f"[ERROR] Could not read file: {e}"
 
+        with span("prescan"):
+            files, local_reports = prescan_files([(filename, content)], prescan)
+        if not files: # Clean locally; skip the AI
+            return static_check.clean_report(filename)
+        content = files[0][1]
+        final_input = f"FILE NAME: {filename}\nFILE TYPE: {file_type}\nFILE CONTENT:\n{content}"
+
     # 2. Call AI
-    print(f"\nAnalyzing (via {model_name.upper()})...\n")
-    if model_name == "gemini":
-        return analyze_with_gemini(final_input, api_keys['gemini'])
-    elif model_name == "glm":
-        return analyze_with_glm(final_input, api_keys['glm'])
+    response = run_analysis(final_input, model_name, api_keys, use_cache=use_cache, on_chunk=on_chunk)
+    return combine_with_local(local_reports, response)
+
+
+# --- Batch Mode ---
+
+def read_manifest(manifest_path):
+    """Paths listed in a batch manifest, one per line ('#' comments and blank lines skipped), without duplicates."""
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        entries = [line.strip() for line in f]
+    return list(dict.fromkeys(e for e in entries if e and not e.startswith("#")))
+
+def load_completed(output_path):
+    """Paths a previous run already finished (status ok or skipped). Lines torn by an interrupted run are ignored."""
+    completed = set()
+    if not os.path.exists(output_path):
+        return completed
+    with open(output_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if record.get("status") in ("ok", "skipped"):
+                completed.add(record.get("path"))
+    return completed
+
+def analyze_batch_entry(entry, base_dir, model_name, api_keys, use_cache=True, prescan="off"):
+    """Analyzes one manifest path and returns its JSONL record. Never raises."""
+    trace = start_trace()
+    path = entry if os.path.isabs(entry) else os.path.join(base_dir, entry)
+    is_folder = os.path.isdir(path)
+    start = time.perf_counter()
+    try:
+        response = analyze_path(path, model_name, api_keys, is_folder=is_folder, use_cache=use_cache, prescan=prescan)
+    except Exception as e:
+        response = f"[ERROR] {e}"
+    elapsed = time.perf_counter() - start
+
+    record = {
+        "path": entry,
+        "kind": "folder" if is_folder else "file",
+        "status": "ok",
+        "provider": ",".join(sorted(trace.providers)) or None,
+        "model": ",".join(sorted(trace.models)) or None,
+        "cache": trace.cache_status,
+        "seconds": round(elapsed, 3),
+        "finished_at": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "summary": "",
+        "issue_counts": {},
+        "issues": [],
+        "message": None,
+    }
+    if is_error_response(response) or response.strip().startswith("[WARN]"):
+        record["status"] = "error" if is_error_response(response) else "skipped"
+        record["message"] = response.strip()
+        return record
+    parsed = parse_response(response)
+    record["analysis_id"] = record_history(path, is_folder, model_name, parsed)
+    record["summary"] = parsed["summary"]
+    record["issues"] = parsed["issues"]
+    for issue in parsed["issues"]:
+        record["issue_counts"][issue["severity"]] = record["issue_counts"].get(issue["severity"], 0) + 1
+    return record
+
+def run_batch(manifest_path, model_name, api_keys, output_path=None, workers=MAX_CONCURRENCY, use_cache=True, prescan="off"):
+    """
+    Analyzes every path in the manifest on a worker pool, appending one JSON line per path to
+    output_path as results complete. Paths already recorded as done are skipped, so an
+    interrupted run picks up where it stopped. Relative paths are resolved against the manifest's folder.
+    Returns {status: count} for this run.
+    """
+    output_path = output_path or os.path.splitext(manifest_path)[0] + ".results.jsonl"
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+    entries = read_manifest(manifest_path)
+    completed = load_completed(output_path)
+    todo = [entry for entry in entries if entry not in completed]
+    print(f"[BATCH] {len(entries)} path(s): {len(entries) - len(todo)} already done, {len(todo)} to analyze with {workers} worker(s)")
+    print(f"[BATCH] Writing results to {output_path}")
+
+    counts = {}
+    if not todo:
+        return counts
+    # Start on a fresh line if the previous run died mid-write
+    if os.path.exists(output_path) and os.path.getsize(output_path):
+        with open(output_path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            needs_newline = f.read(1) != b"\n"
     else:
-        return analyze_with_openrouter(final_input, api_keys['openai'])
+        needs_newline = False
+
+    with open(output_path, "a", encoding="utf-8") as out, ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        if needs_newline:
+            out.write("\n")
+        futures = [
+            pool.submit(contextvars.copy_context().run, analyze_batch_entry, entry, base_dir, model_name, api_keys, use_cache, prescan)
+            for entry in todo
+        ]
+        for done, future in enumerate(as_completed(futures), 1):
+            record = future.result()
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            out.flush()
+            counts[record["status"]] = counts.get(record["status"], 0) + 1
+            print(f"[BATCH] {done}/{len(todo)} {record['status']:<7} {record['path']} "
+                  f"({record['seconds']:.1f}s, {len(record['issues'])} issue(s), cache {record['cache']})")
+    return counts
+
+
+class StreamPrinter:
+    """on_chunk callback for the CLI: prints the response header on the first chunk, then text as it arrives."""
+
+    def __init__(self):
+        self.started = False
+
+    def __call__(self, text):
+        if not self.started:
+            print("--- AI Response ---")
+            self.started = True
+        try:
+            sys.stdout.write(text)
+        except UnicodeEncodeError:
+            sys.stdout.write(text.encode('utf-8', errors='ignore').decode('utf-8'))
+        sys.stdout.flush()
+
+def print_response(response, printer=None):
+    """Prints a finished response, unless it was already streamed by `printer`."""
+    if printer and printer.started:
+        print()
+        if is_error_response(response): # Stream broke off part way
+            print(response)
+    else:
+        print("--- AI Response ---")
+        try:
+            print(response)
+        except UnicodeEncodeError:
+            print(response.encode('utf-8', errors='ignore').decode('utf-8'))
+    print("-------------------\n")
 
 
 def main():
+    global OUTPUT_FORMAT, FAILOVER
     parser = argparse.ArgumentParser(description="TestPilot - AI Software Testing & Debugging Agent")
     parser.add_argument("--file", "-f", help="Path to the file to analyze")
     parser.add_argument("--folder", help="Path to the folder to analyze")
+    parser.add_argument("--batch", metavar="MANIFEST", help="Analyze every file/folder listed in MANIFEST (one per line), writing JSON lines")
+    parser.add_argument("--batch-output", metavar="PATH", help="Batch mode: JSONL output file (default: <manifest>.results.jsonl); existing results are resumed")
+    parser.add_argument("--workers", type=int, default=MAX_CONCURRENCY, help="Batch mode: paths analyzed at once")
+    parser.add_argument("--model", choices=sorted(PROVIDER_KEY_NAMES), help="Provider to use, skipping the selection menu")
+    parser.add_argument("--watch", metavar="FOLDER", help="Analyze FOLDER, then re-analyze only the files that change on every save until interrupted")
+    parser.add_argument("--debounce", type=float, default=WATCH_DEBOUNCE_SECONDS, help="Watch mode: seconds without saves before changes are analyzed")
+    parser.add_argument("--incremental", action="store_true", help="Folder mode: only re-analyze files changed since the last run")
+    parser.add_argument("--parallel", action="store_true", help="Folder mode: analyze each file as its own request, concurrently")
+    parser.add_argument("--since", metavar="REV", help="Folder mode: only analyze changes since this git revision (defaults the folder to '.')")
+    parser.add_argument("--prescan", choices=PRESCAN_MODES, default="off",
+                        help="Local static pre-pass for Python files: add findings (full), skip clean files (skip-clean), or also send only flagged regions (regions)")
+    parser.add_argument("--output-format", choices=OUTPUT_FORMATS, default=OUTPUT_FORMAT,
+                        help="Ask providers for the markdown report or schema-constrained JSON (default from TESTPILOT_OUTPUT_FORMAT)")
+    parser.add_argument("--no-stream", action="store_true", help="Print the response only once it is complete")
+    parser.add_argument("--no-failover", action="store_true", help="Only use the selected provider: no hedging or failover to other configured providers")
+    parser.add_argument("--profile", action="store_true", help="Print time spent per stage (walk, prompt, provider, parse, ...) before exiting")
+    parser.add_argument("--no-cache", action="store_true", help="Always call the AI provider, bypassing the response cache")
     args = parser.parse_args()
+    if args.since and not args.folder:
+        args.folder = "."
+    OUTPUT_FORMAT = args.output_format
+    FAILOVER = FAILOVER and not args.no_failover
+    if args.profile:
+        atexit.register(lambda: print("\n" + profile_summary())) # Covers every mode, including Ctrl+C exits
 
     print("Welcome to TestPilot - AI Testing & Debugging Agent")
     print("---------------------------------------------------")
@@ -245,94 +1321,117 @@ def main():
     
     # Selection Menu
     available_options = []
+    missing = " (SDK not installed)"
     if keys.get('gemini'):
-        available_options.append(("Gemini", "1"))
+        available_options.append(("Gemini" + ("" if HAS_GENAI else missing), "1"))
     if keys.get('glm'):
-        available_options.append(("GLM (ZhipuAI)", "2"))
+        available_options.append(("GLM (ZhipuAI)" + ("" if HAS_GLM else missing), "2"))
     if keys.get('openai'):
-        available_options.append(("OpenRouter", "3"))
+        available_options.append(("OpenRouter" + ("" if HAS_OPENAI else missing), "3"))
         
     if not available_options:
         print("[ERROR] No API keys found in Api.md or environment.")
         print("Please check your Api.md file.")
         return
 
-    print("Select AI Model:")
-    for name, code in available_options:
-        print(f"[{code}] {name}")
+    if args.model:
+        if not keys.get(PROVIDER_KEY_NAMES[args.model]):
+            print(f"[ERROR] No API key configured for {args.model}.")
+            return
+        selected_model_name = args.model
+    else:
+        print("Select AI Model:")
+        for name, code in available_options:
+            print(f"[{code}] {name}")
     
-    selected_model_code = None
-    selected_model_name = None
+        selected_model_code = None
+        selected_model_name = None
     
-    while not selected_model_code:
-        choice = input("Choice: ").strip()
-        if choice == "1" and keys.get('gemini'):
-             selected_model_name = "gemini"
-             selected_model_code = "1"
-        elif choice == "2" and keys.get('glm'):
-             selected_model_name = "glm"
-             selected_model_code = "2"
-        elif choice == "3" and keys.get('openai'):
-             selected_model_name = "openrouter"
-             selected_model_code = "3"
-        else:
-             print("Invalid choice. Try again.")
+        while not selected_model_code:
+            choice = input("Choice: ").strip()
+            if choice == "1" and keys.get('gemini'):
+                 selected_model_name = "gemini"
+                 selected_model_code = "1"
+            elif choice == "2" and keys.get('glm'):
+                 selected_model_name = "glm"
+                 selected_model_code = "2"
+            elif choice == "3" and keys.get('openai'):
+                 selected_model_name = "openrouter"
+                 selected_model_code = "3"
+            else:
+                 print("Invalid choice. Try again.")
 
     print(f"\nUsing {selected_model_name.upper()}...")
 
+    # Batch Mode
+    if args.batch:
+        counts = run_batch(args.batch, selected_model_name, keys, output_path=args.batch_output, workers=args.workers,
+                           use_cache=not args.no_cache, prescan=args.prescan)
+        print(f"[BATCH] Finished: {', '.join(f'{n} {status}' for status, n in sorted(counts.items())) or 'nothing to do'}")
+        if not args.no_cache:
+            print_cache_stats()
+        return
+
+    # Watch Mode
+    if args.watch:
+        try:
+            error = watch_folder(args.watch, selected_model_name, keys, use_cache=not args.no_cache, debounce=args.debounce)
+        except KeyboardInterrupt:
+            error = None
+            print("\n[WATCH] Stopped.")
+        if error:
+            print(error)
+        if not args.no_cache:
+            print_cache_stats()
+        return
+
     # Folder Mode
     if args.folder:
-        response = analyze_path(args.folder, selected_model_name, keys, is_folder=True)
-        print("--- AI Response ---")
-        try:
-            print(response)
-        except UnicodeEncodeError:
-            print(response.encode('utf-8', errors='ignore').decode('utf-8'))
-        print("-------------------\n")
+        start_trace()
+        printer = None if args.no_stream else StreamPrinter()
+        response = analyze_path(args.folder, selected_model_name, keys, is_folder=True, use_cache=not args.no_cache, incremental=args.incremental, parallel=args.parallel, on_chunk=printer, prescan=args.prescan, since=args.since)
+        print_response(response, printer)
+        if not is_error_response(response):
+            record_history(args.folder, True, selected_model_name, parse_response(response))
+        if not args.no_cache:
+            print_cache_stats()
         return
 
     # File Mode
     if args.file:
-        response = analyze_path(args.file, selected_model_name, keys, is_folder=False)
-        print("--- AI Response ---")
-        try:
-            print(response)
-        except UnicodeEncodeError:
-            print(response.encode('utf-8', errors='ignore').decode('utf-8'))
-        print("-------------------\n")
+        start_trace()
+        printer = None if args.no_stream else StreamPrinter()
+        response = analyze_path(args.file, selected_model_name, keys, is_folder=False, use_cache=not args.no_cache, on_chunk=printer, prescan=args.prescan)
+        print_response(response, printer)
+        if not is_error_response(response):
+            record_history(args.file, False, selected_model_name, parse_response(response))
+        if not args.no_cache:
+            print_cache_stats()
         return
 
     # Interactive Mode
+    session = ChatSession(selected_model_name, keys, use_cache=not args.no_cache)
+    print("Follow-up messages continue the conversation; send 'NEW' to start over.")
     while True:
         user_input = get_multiline_input()
         if user_input is None:
             print("Exiting...")
+            if not args.no_cache:
+                print_cache_stats()
             break
         
         if not user_input.strip():
             continue
 
-        # For interactive mode, we just pass the text directly. 
-        # But analyze_path expects a path. We can just use the underlying functions directly or strip that logic out? 
-        # The prompt asked to extract "core logic" into a callable function implementation.
-        # Let's just call the underlying analyze_with_X directly for interactive mode to avoid complexity,
-        # OR format it as a "text content" if we wanted to reuse analyze_path, but analyze_path takes a path.
-        # So sticking to direct calls for interactive mode is cleaner.
-        
-        print(f"\nAnalyzing (via {selected_model_name.upper()})...\n")
-        if selected_model_name == "gemini":
-            response = analyze_with_gemini(user_input, keys['gemini'])
-        elif selected_model_name == "glm":
-            response = analyze_with_glm(user_input, keys['glm'])
-        else:
-            response = analyze_with_openrouter(user_input, keys['openai'])
-            
-        print("--- AI Response ---")
-        try:
-            print(response)
-        except UnicodeEncodeError:
-             print(response.encode('utf-8', errors='ignore').decode('utf-8'))
-        print("-------------------\n")
+        if user_input.strip().upper() == "NEW":
+            session.reset()
+            print("[SESSION] Started a new conversation.\n")
+            continue
+
+        # Follow-ups are answered in the context of the earlier snippets (see ChatSession)
+        printer = None if args.no_stream else StreamPrinter()
+        response = session.send(user_input, on_chunk=printer)
+        print_response(response, printer)
 
 if __name__ == "__main__":
     main()
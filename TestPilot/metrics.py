@@ -0,0 +1,182 @@
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+
+# Seconds; wide enough for both sub-millisecond parsing and multi-minute folder requests
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=""):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic counter with labels, e.g. COUNTER.inc(len(data), provider="glm")."""
+
+    kind = "counter"
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def total(self):
+        with self._lock:
+            return sum(self._values.values())
+
+    def render(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_labels(self.labelnames, key)} {_number(value)}" for key, value in items]
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+
+class Histogram:
+    """
+    Prometheus-style histogram with labels. Besides buckets, sum and count it keeps the
+    maximum per series, which the --profile summary reports.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # label values -> [per-bucket counts (+Inf last), sum, count, max]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0, 0.0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+            series[3] = max(series[3], value)
+
+    def series(self):
+        """[(labels dict, sum, count, max), ...] for every series observed so far."""
+        with self._lock:
+            return [(dict(zip(self.labelnames, key)), s[1], s[2], s[3]) for key, s in sorted(self._series.items())]
+
+    def render(self):
+        with self._lock:
+            items = [(key, list(s[0]), s[1], s[2]) for key, s in sorted(self._series.items())]
+        lines = []
+        for key, counts, total, count in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                le = 'le="' + _number(bound) + '"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {count}")
+        return lines
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+
+class Registry:
+    """All metrics of the process, rendered together in the Prometheus text format (version 0.0.4)."""
+
+    def __init__(self):
+        self.metrics = []
+
+    def counter(self, name, help_text, labelnames=()):
+        metric = Counter(name, help_text, labelnames)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        metric = Histogram(name, help_text, labelnames, buckets)
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        for metric in self.metrics:
+            metric.reset()
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "testpilot_stage_seconds",
+    "Time spent in each analysis stage (walk, read, prescan, prompt, cache, provider, request, first_token, parse, merge).",
+    ("stage", "provider"),
+)
+HTTP_SECONDS = REGISTRY.histogram(
+    "testpilot_http_request_seconds",
+    "Web UI request handling time until the response starts (for streams: until the first byte).",
+    ("route", "method", "status"),
+)
+BYTES_SENT = REGISTRY.counter("testpilot_provider_bytes_sent_total", "Prompt bytes (system prompt plus input) sent to providers.", ("provider",))
+BYTES_RECEIVED = REGISTRY.counter("testpilot_provider_bytes_received_total", "Response bytes received from providers.", ("provider",))
+PROVIDER_CALLS = REGISTRY.counter("testpilot_provider_calls_total", "Provider calls by outcome (ok or error).", ("provider", "outcome"))
+MODEL_SELECTIONS = REGISTRY.counter("testpilot_model_selections_total", "Provider requests by the model tier picked for their size.", ("provider", "tier", "model"))
+PROMPT_TOKENS = REGISTRY.counter("testpilot_provider_prompt_tokens_total", "Prompt tokens reported by providers.", ("provider",))
+CACHED_PROMPT_TOKENS = REGISTRY.counter("testpilot_provider_cached_prompt_tokens_total", "Prompt tokens providers served from their prefix cache.", ("provider",))
+CACHE_LOOKUPS = REGISTRY.counter("testpilot_cache_lookups_total", "Response cache lookups by result (hit or miss).", ("provider", "result"))
+
+
+@contextmanager
+def span(stage, provider=""):
+    """Times the enclosed block into testpilot_stage_seconds{stage, provider}."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage=stage, provider=provider)
+
+
+def profile_summary():
+    """Per-stage timing table for the CLI's --profile flag."""
+    rows = STAGE_SECONDS.series()
+    if not rows:
+        return "[PROFILE] No stages recorded."
+    lines = ["[PROFILE] Time per stage", f"{'stage':<12} {'provider':<11} {'calls':>6} {'total s':>9} {'mean ms':>10} {'max ms':>10}"]
+    for labels, total, count, longest in sorted(rows, key=lambda row: -row[1]):
+        lines.append(f"{labels['stage']:<12} {labels['provider'] or '-':<11} {count:>6} {total:>9.3f} {total / count * 1000:>10.1f} {longest * 1000:>10.1f}")
+    lines.append(f"Sent {BYTES_SENT.total() / 1024:.1f} KB to providers, received {BYTES_RECEIVED.total() / 1024:.1f} KB")
+    if PROMPT_TOKENS.total():
+        lines.append(f"Prompt tokens: {PROMPT_TOKENS.total()}, {CACHED_PROMPT_TOKENS.total()} served from provider caches "
+                     f"({CACHED_PROMPT_TOKENS.total() / PROMPT_TOKENS.total():.0%})")
+    return "\n".join(lines)
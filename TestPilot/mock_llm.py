@@ -0,0 +1,202 @@
+"""
+Local stand-in for an OpenAI-compatible chat completions API, for benchmarking TestPilot
+without API keys or network access.
+
+Point the OpenRouter or GLM path at it with the base-URL overrides:
+    python mock_llm.py --port 8099 --latency 0.3 --tokens-per-sec 300 --error-rate 0.05
+    TESTPILOT_OPENROUTER_BASE_URL=http://127.0.0.1:8099/v1 OPENAI_API_KEY=mock python main.py --file test.py
+    TESTPILOT_GLM_BASE_URL=http://127.0.0.1:8099/v1 GLM_API_KEY=mock.key python main.py --file test.py
+
+Replies are canned issue reports (one issue per FILE: in the prompt), in markdown or, when the
+request sets response_format, JSON. Streaming (stream=true) is sent as server-sent events.
+"""
+import re
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CHARS_PER_TOKEN = 4
+TOKENS_PER_CHUNK = 8  # Tokens per streamed delta
+MAX_ISSUES = 20
+
+
+def _files_in_prompt(messages):
+    text = "\n".join(str(m.get("content", "")) for m in messages if m.get("role") == "user")
+    return re.findall(r'^FILE: (.+)$', text, flags=re.MULTILINE) or ["input"]
+
+
+def build_reply(messages, as_json=False):
+    """A deterministic report with one MINOR issue per file named in the prompt."""
+    files = _files_in_prompt(messages)[:MAX_ISSUES]
+    issues = [{
+        "description": f"Possible None dereference in {name} (line {i * 3 + 1})",
+        "type": "runtime",
+        "severity": "MINOR",
+        "confidence": 70,
+        "line": i * 3 + 1,
+        "primary_failure": False,
+        "root_cause": "A value that may be None is used without a check.",
+        "fix": "Guard the value before use.",
+        "suggested_fix_code": None,
+    } for i, name in enumerate(files)]
+    if as_json:
+        return json.dumps({"summary": f"Mock analysis of {len(files)} file(s).", "issues": issues,
+                           "test_case": "N/A", "notes": ""})
+
+    out = ["**Problem Summary:**", f"Mock analysis of {len(files)} file(s).", "", "**List of Issues:**"]
+    for i, issue in enumerate(issues, 1):
+        out.append(f"{i}. **Issue Description**: {issue['description']}")
+        out.append(f"- **Type**: {issue['type']}")
+        out.append(f"- **Severity**: {issue['severity']} | **Confidence**: {issue['confidence']}%")
+        out.append(f"- **Root Cause**: {issue['root_cause']}")
+        out.append(f"- **Fix**: {issue['fix']}")
+        out.append("- **Suggested Fix (Optional)**: Not applicable.")
+        out.append("")
+    return "\n".join(out)
+
+
+class MockLLMServer:
+    """
+    Threaded mock server. `latency` is the delay (seconds) before the first token,
+    `tokens_per_sec` the generation rate after it, and `error_rate` the fraction of
+    completions answered with HTTP 429 or 500 instead.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.2, tokens_per_sec=200.0, error_rate=0.0, seed=None):
+        self.latency = latency
+        self.tokens_per_sec = tokens_per_sec
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.requests = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+        self._thread = None
+
+        server = self
+        class Handler(_Handler):
+            mock = server
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="mock-llm", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def next_outcome(self):
+        """Counts the request and returns an HTTP error status to fail it with, or None."""
+        with self._lock:
+            self.requests += 1
+            if self.random.random() >= self.error_rate:
+                return None
+            self.errors += 1
+            return self.random.choice((429, 500))
+
+
+class _Handler(BaseHTTPRequestHandler):
+    mock = None
+    protocol_version = "HTTP/1.1" # Keep-alive, like the real APIs
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/models"):
+            self._send_json(200, {"object": "list", "data": [{"id": "mock-model", "object": "model", "owned_by": "testpilot"}]})
+        else:
+            self._send_json(404, {"error": {"message": "Not found", "type": "invalid_request_error"}})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            request = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            return self._send_json(400, {"error": {"message": "Invalid JSON body", "type": "invalid_request_error"}})
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            return self._send_json(404, {"error": {"message": "Not found", "type": "invalid_request_error"}})
+
+        mock = self.mock
+        time.sleep(mock.latency)
+        status = mock.next_outcome()
+        if status:
+            message = "Rate limit exceeded" if status == 429 else "Internal server error"
+            return self._send_json(status, {"error": {"message": f"[mock] {message}", "type": "mock_error", "code": status}})
+
+        messages = request.get("messages", [])
+        reply = build_reply(messages, as_json=bool(request.get("response_format")))
+        model = request.get("model", "mock-model")
+        completion_tokens = len(reply) // CHARS_PER_TOKEN + 1
+        prompt_tokens = sum(len(str(m.get("content", ""))) for m in messages) // CHARS_PER_TOKEN + 1
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens, "total_tokens": prompt_tokens + completion_tokens}
+        base = {"id": f"chatcmpl-mock-{mock.requests}", "created": int(time.time()), "model": model}
+
+        if not request.get("stream"):
+            time.sleep(completion_tokens / mock.tokens_per_sec)
+            return self._send_json(200, {**base, "object": "chat.completion", "usage": usage, "choices": [
+                {"index": 0, "message": {"role": "assistant", "content": reply}, "finish_reason": "stop"}]})
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close") # The stream ends when the body does
+        self.end_headers()
+        step = TOKENS_PER_CHUNK * CHARS_PER_TOKEN
+        for start in range(0, len(reply), step):
+            time.sleep(TOKENS_PER_CHUNK / mock.tokens_per_sec)
+            delta = {"content": reply[start:start + step]}
+            if start == 0:
+                delta["role"] = "assistant"
+            self._write_event({**base, "object": "chat.completion.chunk", "choices": [{"index": 0, "delta": delta, "finish_reason": None}]})
+        self._write_event({**base, "object": "chat.completion.chunk", "usage": usage,
+                           "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]})
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+        self.close_connection = True
+
+    def _write_event(self, payload):
+        self.wfile.write(f"data: {json.dumps(payload)}\n\n".encode("utf-8"))
+        self.wfile.flush()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock OpenAI-compatible LLM server for offline TestPilot benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency", type=float, default=0.2, help="Seconds before the first token")
+    parser.add_argument("--tokens-per-sec", type=float, default=200.0, help="Generation rate after the first token")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of completions answered with 429/500")
+    parser.add_argument("--seed", type=int, help="Random seed for reproducible error patterns")
+    args = parser.parse_args()
+
+    server = MockLLMServer(args.host, args.port, args.latency, args.tokens_per_sec, args.error_rate, args.seed)
+    print(f"Mock LLM listening on {server.url} (latency {args.latency}s, {args.tokens_per_sec} tok/s, error rate {args.error_rate})")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+import os
+import json
+import time
+import hashlib
+import threading
+
+# --- Configuration ---
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".testpilot_cache")
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024   # 64 MB on disk
+DEFAULT_TTL_SECONDS = 7 * 24 * 60 * 60  # 1 week
+
+
+class ResponseCache:
+    """
+    Content-addressed on-disk cache for AI responses.
+
+    Each entry is one JSON file named after the SHA-256 of
+    (provider, model, system prompt, content). The file mtime doubles as the
+    "last used" marker, so eviction drops the least recently used entries
+    once the directory grows past `max_bytes`. Entries older than
+    `ttl_seconds` are treated as misses and removed.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES, ttl_seconds=DEFAULT_TTL_SECONDS):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(content, system_prompt, provider, model):
+        """Returns a stable hex digest for the given request parameters."""
+        digest = hashlib.sha256()
+        for part in (provider, model, system_prompt, content):
+            data = (part or "").encode("utf-8")
+            # Length prefix keeps ("ab", "c") and ("a", "bc") from colliding
+            digest.update(len(data).to_bytes(8, "big"))
+            digest.update(data)
+        return digest.hexdigest()
+
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, key + ".json")
+
+    def get(self, key):
+        """Returns the cached response string or None on a miss."""
+        path = self._entry_path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            self._count(hit=False)
+            return None
+
+        if self.ttl_seconds and time.time() - entry.get("created", 0) > self.ttl_seconds:
+            self._remove(path)
+            self._count(hit=False)
+            return None
+
+        try:
+            os.utime(path, None)  # Mark as recently used
+        except OSError:
+            pass
+        self._count(hit=True)
+        return entry.get("response")
+
+    def set(self, key, response, **meta):
+        """Stores a response and evicts old entries if the cache is too large."""
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            path = self._entry_path(key)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            entry = {"created": time.time(), "response": response, "meta": meta}
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(entry, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"[WARN] Failed to write cache entry: {e}")
+            return
+        self._evict()
+
+    def clear(self):
+        """Removes every cached entry."""
+        for path, _, _ in self._entries():
+            self._remove(path)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            }
+
+    # --- Internal ---
+
+    def _count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def _entries(self):
+        """Yields (path, size, mtime) for every cache entry on disk."""
+        try:
+            with os.scandir(self.cache_dir) as it:
+                for entry in it:
+                    if not entry.name.endswith(".json"):
+                        continue
+                    try:
+                        st = entry.stat()
+                    except OSError:
+                        continue
+                    yield entry.path, st.st_size, st.st_mtime
+        except OSError:
+            return
+
+    def _evict(self):
+        entries = list(self._entries())
+        total = sum(size for _, size, _ in entries)
+        if total <= self.max_bytes:
+            return
+        entries.sort(key=lambda e: e[2])  # Oldest access first
+        for path, size, _ in entries:
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
@@ -0,0 +1,340 @@
+import re
+import json
+
+from metrics import span
+
+# --- Structured Output ---
+
+SEVERITIES = ("CRITICAL", "MAJOR", "MINOR", "INFO")
+ISSUE_TYPES = ("syntax", "logic", "runtime", "performance", "security", "design")
+
+# JSON schema the providers are asked to follow in JSON mode (strict-mode compatible:
+# every property required, optional values nullable)
+ANALYSIS_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "summary": {"type": "string"},
+        "issues": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "description": {"type": "string"},
+                    "type": {"type": "string", "enum": list(ISSUE_TYPES)},
+                    "severity": {"type": "string", "enum": list(SEVERITIES)},
+                    "confidence": {"type": "integer"},
+                    "line": {"type": ["integer", "null"]},
+                    "primary_failure": {"type": "boolean"},
+                    "root_cause": {"type": "string"},
+                    "fix": {"type": "string"},
+                    "suggested_fix_code": {"type": ["string", "null"]},
+                },
+                "required": ["description", "type", "severity", "confidence", "line", "primary_failure",
+                             "root_cause", "fix", "suggested_fix_code"],
+                "additionalProperties": False,
+            },
+        },
+        "test_case": {"type": "string"},
+        "notes": {"type": "string"},
+    },
+    "required": ["summary", "issues", "test_case", "notes"],
+    "additionalProperties": False,
+}
+
+JSON_OUTPUT_INSTRUCTIONS = """
+JSON OUTPUT MODE:
+Ignore the markdown output format above. Respond with ONE JSON object and nothing else:
+{"summary": str, "issues": [{"description": str, "type": one of syntax|logic|runtime|performance|security|design,
+"severity": one of CRITICAL|MAJOR|MINOR|INFO, "confidence": int 0-100, "line": int or null, "primary_failure": bool,
+"root_cause": str, "fix": str, "suggested_fix_code": str or null}], "test_case": str, "notes": str}
+All the analysis and auto-fix rules above still apply; "suggested_fix_code" must be null whenever an auto-fix is not allowed.
+"""
+
+
+def gemini_schema(schema=ANALYSIS_SCHEMA):
+    """Converts ANALYSIS_SCHEMA to the OpenAPI subset Gemini's response_schema accepts."""
+    out = {}
+    kind = schema.get("type")
+    if isinstance(kind, list):
+        out["nullable"] = "null" in kind
+        kind = next(k for k in kind if k != "null")
+    out["type"] = kind.upper()
+    if "properties" in schema:
+        out["properties"] = {name: gemini_schema(sub) for name, sub in schema["properties"].items()}
+        out["required"] = list(schema.get("required", []))
+    if "items" in schema:
+        out["items"] = gemini_schema(schema["items"])
+    return out
+
+
+# --- Parsing ---
+
+FILE_HEADER_RE = re.compile(r'^## FILE: (.+)$', re.MULTILINE)
+# One pattern for every line that can start a field or section; the text between markers is the value.
+# It is anchored on a literal "\n" rather than ^ so the regex engine can skip ahead between lines.
+MARKER_RE = re.compile(
+    r'\n[ \t]*(?:'
+    r'(?P<fence>```)'
+    r'|(?:\d+\.[ \t]+|[-*][ \t]+)?\*\*(?P<field>Issue Description|Type|Severity|Confidence|Root Cause|Fix|Suggested Fix(?: \(Optional\))?)\*\*[ \t]*:?'
+    r'|(?:#+[ \t]*)?(?:\*\*)?(?P<section>Problem Summary|List of Issues|Issues|Test Case|Bad Practices)\b(?:\*\*)?:?(?:\*\*)?'
+    r')[ \t]*'
+)
+SEVERITY_RE = re.compile(r'\b(CRITICAL|MAJOR|MINOR|INFO)\b', re.IGNORECASE)
+CONFIDENCE_RE = re.compile(r'(\d{1,3})\s*%')
+LINE_RE = re.compile(r'\b[Ll]ines?\s+(\d+)')
+CODE_BLOCK_RE = re.compile(r'```(?:\w+)?\n([\s\S]*?)\n```')
+ANSI_RE = re.compile(r'\x1b\[[0-9;]*m')
+
+FIELD_KEYS = {
+    "Issue Description": "description",
+    "Type": "type",
+    "Severity": "severity",
+    "Confidence": "confidence",
+    "Root Cause": "root_cause",
+    "Fix": "fix",
+    "Suggested Fix": "suggested_fix_desc",
+    "Suggested Fix (Optional)": "suggested_fix_desc",
+}
+
+
+def load_json_response(text):
+    """Returns the response as a dict if it is a JSON object (optionally in a ```json fence), else None."""
+    stripped = text.strip()
+    if stripped.startswith("```"):
+        stripped = stripped.split("\n", 1)[-1].rsplit("```", 1)[0].strip()
+    if not stripped.startswith("{"):
+        return None
+    try:
+        data = json.loads(stripped)
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def normalize_issue(raw, file_name=None):
+    """
+    Validates one issue (from JSON or markdown) into the shape the UI expects.
+    Unknown severities fall back to INFO, confidence is clamped to 0-100, missing text becomes "N/A".
+    """
+    def text(key, default="N/A"):
+        value = raw.get(key)
+        if value is None:
+            return default
+        value = str(value).strip()
+        return value or default
+
+    severity = str(raw.get("severity") or "").strip().upper()
+    if severity not in SEVERITIES:
+        severity_match = SEVERITY_RE.search(severity)
+        severity = severity_match.group(1).upper() if severity_match else "INFO"
+
+    confidence = raw.get("confidence")
+    if not isinstance(confidence, int):
+        confidence = str(confidence or "").strip().rstrip("%")
+        if not confidence.isdigit():
+            match = re.search(r'\d+', confidence)
+            confidence = match.group() if match else 0
+        confidence = int(confidence)
+    confidence = max(0, min(100, confidence))
+
+    suggested_desc = raw.get("suggested_fix_desc")
+    suggested_code = raw.get("suggested_fix_code")
+    if suggested_code is None and suggested_desc and "<<<<<<< SEARCH" in suggested_desc:
+        # Search/replace blocks (possibly several, fenced or not) are kept whole for the fix engine
+        start = suggested_desc.find("<<<<<<< SEARCH")
+        end = suggested_desc.rfind(">>>>>>> REPLACE")
+        suggested_code = suggested_desc[start:end + len(">>>>>>> REPLACE")] if end > start else None
+    if suggested_code is None and suggested_desc and "```" in suggested_desc:
+        code_match = CODE_BLOCK_RE.search(suggested_desc)
+        suggested_code = code_match.group(1) if code_match else None
+    if suggested_desc is None and suggested_code:
+        suggested_desc = f"```\n{suggested_code}\n```"
+
+    line = raw.get("line")
+    if not isinstance(line, int):
+        match = LINE_RE.search(f"{raw.get('description') or ''}\n{raw.get('root_cause') or ''}")
+        line = int(match.group(1)) if match else None
+
+    description = text("description")
+    if raw.get("primary_failure") and "Primary Failure" not in description:
+        description = f"**Primary Failure**: {description}"
+
+    return {
+        "description": description,
+        "type": text("type", "Unknown"),
+        "severity": severity,
+        "confidence": str(confidence),
+        "root_cause": text("root_cause"),
+        "fix": text("fix"),
+        "suggested_fix_desc": (suggested_desc or "").strip(),
+        "suggested_fix_code": suggested_code,
+        "suggested_fix": bool(suggested_code),
+        "line": line,
+        "file": raw.get("file") or file_name,
+    }
+
+
+class MarkdownParser:
+    """
+    Single pass parser for the markdown layout in system_prompt.md.
+    One MARKER_RE scan finds the lines that open a field or section; everything between
+    two markers is sliced out as the value, so the work outside C is per marker, not per
+    line or per issue. Markers inside ``` fences are ignored.
+    feed() takes whole lines and can be called repeatedly as a response streams in.
+    """
+
+    def __init__(self, file_name=None):
+        self.file_name = file_name
+        self.summary = []
+        self.notes = []
+        self.issues = []
+        self._issue = None
+        self._target = None # The list receiving text until the next marker
+        self._mode = "preamble"
+        self._in_fence = False
+
+    def feed(self, text):
+        text = "\n" + text
+        start = 1
+        for match in MARKER_RE.finditer(text):
+            if match.group("fence"):
+                self._in_fence = not self._in_fence
+                continue
+            if self._in_fence or not self._accept(match):
+                continue
+            self._flush(text[start:match.start() + 1])
+            self._open(match)
+            start = match.end()
+        self._flush(text[start:])
+        return self
+
+    def _accept(self, match):
+        field = match.group("field")
+        if field:
+            return field == "Issue Description" or self._issue is not None
+        section = match.group("section")
+        if section == "Problem Summary":
+            return self._mode == "preamble"
+        if section in ("List of Issues", "Issues"):
+            return self._mode in ("preamble", "summary")
+        return True # Test Case / Bad Practices end the issue list
+
+    def _open(self, match):
+        field = match.group("field")
+        if field:
+            key = FIELD_KEYS[field]
+            if key == "description":
+                self._close_issue()
+                self._mode = "issues"
+                self._issue = {}
+            self._target = self._issue.setdefault(key, [])
+            self._target.clear()
+            return
+        section = match.group("section")
+        if section == "Problem Summary":
+            self._mode = "summary"
+            self._target = self.summary
+        elif section in ("List of Issues", "Issues"):
+            self._mode = "issues"
+            self._target = None
+        else:
+            self._close_issue()
+            self._mode = "notes"
+            self._target = self.notes
+            self._target.append(match.group().strip() + " ") # Keep the "Test Case" heading in the notes
+
+    def _flush(self, text):
+        if self._target is not None and text:
+            self._target.append(text)
+
+    def _close_issue(self):
+        if self._issue is None:
+            return
+        raw = {key: "".join(parts).strip() for key, parts in self._issue.items()}
+        severity = raw.get("severity", "")
+        if "|" in severity:
+            # "**Severity**: MAJOR | **Confidence**: 80%" carries both fields on one line
+            severity, _, rest = severity.partition("|")
+            confidence = CONFIDENCE_RE.search(rest)
+            if confidence and "confidence" not in raw:
+                raw["confidence"] = confidence.group(1)
+            raw["severity"] = severity
+        raw.setdefault("suggested_fix_desc", None)
+        self.issues.append(normalize_issue(raw, self.file_name))
+        self._issue = None
+        self._target = None
+
+    def close(self):
+        self._close_issue()
+        return self
+
+
+def _parse_section(text, file_name=None):
+    """Parses one response (JSON or markdown) into (summary, issues, notes)."""
+    data = load_json_response(text)
+    if data is not None and isinstance(data.get("issues"), list):
+        issues = [normalize_issue(issue, file_name) for issue in data["issues"] if isinstance(issue, dict)]
+        notes = "\n\n".join(str(data[key]).strip() for key in ("test_case", "notes") if data.get(key))
+        return str(data.get("summary") or "").strip(), issues, notes
+
+    parser = MarkdownParser(file_name).feed(text).close()
+    return "".join(parser.summary).strip(), parser.issues, "".join(parser.notes).strip()
+
+
+def parse_response(text):
+    """
+    Parses an AI response into {"summary", "issues", "notes"}.
+    Handles JSON-mode output, the markdown layout, and per-file documents joined
+    under "## FILE: <path>" headers (each section may be either format).
+    """
+    with span("parse"):
+        return _parse_document(text)
+
+
+def _parse_document(text):
+    if "\x1b" in text:
+        text = ANSI_RE.sub("", text)
+    if "## FILE: " in text:
+        parts = FILE_HEADER_RE.split(text)
+        sections = [(None, parts[0])] + [(parts[i].strip(), parts[i + 1]) for i in range(1, len(parts), 2)]
+    else:
+        sections = [(None, text)]
+
+    summaries = []
+    issues = []
+    notes = []
+    for file_name, section in sections:
+        if not section.strip():
+            continue
+        summary, section_issues, section_notes = _parse_section(section, file_name)
+        if summary:
+            summaries.append(f"{file_name}: {summary}" if file_name else summary)
+        issues.extend(section_issues)
+        if section_notes:
+            notes.append(section_notes)
+    return {"summary": "\n\n".join(summaries), "issues": issues, "notes": "\n\n".join(notes)}
+
+
+def merge_json_responses(responses):
+    """
+    Merges responses into one JSON document in the ANALYSIS_SCHEMA shape.
+    Markdown responses (e.g. local pre-scan reports) are parsed and folded in alongside JSON ones.
+    """
+    loaded = []
+    for response in responses:
+        data = load_json_response(response)
+        if data is None:
+            parsed = parse_response(response)
+            data = {"summary": parsed["summary"], "issues": parsed["issues"], "notes": parsed["notes"]}
+        loaded.append(data)
+
+    def joined(key):
+        return "\n\n".join(str(d[key]).strip() for d in loaded if d.get(key))
+
+    merged = {
+        "summary": joined("summary"),
+        "issues": [issue for d in loaded for issue in d.get("issues") or [] if isinstance(issue, dict)],
+        "test_case": joined("test_case"),
+        "notes": joined("notes"),
+    }
+    return json.dumps(merged, indent=2)
@@ -0,0 +1,260 @@
+import ast
+import builtins
+
+# Names that exist in every module without being bound
+MODULE_NAMES = {"__file__", "__name__", "__doc__", "__package__", "__spec__", "__loader__", "__builtins__", "__path__", "__annotations__"}
+BUILTIN_NAMES = set(dir(builtins)) | MODULE_NAMES
+
+# Calls that always return a number
+NUMERIC_CALLS = {"int", "float", "len", "sum", "abs", "round", "ord", "pow", "divmod"}
+
+
+def check_python(source, filename="<input>"):
+    """
+    Runs the local pre-pass over Python source.
+    Returns a list of findings: dicts with line, type, severity, confidence,
+    description, root_cause and fix. A syntax error is reported alone, since nothing else can be checked.
+    """
+    try:
+        tree = ast.parse(source, filename=filename)
+    except SyntaxError as e:
+        return [{
+            "line": e.lineno or 1,
+            "type": "syntax",
+            "severity": "CRITICAL",
+            "confidence": 100,
+            "description": f"**Primary Failure**: SyntaxError: {e.msg} (line {e.lineno})",
+            "root_cause": f"The file cannot be parsed, so it fails before any code runs: `{(e.text or '').strip()}`",
+            "fix": "Correct the syntax at the reported line.",
+        }]
+
+    findings = _undefined_names(tree) + _unused_imports(tree, filename) + TypeMisuseChecker().check(tree)
+    return sorted(findings, key=lambda f: f["line"])
+
+
+# --- Checks ---
+
+def _bound_names(tree):
+    """Every name bound anywhere in the module. Scope-insensitive on purpose: fewer false positives."""
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name) and isinstance(node.ctx, (ast.Store, ast.Del)):
+            names.add(node.id)
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            names.add(node.name)
+        elif isinstance(node, ast.arg):
+            names.add(node.arg)
+        elif isinstance(node, (ast.Import, ast.ImportFrom)):
+            for alias in node.names:
+                names.add(alias.asname or alias.name.split(".")[0])
+        elif isinstance(node, ast.ExceptHandler) and node.name:
+            names.add(node.name)
+        elif isinstance(node, (ast.Global, ast.Nonlocal)):
+            names.update(node.names)
+        elif isinstance(node, (ast.MatchAs, ast.MatchStar)) and node.name:
+            names.add(node.name)
+        elif isinstance(node, ast.MatchMapping) and node.rest:
+            names.add(node.rest)
+    return names
+
+
+def _undefined_names(tree):
+    # A star import can bind anything; don't guess
+    if any(isinstance(n, ast.ImportFrom) and any(a.name == "*" for a in n.names) for n in ast.walk(tree)):
+        return []
+    known = _bound_names(tree) | BUILTIN_NAMES
+    findings = []
+    reported = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Load) and node.id not in known and node.id not in reported:
+            reported.add(node.id)
+            findings.append({
+                "line": node.lineno,
+                "type": "runtime",
+                "severity": "MAJOR",
+                "confidence": 85,
+                "description": f"Undefined name `{node.id}` (line {node.lineno})",
+                "root_cause": f"`{node.id}` is never assigned, imported or defined, so evaluating it raises NameError.",
+                "fix": f"Define or import `{node.id}`, or correct the spelling.",
+            })
+    return findings
+
+
+def _unused_imports(tree, filename):
+    if filename.endswith("__init__.py"):
+        return [] # Imports there are usually re-exports
+    used = {node.id for node in ast.walk(tree) if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Load)}
+    # Names listed in __all__ count as used
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Assign) and any(isinstance(t, ast.Name) and t.id == "__all__" for t in node.targets):
+            if isinstance(node.value, (ast.List, ast.Tuple)):
+                used.update(e.value for e in node.value.elts if isinstance(e, ast.Constant) and isinstance(e.value, str))
+
+    findings = []
+    for node in ast.walk(tree):
+        if not isinstance(node, (ast.Import, ast.ImportFrom)):
+            continue
+        if isinstance(node, ast.ImportFrom) and node.module == "__future__":
+            continue
+        for alias in node.names:
+            name = alias.asname or alias.name.split(".")[0]
+            if alias.name == "*" or name in used:
+                continue
+            findings.append({
+                "line": node.lineno,
+                "type": "design",
+                "severity": "MINOR",
+                "confidence": 90,
+                "description": f"Unused import `{alias.name}` (line {node.lineno})",
+                "root_cause": f"`{name}` is imported but never used, which adds load time and noise.",
+                "fix": f"Delete the import of `{alias.name}` on line {node.lineno}.",
+            })
+    return findings
+
+
+class TypeMisuseChecker(ast.NodeVisitor):
+    """
+    Flags `str + number` concatenation where the number side is known locally:
+    a numeric literal, a division, a numeric builtin call, a function whose returns
+    are all numeric, or a variable last assigned one of those in the same scope.
+    """
+
+    def __init__(self):
+        self.findings = []
+        self.numeric_functions = set()
+        self.env = set()
+
+    def check(self, tree):
+        self.numeric_functions = {
+            node.name for node in ast.walk(tree)
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) and self._returns_numeric(node)
+        }
+        self.visit(tree)
+        return self.findings
+
+    def _returns_numeric(self, func):
+        returns = [n for n in ast.walk(func) if isinstance(n, ast.Return)]
+        return bool(returns) and all(r.value is not None and self._is_numeric(r.value) for r in returns)
+
+    def _is_numeric(self, expr):
+        if isinstance(expr, ast.Constant):
+            return isinstance(expr.value, (int, float)) and not isinstance(expr.value, bool)
+        if isinstance(expr, ast.BinOp):
+            if isinstance(expr.op, ast.Div):
+                return True
+            return self._is_numeric(expr.left) and self._is_numeric(expr.right)
+        if isinstance(expr, ast.UnaryOp) and isinstance(expr.op, (ast.USub, ast.UAdd)):
+            return self._is_numeric(expr.operand)
+        if isinstance(expr, ast.Call) and isinstance(expr.func, ast.Name):
+            return expr.func.id in NUMERIC_CALLS or expr.func.id in self.numeric_functions
+        if isinstance(expr, ast.Name):
+            return expr.id in self.env
+        return False
+
+    @staticmethod
+    def _is_str(expr):
+        return isinstance(expr, ast.JoinedStr) or (isinstance(expr, ast.Constant) and isinstance(expr.value, str))
+
+    def _visit_scope(self, node):
+        outer = self.env
+        self.env = set()
+        self.generic_visit(node)
+        self.env = outer
+
+    visit_FunctionDef = _visit_scope
+    visit_AsyncFunctionDef = _visit_scope
+    visit_Lambda = _visit_scope
+
+    def visit_Assign(self, node):
+        self.visit(node.value)
+        numeric = self._is_numeric(node.value)
+        for target in node.targets:
+            if isinstance(target, ast.Name):
+                if numeric:
+                    self.env.add(target.id)
+                else:
+                    self.env.discard(target.id)
+            else:
+                self.visit(target)
+
+    def visit_BinOp(self, node):
+        self.generic_visit(node)
+        if not isinstance(node.op, ast.Add):
+            return
+        if (self._is_str(node.left) and self._is_numeric(node.right)) or (self._is_numeric(node.left) and self._is_str(node.right)):
+            code = ast.unparse(node)
+            self.findings.append({
+                "line": node.lineno,
+                "type": "runtime",
+                "severity": "MAJOR",
+                "confidence": 80,
+                "description": f"String concatenated with a number: `{code}` (line {node.lineno})",
+                "root_cause": "`+` between `str` and `int`/`float` raises TypeError: can only concatenate str (not \"float\") to str.",
+                "fix": "Convert the number with str() or use an f-string.",
+            })
+
+
+# --- Output ---
+
+def format_findings(label, findings):
+    """Renders findings in the markdown layout the AI is asked for, so parse_ai_response reads them unchanged."""
+    out = [
+        "**Problem Summary:**",
+        f"Local static analysis of {label} found {len(findings)} issue(s).",
+        "",
+        "**List of Issues:**",
+    ]
+    for i, finding in enumerate(findings, 1):
+        out.append(f"{i}. **Issue Description**: [{label}] {finding['description']}")
+        out.append(f"- **Type**: {finding['type']}")
+        out.append(f"- **Severity**: {finding['severity']} | **Confidence**: {finding['confidence']}%")
+        out.append(f"- **Root Cause**: {finding['root_cause']}")
+        out.append(f"- **Fix**: {finding['fix']}")
+        out.append("- **Suggested Fix (Optional)**: Auto-fix not provided for locally detected issues.")
+        out.append("")
+    return "\n".join(out)
+
+
+def clean_report(label):
+    return (
+        "**Problem Summary:**\n"
+        f"Local static analysis of {label} found no issues; the AI provider was not called.\n\n"
+        "**List of Issues:**\n"
+        "No runtime or syntax failures detected.\n"
+    )
+
+
+def extract_regions(source, findings, context=3):
+    """
+    Returns only the parts of `source` around the findings, with line numbers,
+    for sending to the AI instead of the whole file. Each finding's region is its
+    enclosing top-level function/class, or `context` lines either side.
+    """
+    lines = source.splitlines()
+    spans = []
+    try:
+        top_level = [n for n in ast.parse(source).body if hasattr(n, "end_lineno")]
+    except SyntaxError:
+        top_level = []
+    for finding in findings:
+        line = finding["line"]
+        span = (max(1, line - context), min(len(lines), line + context))
+        for node in top_level:
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)) and node.lineno <= line <= node.end_lineno:
+                start = min([node.lineno] + [d.lineno for d in node.decorator_list])
+                span = (start, node.end_lineno)
+                break
+        spans.append(span)
+
+    merged = []
+    for start, end in sorted(spans):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+
+    out = []
+    for start, end in merged:
+        out.append(f"# lines {start}-{end}")
+        out.extend(f"{n:>5} | {lines[n - 1]}" for n in range(start, end + 1))
+    return "\n".join(out)
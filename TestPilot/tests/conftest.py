@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The TestPilot modules are imported as top-level modules, as main.py and ui_app.py do
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
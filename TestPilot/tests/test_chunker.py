@@ -0,0 +1,59 @@
+import json
+
+from chunker import batch_file, estimate_tokens, merge_batch_responses, pack_batches, split_oversized
+from response_parser import parse_response
+
+
+def _report(summary, *descriptions):
+    lines = ["**Problem Summary:**", summary, "", "**List of Issues:**"]
+    for i, description in enumerate(descriptions, 1):
+        lines.append(f"{i}. **Issue Description**: {description}")
+        lines.append("- **Type**: logic")
+        lines.append("- **Severity**: MINOR | **Confidence**: 80%")
+        lines.append("")
+    return "\n".join(lines)
+
+
+def test_pack_batches_keeps_files_whole_under_budget():
+    items = [("a.py", "a" * 400), ("b.py", "b" * 400), ("c.py", "c" * 400)]
+    batches = pack_batches(items, budget=250)
+    assert [[label for label, _ in batch] for batch in batches] == [["a.py", "b.py"], ["c.py"]]
+    assert all(sum(estimate_tokens(text) for _, text in batch) <= 250 for batch in batches)
+
+
+def test_oversized_file_is_split_on_lines_into_labelled_parts():
+    text = "x = 1\n" * 100
+    parts = split_oversized("big.py", text, budget=40)
+    assert len(parts) > 1
+    assert parts[0][0] == f"big.py (part 1/{len(parts)})"
+    assert "".join(part for _, part in parts) == text
+    assert batch_file(parts) == "big.py"
+    assert batch_file([("a.py", ""), ("b.py", "")]) is None
+
+
+def test_unattributed_batches_are_renumbered_into_one_list():
+    merged = merge_batch_responses([_report("First.", "one", "two"), _report("Second.", "three")])
+    parsed = parse_response(merged)
+    assert [issue["description"] for issue in parsed["issues"]] == ["one", "two", "three"]
+    assert "3. **Issue Description**: three" in merged
+    assert "First." in parsed["summary"] and "Second." in parsed["summary"]
+
+
+def test_merge_keeps_file_attribution():
+    per_file = "## FILE: pkg/a.py\n\n" + _report("A.", "in a") + "\n\n## FILE: pkg/b.py\n\n" + _report("B.", "in b")
+    local = "## FILE: pkg/a.py\n\n" + _report("Local.", "local a")
+    merged = merge_batch_responses([_report("Batch.", "mixed"), per_file, local])
+    files = {issue["description"]: issue["file"] for issue in parse_response(merged)["issues"]}
+    assert files == {"mixed": None, "in a": "pkg/a.py", "local a": "pkg/a.py", "in b": "pkg/b.py"}
+    # One section per file
+    assert merged.count("## FILE: pkg/a.py") == 1
+
+
+def test_json_merge_keeps_file_attribution():
+    issue = {"description": "json issue", "type": "logic", "severity": "MINOR", "confidence": 70, "line": 3,
+             "primary_failure": False, "root_cause": "r", "fix": "f", "suggested_fix_code": None}
+    batch = json.dumps({"summary": "S", "issues": [issue], "test_case": "", "notes": ""})
+    local = "## FILE: pkg/a.py\n\n" + _report("Local.", "local a")
+    merged = merge_batch_responses([batch, local])
+    files = {issue["description"]: issue["file"] for issue in parse_response(merged)["issues"]}
+    assert files == {"json issue": None, "local a": "pkg/a.py"}
@@ -0,0 +1,108 @@
+import threading
+
+from engine import CircuitBreaker, HedgedRouter, ProviderGate, TokenBucket, is_retryable_error
+
+
+class FakeClock:
+    """Manual clock; sleep() advances it instead of waiting."""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def test_token_bucket_waits_for_refill():
+    clock = FakeClock()
+    bucket = TokenBucket(60, capacity=2, clock=clock, sleep=clock.sleep)
+    bucket.acquire()
+    bucket.acquire()
+    assert clock.sleeps == []
+    bucket.acquire()
+    assert clock.sleeps == [1.0]
+
+
+def test_retryable_errors():
+    assert is_retryable_error("[GEMINI API ERROR] 429 Resource exhausted")
+    assert is_retryable_error("[GLM API ERROR] Request timed out")
+    assert not is_retryable_error("[GLM API ERROR] 401 Invalid API key")
+    assert not is_retryable_error("**Problem Summary:** 429 requests handled")
+
+
+def test_gate_retries_transient_errors_with_backoff():
+    clock = FakeClock()
+    replies = iter(["[GLM API ERROR] 503 overloaded", "[GLM API ERROR] 429 rate limit", "ok"])
+    gate = ProviderGate(requests_per_minute=0, max_retries=4, base_delay=1.0, max_delay=30.0, sleep=clock.sleep)
+    assert gate.call(lambda: next(replies)) == "ok"
+    assert gate.retries == 2
+    assert len(clock.sleeps) == 2
+    assert 0.5 <= clock.sleeps[0] <= 1.0 and 1.0 <= clock.sleeps[1] <= 2.0
+
+
+def test_gate_gives_up_after_max_retries():
+    clock = FakeClock()
+    calls = []
+    gate = ProviderGate(requests_per_minute=0, max_retries=2, sleep=clock.sleep)
+    result = gate.call(lambda: calls.append(1) or "[GLM API ERROR] 503")
+    assert result == "[GLM API ERROR] 503"
+    assert len(calls) == 3
+
+
+def test_circuit_breaker_opens_and_half_opens():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10, clock=clock)
+    breaker.record(False)
+    assert breaker.allow()
+    breaker.record(False)
+    assert not breaker.allow()
+    assert breaker.retry_in() == 10
+    clock.now = 10
+    assert breaker.allow()
+    assert not breaker.allow() # Only one trial call
+    breaker.record(True)
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_router_fails_over_and_skips_open_circuits():
+    clock = FakeClock()
+    messages = []
+    router = HedgedRouter(failure_threshold=1, reset_timeout=60, notify=messages.append, clock=clock)
+    calls = []
+
+    def call(provider):
+        calls.append(provider)
+        return "[GEMINI API ERROR] down" if provider == "gemini" else f"answer from {provider}"
+
+    assert router.call(["gemini", "glm"], call) == ("answer from glm", "glm")
+    assert router.failovers == 1
+    assert router.call(["gemini", "glm"], call) == ("answer from glm", "glm")
+    assert calls == ["gemini", "glm", "glm"]
+    assert any("circuit open" in message for message in messages)
+
+
+def test_router_hedges_a_slow_provider():
+    release = threading.Event()
+    router = HedgedRouter(hedge_min_delay=0.01, hedge_default_delay=0.05)
+
+    def call(provider):
+        if provider == "gemini":
+            release.wait(5)
+        return f"answer from {provider}"
+
+    try:
+        assert router.call(["gemini", "glm"], call) == ("answer from glm", "glm")
+        assert router.hedges == 1
+    finally:
+        release.set()
+
+
+def test_call_in_order_stops_once_streaming_started():
+    router = HedgedRouter()
+    result = router.call_in_order(["gemini", "glm"], lambda provider: "[GEMINI API ERROR] reset", can_failover=lambda: False)
+    assert result == ("[GEMINI API ERROR] reset", "gemini")
@@ -0,0 +1,65 @@
+import os
+
+import fixer
+from fixer import Hunk, apply_fixes, parse_hunks, plan_fix, restore_snapshot
+
+
+def search_replace(search, replace):
+    return f"<<<<<<< SEARCH\n{search}=======\n{replace}>>>>>>> REPLACE\n"
+
+
+def fix_for(path, code, severity="MINOR"):
+    return {"file_path": str(path), "severity": severity, "suggested_fix_code": code}
+
+
+def test_parse_search_replace_blocks():
+    hunks = parse_hunks(search_replace("a = 1\n", "a = 2\n") + search_replace("b = 1\n", "b = 2\n"))
+    assert [(h.search, h.replace) for h in hunks] == [("a = 1\n", "a = 2\n"), ("b = 1\n", "b = 2\n")]
+
+
+def test_parse_unified_diff_and_plain_append():
+    (hunk,) = parse_hunks("@@ -1,2 +1,2 @@\n def f():\n-    return 1\n+    return 2\n")
+    assert (hunk.search, hunk.replace) == ("def f():\n    return 1\n", "def f():\n    return 2\n")
+    (append,) = parse_hunks("```python\nprint('hi')\n```")
+    assert append.search is None and append.replace == "print('hi')\n"
+
+
+def test_search_does_not_match_inside_another_line():
+    content = "max = 1\nprint(max)\n"
+    edits, reason = plan_fix(content, [Hunk("x = 1\n", "x = 2\n")], [])
+    assert edits == [] and "not found" in reason
+
+
+def test_line_anchored_match_ignores_mid_line_occurrences():
+    content = "max = 1\nx = 1\n"
+    edits, reason = plan_fix(content, [Hunk("x = 1\n", "x = 2\n")], [])
+    assert reason is None
+    assert fixer._apply_edits(content, edits) == "max = 1\nx = 2\n"
+
+
+def test_ambiguous_and_conflicting_fixes_are_skipped():
+    content = "a = 1\na = 1\nb = 1\n"
+    assert "more than once" in plan_fix(content, [Hunk("a = 1\n", "a = 2\n")], [])[1]
+    edits, _ = plan_fix(content, [Hunk("b = 1\n", "b = 2\n")], [])
+    taken = [(start, end) for start, end, _ in edits]
+    assert "Conflicts" in plan_fix(content, [Hunk("a = 1\nb = 1\n", "c = 1\n")], taken)[1]
+
+
+def test_apply_fixes_keeps_crlf_and_can_be_undone(tmp_path):
+    path = tmp_path / "a.py"
+    path.write_bytes(b"x = 1\r\ny = 1\r\n")
+    result = apply_fixes([fix_for(path, search_replace("y = 1\n", "y = 2\n"))], str(tmp_path / "backups"))
+    assert len(result["applied"]) == 1 and not result["skipped"]
+    assert path.read_bytes() == b"x = 1\r\ny = 2\r\n"
+
+    restore_snapshot(str(tmp_path / "backups"), result["snapshot"])
+    assert path.read_bytes() == b"x = 1\r\ny = 1\r\n"
+
+
+def test_apply_fixes_skips_high_severity(tmp_path):
+    path = tmp_path / "a.py"
+    path.write_text("x = 1\n")
+    result = apply_fixes([fix_for(path, search_replace("x = 1\n", "x = 2\n"), severity="CRITICAL")], str(tmp_path / "backups"))
+    assert result["applied"] == [] and len(result["skipped"]) == 1
+    assert path.read_text() == "x = 1\n"
+    assert not os.path.exists(tmp_path / "backups") or not os.listdir(tmp_path / "backups")
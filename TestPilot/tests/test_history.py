@@ -0,0 +1,52 @@
+import os
+
+import pytest
+
+from history import AnalysisHistory
+
+
+def issue(severity="CRITICAL", file=None, description="Division by zero"):
+    return {"severity": severity, "type": "runtime", "description": description, "file": file}
+
+
+@pytest.fixture
+def history(tmp_path):
+    store = AnalysisHistory(str(tmp_path / "history.sqlite3"))
+    yield store
+    store.close()
+
+
+def test_record_assigns_stable_ids(history, tmp_path):
+    path = str(tmp_path / "a.py")
+    _, first = history.record(path, "file", [issue()], content_hash="h1")
+    _, again = history.record(path, "file", [issue()], content_hash="h1")
+    assert first == again
+    assert history.get_issue(first[0])["severity"] == "CRITICAL"
+
+
+def test_reanalysis_without_issues_clears_fixed_findings(history, tmp_path):
+    path = str(tmp_path / "a.py")
+    history.record(path, "file", [issue()], content_hash="before")
+    assert len(history.find_issues(under=str(tmp_path), severity="CRITICAL")) == 1
+
+    history.record(path, "file", [], content_hash="after")
+    assert history.find_issues(under=str(tmp_path), severity="CRITICAL") == []
+    assert history.count_issues(under=str(tmp_path)) == {}
+
+
+def test_folder_reanalysis_replaces_only_covered_files(history, tmp_path):
+    folder = str(tmp_path)
+    a, b = os.path.join(folder, "a.py"), os.path.join(folder, "b.py")
+    history.record(folder, "folder", [issue(file="a.py"), issue(file="b.py")], file_hashes={a: "1", b: "1"})
+    history.record(folder, "folder", [issue(severity="MINOR", file="a.py")], file_hashes={a: "2"})
+
+    found = {(row["file_path"], row["severity"]) for row in history.find_issues(under=folder)}
+    assert found == {(os.path.normcase(a), "MINOR"), (os.path.normcase(b), "CRITICAL")}
+
+
+def test_under_matches_folder_contents_only(history, tmp_path):
+    inside = str(tmp_path / "src" / "a.py")
+    sibling = str(tmp_path / "src2" / "a.py")
+    history.record(inside, "file", [issue()], content_hash="1")
+    history.record(sibling, "file", [issue()], content_hash="1")
+    assert [row["file_path"] for row in history.find_issues(under=str(tmp_path / "src"))] == [os.path.normcase(inside)]
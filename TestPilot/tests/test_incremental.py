@@ -0,0 +1,48 @@
+import os
+
+from incremental import FolderManifest, hash_content
+
+
+def _write(path, text):
+    path.write_text(text, encoding="utf-8")
+    return os.stat(path)
+
+
+def test_unchanged_files_reuse_findings_across_runs(tmp_path):
+    source = tmp_path / "a.py"
+    st = _write(source, "x = 1\n")
+    manifest = FolderManifest(str(tmp_path), str(tmp_path / "manifests"), "prompt-1")
+    manifest.record("a.py", st, hash_content("x = 1\n"), "findings")
+    manifest.save()
+
+    reloaded = FolderManifest(str(tmp_path), str(tmp_path / "manifests"), "prompt-1")
+    assert reloaded.findings_if_unchanged("a.py", os.stat(source)) == "findings"
+
+
+def test_touched_file_falls_back_to_content_hash(tmp_path):
+    source = tmp_path / "a.py"
+    st = _write(source, "x = 1\n")
+    manifest = FolderManifest(str(tmp_path), str(tmp_path / "manifests"), "prompt")
+    manifest.record("a.py", st, hash_content("x = 1\n"), "findings")
+
+    os.utime(source, ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+    assert manifest.findings_if_unchanged("a.py", os.stat(source)) is None
+    assert manifest.findings_for_hash("a.py", hash_content("x = 1\n")) == "findings"
+    assert manifest.findings_for_hash("a.py", hash_content("x = 2\n")) is None
+
+
+def test_prompt_change_discards_manifest(tmp_path):
+    st = _write(tmp_path / "a.py", "x = 1\n")
+    manifest = FolderManifest(str(tmp_path), str(tmp_path / "manifests"), "prompt-1")
+    manifest.record("a.py", st, hash_content("x = 1\n"), "findings")
+    manifest.save()
+    assert FolderManifest(str(tmp_path), str(tmp_path / "manifests"), "prompt-2").files == {}
+
+
+def test_prune_drops_deleted_files(tmp_path):
+    st = _write(tmp_path / "a.py", "x = 1\n")
+    manifest = FolderManifest(str(tmp_path), str(tmp_path / "manifests"), "prompt")
+    manifest.record("a.py", st, "h1", "a")
+    manifest.record("b.py", st, "h2", "b")
+    manifest.prune({"a.py"})
+    assert list(manifest.files) == ["a.py"]
@@ -0,0 +1,82 @@
+import threading
+
+import pytest
+
+from jobs import JobQueue, QueueFullError
+
+
+def test_submit_runs_job_and_calls_on_done():
+    queue = JobQueue(max_workers=1)
+    finished = threading.Event()
+    job = queue.submit(lambda: {"issues": []}, on_done=lambda done: finished.set(), path="a.py")
+    assert finished.wait(5)
+    assert queue.get(job.id) is job
+    assert job.status == "done"
+    assert job.to_dict()["result"] == {"issues": []}
+    assert job.to_dict()["path"] == "a.py"
+
+
+def test_failed_job_records_error():
+    queue = JobQueue(max_workers=1)
+    finished = threading.Event()
+
+    def boom():
+        raise RuntimeError("provider down")
+
+    job = queue.submit(boom, on_done=lambda done: finished.set())
+    assert finished.wait(5)
+    assert job.status == "error"
+    assert job.error == "provider down"
+
+
+def test_concurrent_submits_never_exceed_max_pending():
+    queue = JobQueue(max_workers=1, max_pending=3)
+    release = threading.Event()
+    started = threading.Event()
+
+    def blocker():
+        started.set()
+        release.wait(5)
+
+    queue.submit(blocker)
+    assert started.wait(5)
+
+    accepted = []
+    rejected = []
+    barrier = threading.Barrier(16)
+
+    def submit():
+        barrier.wait()
+        try:
+            accepted.append(queue.submit(lambda: release.wait(5)))
+        except QueueFullError:
+            rejected.append(1)
+
+    threads = [threading.Thread(target=submit) for _ in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    release.set()
+
+    assert len(accepted) == 3
+    assert len(rejected) == 13
+
+
+def test_trim_drops_finished_jobs_first():
+    queue = JobQueue(max_jobs=2)
+    old = queue.create()
+    old.succeed(None)
+    running = queue.create()
+    running.start()
+    new = queue.create()
+    assert queue.get(old.id) is None
+    assert queue.get(running.id) is running
+    assert queue.get(new.id) is new
+
+
+def test_queue_full_error_message():
+    queue = JobQueue(max_pending=1)
+    queue.create()
+    with pytest.raises(QueueFullError):
+        queue.submit(lambda: None)
@@ -0,0 +1,55 @@
+import os
+import json
+
+from response_cache import ResponseCache
+
+
+def test_key_depends_on_every_part_without_collisions():
+    key = ResponseCache.make_key("code", "prompt", "gemini", "model-a")
+    assert key == ResponseCache.make_key("code", "prompt", "gemini", "model-a")
+    assert key != ResponseCache.make_key("code", "prompt", "gemini", "model-b")
+    # Length prefixes keep shifted boundaries apart
+    assert ResponseCache.make_key("bc", "a", "p", "m") != ResponseCache.make_key("c", "ab", "p", "m")
+
+
+def test_set_get_and_stats(tmp_path):
+    cache = ResponseCache(str(tmp_path))
+    key = ResponseCache.make_key("code", "prompt", "gemini", "model")
+    assert cache.get(key) is None
+    cache.set(key, "response", provider="gemini")
+    assert cache.get(key) == "response"
+    assert cache.stats() == {"hits": 1, "misses": 1, "hit_rate": 0.5}
+
+
+def test_expired_entries_are_misses_and_removed(tmp_path):
+    cache = ResponseCache(str(tmp_path), ttl_seconds=60)
+    cache.set("k", "old")
+    path = os.path.join(str(tmp_path), "k.json")
+    with open(path, encoding="utf-8") as f:
+        entry = json.load(f)
+    entry["created"] -= 120
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(entry, f)
+    assert cache.get("k") is None
+    assert not os.path.exists(path)
+
+
+def test_eviction_drops_least_recently_used(tmp_path):
+    cache = ResponseCache(str(tmp_path), max_bytes=10 ** 9)
+    for key in ("a", "b", "c"):
+        cache.set(key, "x" * 100)
+    entry = os.path.getsize(os.path.join(str(tmp_path), "a.json"))
+    os.utime(os.path.join(str(tmp_path), "a.json"), (1, 1))
+    os.utime(os.path.join(str(tmp_path), "b.json"), (3, 3))
+    os.utime(os.path.join(str(tmp_path), "c.json"), (2, 2))
+    cache.max_bytes = entry * 2
+    cache.set("d", "x" * 100)
+    assert sorted(os.listdir(str(tmp_path))) == ["b.json", "d.json"]
+
+
+def test_clear_removes_everything(tmp_path):
+    cache = ResponseCache(str(tmp_path))
+    cache.set("a", "1")
+    cache.set("b", "2")
+    cache.clear()
+    assert os.listdir(str(tmp_path)) == []
@@ -0,0 +1,88 @@
+import json
+
+from response_parser import MarkdownParser, gemini_schema, normalize_issue, parse_response
+
+MARKDOWN = """**Problem Summary:**
+The loop never ends.
+
+**List of Issues:**
+1. **Issue Description**: Infinite loop on line 4
+- **Type**: logic
+- **Severity**: MAJOR | **Confidence**: 90%
+- **Root Cause**: The counter is never incremented.
+- **Fix**: Increment the counter.
+- **Suggested Fix (Optional)**:
+```python
+**Type**: not a field inside a fence
+i += 1
+```
+
+2. **Issue Description**: Unused import
+- **Type**: design
+- **Severity**: minor
+- **Confidence**: 40
+
+**Test Case**
+Call run() with n=3.
+"""
+
+
+def test_markdown_layout():
+    parsed = parse_response(MARKDOWN)
+    assert parsed["summary"] == "The loop never ends."
+    first, second = parsed["issues"]
+    assert first["severity"] == "MAJOR" and first["confidence"] == "90"
+    assert first["line"] == 4
+    assert first["suggested_fix_code"] == "**Type**: not a field inside a fence\ni += 1"
+    assert first["type"] == "logic"
+    assert second["severity"] == "MINOR" and second["confidence"] == "40"
+    assert second["suggested_fix_code"] is None
+    assert parsed["notes"].startswith("**Test Case**")
+
+
+def test_streamed_lines_parse_like_the_whole_text():
+    parser = MarkdownParser()
+    for line in MARKDOWN.splitlines(keepends=True):
+        parser.feed(line)
+    assert parser.close().issues == parse_response(MARKDOWN)["issues"]
+
+
+def test_json_response_in_a_fence():
+    data = {"summary": "S", "test_case": "T", "notes": "", "issues": [
+        {"description": "d", "type": "runtime", "severity": "CRITICAL", "confidence": 150, "line": None,
+         "primary_failure": True, "root_cause": "r", "fix": "f", "suggested_fix_code": None},
+    ]}
+    parsed = parse_response("```json\n" + json.dumps(data) + "\n```")
+    issue = parsed["issues"][0]
+    assert parsed["summary"] == "S" and parsed["notes"] == "T"
+    assert issue["confidence"] == "100"
+    assert issue["description"] == "**Primary Failure**: d"
+
+
+def test_file_sections_tag_issues_with_their_file():
+    text = "## FILE: a.py\n\n" + MARKDOWN + "\n## FILE: b.py\n\n" + json.dumps({"summary": "B", "issues": [{"description": "b"}]})
+    parsed = parse_response(text)
+    assert [issue["file"] for issue in parsed["issues"]] == ["a.py", "a.py", "b.py"]
+    assert parsed["summary"].startswith("a.py: The loop never ends.")
+
+
+def test_normalize_issue_defaults_and_search_replace_blocks():
+    block = "<<<<<<< SEARCH\nx = 1\n=======\nx = 2\n>>>>>>> REPLACE"
+    issue = normalize_issue({"severity": "urgent", "confidence": "n/a", "suggested_fix_desc": f"Use:\n{block}\nthanks"})
+    assert issue["severity"] == "INFO"
+    assert issue["confidence"] == "0"
+    assert issue["description"] == "N/A"
+    assert issue["suggested_fix_code"] == block
+    assert issue["suggested_fix"] is True
+
+
+def test_ansi_codes_are_stripped():
+    parsed = parse_response("\x1b[1m" + MARKDOWN + "\x1b[0m")
+    assert len(parsed["issues"]) == 2
+
+
+def test_gemini_schema_marks_nullable_fields():
+    schema = gemini_schema()
+    line = schema["properties"]["issues"]["items"]["properties"]["line"]
+    assert line == {"nullable": True, "type": "INTEGER"}
+    assert schema["type"] == "OBJECT"
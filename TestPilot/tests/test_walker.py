@@ -0,0 +1,39 @@
+import os
+
+from walker import SNIFF_BYTES, is_project_file, read_text_file, walk_project
+
+
+def _touch(root, rel_path, content="x = 1\n"):
+    path = os.path.join(root, rel_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(content)
+
+
+def test_source_dirs_named_like_build_dirs_are_walked(tmp_path):
+    for rel_path in ("bin/tool.py", "env/settings.py", "out/report.py", "obj/model.py", "node_modules/dep/index.js"):
+        _touch(tmp_path, rel_path)
+    found = sorted(rel for _, rel, _ in walk_project(str(tmp_path)))
+    assert found == ["bin/tool.py", "env/settings.py", "obj/model.py", "out/report.py"]
+
+
+def test_virtualenv_of_any_name_and_gitignored_dirs_are_skipped(tmp_path):
+    _touch(tmp_path, "myenv/lib/site.py")
+    _touch(tmp_path, "myenv/pyvenv.cfg", "home = /usr/bin\n")
+    _touch(tmp_path, "out/generated.py")
+    _touch(tmp_path, ".gitignore", "out/\n")
+    _touch(tmp_path, "src/app.py")
+    assert [rel for _, rel, _ in walk_project(str(tmp_path)) if rel.endswith(".py")] == ["src/app.py"]
+    assert not is_project_file(str(tmp_path), "myenv/lib/site.py")
+    assert is_project_file(str(tmp_path), "src/app.py")
+
+
+def test_read_text_file_rejects_binaries_and_reads_large_text(tmp_path):
+    binary = tmp_path / "blob.dat"
+    binary.write_bytes(b"\0" + b"a" * (SNIFF_BYTES * 4))
+    assert read_text_file(str(binary)) is None
+
+    text = "line\n" * SNIFF_BYTES
+    large = tmp_path / "large.py"
+    large.write_text(text, encoding="utf-8")
+    assert read_text_file(str(large)) == text
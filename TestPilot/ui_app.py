@@ -1,15 +1,62 @@
 import os
-import shutil
-import re
-from flask import Flask, render_template, request, jsonify
+import gzip
+import json
+import time
+import queue
+import threading
+from flask import Flask, render_template, request, jsonify, Response, stream_with_context, g
 # Connect to TestPilot Engine
 import main
+from jobs import JobQueue, QueueFullError
+import fixer
+import metrics
+from response_parser import MarkdownParser, parse_response
 
 app = Flask(__name__)
 
-# Temporary store for analysis results to allow "Apply Fix" lookup by index
-# In a real app, this should be a DB or session-based. For local single-user, global is fine.
-LATEST_ANALYSIS = {} 
+# Responses at least this large are gzip-compressed for clients that accept it
+GZIP_MIN_BYTES = 1024
+GZIP_MIMETYPES = {"application/json", "text/html", "text/plain", "text/css", "application/javascript"}
+# Issues per page in /jobs/<id>/issues and in the first page sent with a finished analysis
+ISSUE_PAGE_SIZE = int(os.getenv("TESTPILOT_ISSUE_PAGE_SIZE", "50"))
+
+@app.before_request
+def _start_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def _compress(response):
+    """Gzips complete (not streamed) text responses; ETags stay weak, so they match either encoding."""
+    if (response.status_code != 200 or response.is_streamed or response.direct_passthrough
+            or response.mimetype not in GZIP_MIMETYPES or "Content-Encoding" in response.headers
+            or "gzip" not in request.headers.get("Accept-Encoding", "").lower()):
+        return response
+    data = response.get_data()
+    if len(data) < GZIP_MIN_BYTES:
+        return response
+    response.set_data(gzip.compress(data, compresslevel=5))
+    response.headers["Content-Encoding"] = "gzip"
+    response.vary.add("Accept-Encoding")
+    return response
+
+@app.after_request
+def _record_request_time(response):
+    # Streamed responses (SSE) are timed to their first byte; the stream itself runs after this hook
+    if hasattr(g, "request_start"):
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        metrics.HTTP_SECONDS.observe(time.perf_counter() - g.request_start, route=route, method=request.method, status=response.status_code)
+    return response
+
+# Analyses run as jobs on a bounded worker pool; each job keeps its own result,
+# so "Apply Fix" looks issues up by job id instead of a shared "latest analysis".
+JOBS = JobQueue(
+    max_workers=int(os.getenv("TESTPILOT_JOB_WORKERS", "4")),
+    max_pending=int(os.getenv("TESTPILOT_JOB_QUEUE_SIZE", "32")),
+)
+
+# Open provider connections in the background so the first analysis skips connection setup
+if os.getenv("TESTPILOT_PREWARM", "1") != "0":
+    main.warm_up_providers(main.get_api_keys())
 
 @app.route('/')
 def home():
@@ -19,188 +66,408 @@ def home():
 def analysis_page():
     return render_template('analysis.html')
 
+def _flag(value):
+    """Reads a boolean option from JSON (true) or a query string ("1", "true")."""
+    return str(value).lower() in ("1", "true", "yes", "on")
+
+def _prescan_mode(value):
+    return value if value in main.PRESCAN_MODES else "off"
+
+def _clean_path(path):
+    return path.strip().strip('"').strip("'") if path else path
+
+def conditional_json(payload):
+    """JSON response with a weak ETag of its body; a matching If-None-Match gets 304 Not Modified."""
+    response = jsonify(payload)
+    response.add_etag(weak=True)
+    return response.make_conditional(request)
+
+def _compact_issue(issue, index, full=False):
+    """An issue as listed in pages: its index in the full result (for /apply-fix), without the long fix text unless full."""
+    item = {**issue, "index": index}
+    if not full:
+        item.pop("suggested_fix_desc", None)
+    return item
+
+def _int_arg(args, name, default):
+    """An integer query option; works on request.args and on plain dicts alike."""
+    try:
+        return int(args.get(name, default))
+    except (TypeError, ValueError):
+        return default
+
+def page_issues(issues, args):
+    """
+    One page of a result's issues, filtered by ?severity=, ?type= and ?file= (all optional),
+    with paging by ?offset= and ?limit=. counts are per severity over all issues, for the header.
+    """
+    severity = (args.get('severity') or "").upper()
+    issue_type = args.get('type')
+    file_name = args.get('file')
+    offset = max(_int_arg(args, 'offset', 0), 0)
+    limit = min(max(_int_arg(args, 'limit', ISSUE_PAGE_SIZE), 1), 500)
+    full = _flag(args.get('full'))
+
+    matching = [(i, issue) for i, issue in enumerate(issues)
+                if (not severity or issue.get('severity') == severity)
+                and (not issue_type or issue.get('type') == issue_type)
+                and (not file_name or issue.get('file') == file_name)]
+    counts = {}
+    for issue in issues:
+        counts[issue.get('severity', 'INFO')] = counts.get(issue.get('severity', 'INFO'), 0) + 1
+    return {
+        "issues": [_compact_issue(issue, i, full) for i, issue in matching[offset:offset + limit]],
+        "total": len(matching),
+        "offset": offset,
+        "limit": limit,
+        "next_offset": offset + limit if offset + limit < len(matching) else None,
+        "counts": counts,
+    }
+
+def first_page(job):
+    """
+    A finished job's result with only the first page of issues, as sent in the "done" event and
+    by /jobs/<job_id>; the UI fetches the rest lazily from /jobs/<job_id>/issues.
+    """
+    if 'issues' not in (job.result or {}):
+        return job.result
+    page = page_issues(job.result['issues'], {})
+    return {**job.result, "job_id": job.id, "issues": page["issues"], "total_issues": page["total"],
+            "next_offset": page["next_offset"], "counts": page["counts"], "issues_url": f"/jobs/{job.id}/issues"}
+
+def finish_analysis(raw_response, path, model):
+    """Parses a raw AI response into the JSON shape returned to the UI and saves it to the history store."""
+    structured_data = parse_ai_response(raw_response)
+    structured_data['analysis_id'] = main.record_history(path, os.path.isdir(path), model, structured_data) # Adds issue ids
+    structured_data['path'] = path # Return path for context
+    structured_data['is_folder'] = os.path.isdir(path)
+    structured_data['cache'] = main.get_response_cache().stats()
+    return structured_data
+
+def run_analysis_job(path, model, incremental=False, parallel=False, prescan="off", since=None, on_chunk=None, use_cache=True):
+    """
+    Job body for /analyze and /analyze/stream: runs the engine and returns the structured result
+    (raises on AI errors). on_chunk receives the response text as it streams in.
+    use_cache=False ("no_cache": true in the request) always calls the provider, like the CLI's --no-cache.
+    """
+    main.start_trace() # So the history entry records the provider and model that actually answered
+    keys = main.get_api_keys()
+    
+    # Check if folder or file
+    is_folder = os.path.isdir(path)
+    
+    # Use the refactored analyze_path function
+    raw_response = main.analyze_path(path, model, keys, is_folder=is_folder, use_cache=use_cache, incremental=incremental, parallel=parallel,
+                                     prescan=prescan, since=since, on_chunk=on_chunk)
+    
+    if raw_response.strip().startswith("[") and "ERROR" in raw_response:
+        raise RuntimeError(raw_response)
+    
+    # Parse the structured AI response into JSON
+    return finish_analysis(raw_response, path, model)
+
 @app.route('/analyze', methods=['POST'])
 def analyze():
+    """Queues an analysis and returns its job id immediately; poll /jobs/<job_id> for the result."""
     data = request.json
-    path = data.get('path')
-    if path:
-        path = path.strip().strip('"').strip("'")
+    path = _clean_path(data.get('path'))
+    model = data.get('model', 'openai')
+    
+    if not path:
+        return jsonify({"error": "Path is required"}), 400
+
+    try:
+        job = JOBS.submit(
+            lambda: run_analysis_job(path, model, incremental=_flag(data.get('incremental')), parallel=_flag(data.get('parallel')),
+                                     prescan=_prescan_mode(data.get('prescan')), since=data.get('since') or None,
+                                     use_cache=not _flag(data.get('no_cache'))),
+            path=path, model=model,
+        )
+    except QueueFullError as e:
+        return jsonify({"error": str(e)}), 503
     
+    return jsonify({"job_id": job.id, "status": job.status, "status_url": f"/jobs/{job.id}"}), 202
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    job = JOBS.get(job_id)
+    if not job:
+        return jsonify({"error": "Unknown job id."}), 404
+    data = job.to_dict(include_result=False)
+    if job.result is not None:
+        data["result"] = first_page(job) # Further issues via /jobs/<job_id>/issues
+    return conditional_json(data)
+
+@app.route('/jobs/<job_id>/issues')
+def job_issues(job_id):
+    """
+    A page of a finished job's issues, e.g. /jobs/<id>/issues?severity=MINOR&file=src/a.py&offset=50&limit=50.
+    Each issue carries its "index" in the full result; suggested_fix_desc is left out unless ?full=1.
+    """
+    job = JOBS.get(job_id)
+    if not job:
+        return jsonify({"error": "Unknown job id."}), 404
+    if job.status != "done" or 'issues' not in (job.result or {}):
+        return jsonify({"error": "The analysis has not finished.", "status": job.status}), 409
+    return conditional_json(page_issues(job.result['issues'], request.args))
+
+@app.route('/analyze/stream', methods=['GET', 'POST'])
+def analyze_stream():
+    """
+    Server-Sent Events version of /analyze.
+    Events: "chunk" (partial text), "issue" (each issue once its block is complete),
+    then "done" (the job result plus its job_id) or "error".
+    """
+    data = request.get_json(silent=True) or request.args
+    path = _clean_path(data.get('path'))
     model = data.get('model', 'openai')
     
     if not path:
         return jsonify({"error": "Path is required"}), 400
 
+    events = queue.Queue()
+
+    # Runs on the same bounded worker pool as /analyze; chunks reach the response generator through the queue
     try:
-        # Call TestPilot Engine
-        keys = main.get_api_keys()
-        
-        # Check if folder or file
-        is_folder = os.path.isdir(path)
-        
-        # Use the refactored analyze_path function
-        raw_response = main.analyze_path(path, model, keys, is_folder=is_folder)
-        
-        if raw_response.strip().startswith("[") and "ERROR" in raw_response:
-             return jsonify({"error": raw_response}), 400
-        
-        # Parse the structured AI response into JSON
-        structured_data = parse_ai_response(raw_response)
-        structured_data['path'] = path # Return path for context
-        
-        # Store for apply-fix reference
-        global LATEST_ANALYSIS
-        LATEST_ANALYSIS = structured_data
-        
-        return jsonify(structured_data)
-    except Exception as e:
-        import traceback
-        traceback.print_exc()
-        return jsonify({"error": f"Server Error: {str(e)}"}), 500
+        job = JOBS.submit(
+            lambda: run_analysis_job(path, model, incremental=_flag(data.get('incremental')), parallel=_flag(data.get('parallel')),
+                                     prescan=_prescan_mode(data.get('prescan')), since=data.get('since') or None,
+                                     on_chunk=lambda text: events.put(("chunk", text)), use_cache=not _flag(data.get('no_cache'))),
+            on_done=lambda job: events.put(("finished", None)),
+            path=path, model=model,
+        )
+    except QueueFullError as e:
+        return jsonify({"error": str(e)}), 503
+
+    def generate():
+        issue_parser = IssueStreamParser()
+        while True:
+            kind, payload = events.get()
+            if kind == "chunk":
+                yield sse_event("chunk", {"text": payload})
+                for issue in issue_parser.feed(payload):
+                    yield sse_event("issue", issue)
+            elif job.status == "done":
+                yield sse_event("done", first_page(job))
+                return
+            else:
+                yield sse_event("error", {"error": job.error})
+                return
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/watch')
+def watch():
+    """
+    Server-Sent Events for watch mode on a folder: an "update" event with the whole project's result
+    (plus "changed" and "removed" file lists) after the first pass and after every debounced batch of
+    saves; only changed files are re-analyzed. The watch stops when the client disconnects.
+    """
+    path = _clean_path(request.args.get('path'))
+    model = request.args.get('model', 'openai')
+    if not path or not os.path.isdir(path):
+        return jsonify({"error": "Watch mode needs a folder path"}), 400
+
+    keys = main.get_api_keys()
+    events = queue.Queue()
+    stop = threading.Event()
+
+    def on_update(changed, removed, parsed):
+        events.put(("update", {**parsed, "path": path, "is_folder": True, "changed": sorted(changed), "removed": removed}))
+
+    def worker():
+        try:
+            error = main.watch_folder(path, model, keys, on_update=on_update, stop=stop)
+            if error:
+                events.put(("error", {"error": error}))
+        except Exception as e:
+            events.put(("error", {"error": f"Server Error: {e}"}))
+
+    threading.Thread(target=worker, daemon=True).start()
+
+    def generate():
+        try:
+            while True:
+                try:
+                    kind, payload = events.get(timeout=15)
+                except queue.Empty:
+                    yield ": keep-alive\n\n" # Lets a closed connection surface, which ends the watch
+                    continue
+                yield sse_event(kind, payload)
+                if kind == "error":
+                    return
+        finally:
+            stop.set()
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.route('/providers/health')
+def provider_health():
+    """Per-provider latency percentiles, error rates and circuit state, plus hedge/failover counts."""
+    return jsonify(main.get_router().stats())
+
+@app.route('/history')
+def history():
+    """Recent analyses, optionally only those of ?path=."""
+    if not main.HISTORY_ENABLED:
+        return jsonify({"error": "History is disabled (TESTPILOT_HISTORY=0)."}), 404
+    limit = min(request.args.get('limit', 50, type=int), 500)
+    return conditional_json({"analyses": main.get_history().analyses(path=_clean_path(request.args.get('path')), limit=limit)})
+
+@app.route('/issues')
+def issues_index():
+    """
+    Issues from the history index without re-running the model, e.g.
+    /issues?under=/repo/src&severity=CRITICAL. Filters: under, severity, type; paging: limit, offset.
+    """
+    if not main.HISTORY_ENABLED:
+        return jsonify({"error": "History is disabled (TESTPILOT_HISTORY=0)."}), 404
+    under = _clean_path(request.args.get('under'))
+    found = main.get_history().find_issues(
+        under=under,
+        severity=request.args.get('severity'),
+        issue_type=request.args.get('type'),
+        limit=min(request.args.get('limit', 200, type=int), 1000),
+        offset=max(request.args.get('offset', 0, type=int), 0),
+    )
+    return conditional_json({"issues": found, "counts": main.get_history().count_issues(under=under)})
+
+@app.route('/issues/<issue_id>')
+def issue_detail(issue_id):
+    issue = main.get_history().get_issue(issue_id) if main.HISTORY_ENABLED else None
+    if not issue:
+        return jsonify({"error": "Unknown issue id."}), 404
+    return conditional_json(issue)
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """
+    Prometheus text exposition: per-stage and per-route latency histograms,
+    provider bytes sent/received and call outcomes, and response cache lookups.
+    """
+    return Response(metrics.REGISTRY.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+@app.route('/cache/stats')
+def cache_stats():
+    return jsonify(main.get_response_cache().stats())
+
+def _fix_ref(fix):
+    return {"issue_id": fix.get("issue_id"), "issue_index": fix.get("issue_index")}
+
+def _resolve_fixes(data):
+    """
+    The issues an /apply-fix request names, as (fixes, unresolved, error).
+    Issues are looked up by stable id in the history store (issue_ids, or a single issue_id);
+    job_id + issue_indexes (or issue_index) is the fallback when history is off.
+    """
+    ids = data.get('issue_ids') or ([data['issue_id']] if data.get('issue_id') else [])
+    indexes = data.get('issue_indexes')
+    if indexes is None:
+        indexes = [data.get('issue_index')] if data.get('issue_index') is not None else []
+    fixes = []
+    unresolved = []
+
+    if ids and main.HISTORY_ENABLED:
+        history = main.get_history()
+        for position, issue_id in enumerate(ids):
+            index = indexes[position] if position < len(indexes) else None
+            issue = history.get_issue(issue_id)
+            if not issue:
+                unresolved.append(({"issue_id": issue_id, "issue_index": index}, "Unknown issue id. Please re-run analysis."))
+                continue
+            fixes.append({**issue, "issue_id": issue_id, "issue_index": index})
+        return fixes, unresolved, None
+
+    job = JOBS.get(data.get('job_id'))
+    if not job or job.status != "done" or 'issues' not in job.result:
+        return [], [], "No completed analysis found for this job. Please re-run analysis."
+    issues = job.result['issues']
+    for index in indexes:
+        if not isinstance(index, int) or not 0 <= index < len(issues):
+            unresolved.append(({"issue_id": None, "issue_index": index}, "Invalid issue index."))
+            continue
+        issue = issues[index]
+        target_file = job.result['path']
+        if os.path.isdir(target_file):
+            # Folder analyses only know the file when the issue came from a per-file ("## FILE:") section
+            target_file = os.path.join(target_file, issue['file']) if issue.get('file') else None
+        fixes.append({**issue, "file_path": target_file, "issue_id": issue.get('id'), "issue_index": index})
+    return fixes, unresolved, None
 
 @app.route('/apply-fix', methods=['POST'])
 def apply_fix():
-    data = request.json
-    file_path_arg = data.get('file_path') # This might be project path if folder mode
-    issue_index = data.get('issue_index')
-    
-    global LATEST_ANALYSIS
-    if not LATEST_ANALYSIS or 'issues' not in LATEST_ANALYSIS:
-        return jsonify({"success": False, "error": "No active analysis found. Please re-run analysis."}), 400
+    """
+    Applies one or many MINOR/INFO fixes in a single pass: each file is read once, its fixes are
+    placed as anchored search/replace hunks (conflicting or stale ones are skipped), and it is
+    written once, atomically. One backup snapshot covers the whole batch; see /apply-fix/undo.
+    """
+    fixes, unresolved, error = _resolve_fixes(request.json or {})
+    if error:
+        return jsonify({"success": False, "error": error}), 400
+    if not fixes and not unresolved:
+        return jsonify({"success": False, "error": "No issues selected."}), 400
 
     try:
-        issue = LATEST_ANALYSIS['issues'][issue_index]
-    except IndexError:
-        return jsonify({"success": False, "error": "Invalid issue index."}), 400
+        result = fixer.apply_fixes(fixes, main.BACKUP_DIR)
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)})
 
-    # Security / Integrity Check
-    if issue['severity'] in ['CRITICAL', 'MAJOR']:
-         return jsonify({"success": False, "error": "Cannot auto-fix CRITICAL or MAJOR issues. Please apply manually."}), 403
-    
-    if not issue.get('suggested_fix_code'):
-        return jsonify({"success": False, "error": "No code fix available for this issue."}), 400
+    applied = [_fix_ref(fix) for fix in result["applied"]]
+    skipped = [{**_fix_ref(fix), "reason": reason} for fix, reason in unresolved + result["skipped"]]
+    body = {"success": bool(applied), "applied": applied, "skipped": skipped, "files": result["files"], "backup": result["snapshot"]}
+    if applied:
+        body["message"] = f"Applied {len(applied)} fix(es) to {len(result['files'])} file(s)."
+    else:
+        body["error"] = skipped[0]["reason"] if len(skipped) == 1 else f"None of the {len(skipped)} fixes could be applied."
+    return jsonify(body)
 
-    code_to_apply = issue['suggested_fix_code']
-    
-    # Determine actual file to edit
-    # If folder analysis, we need to know WHICH file. 
-    # Current "analyze_path" output for folders might not explicitly tag every single issue with a filename in a machine-readable way 
-    # UNLESS the prompt enforces it per issue. 
-    # Looking at prompt: "Global Output: List of Issues". It doesn't strictly force "File: <name>" per issue.
-    # CRITICAL GAP: If analyzing a folder, we don't know which file to fix.
-    # FALLBACK: For MVP context, we will assume Single File Mode for auto-fix OR try to guess from description?
-    # BETTER: If folder mode, we disable auto-fix in UI or check if file path is part of issue.
-    # Let's check constraints: "If a suggested fix cannot be applied with HIGH CONFIDENCE... DO NOT APPLY IT."
-    
-    target_file = file_path_arg
-    
-    # If input was a folder, we need the specific file.
-    if os.path.isdir(file_path_arg):
-        # We can't safely know the file without more parsing logic or prompt change.
-        return jsonify({"success": False, "error": "Auto-fix in Folder Mode is not supported in this version (Target file ambiguous)."}), 400
-
-    # Backup
-    if not os.path.exists(target_file):
-        return jsonify({"success": False, "error": "Target file not found."}), 404
-        
-    backup_path = target_file + ".bak"
-    shutil.copy2(target_file, backup_path)
-    
-    # Apply Strategy: Strict Match Replacement
-    # Since we can't do fuzzy matching safely, we will try:
-    # 1. READ file
-    # 2. CHECK if `code_to_apply` looks like a replacement block?
-    # The prompt says "Suggested Fix... Presented clearly as a code snippet".
-    # It doesn't say "Search Block" and "Replace Block".
-    # Most likely the AI returns just the NEW code.
-    # If the AI returns just the new function, we might APPEND it?
-    # Or if it returns the whole fixed function?
-    # Constraint: "The fix is either: A direct string replacement... OR An explicit append instruction"
-    # To be SAFE: We will attempt to Append to end of file if it looks like a new function/block.
-    # If it looks like a modification, we will REJECT IT for Manual Application unless we implement a diff patcher.
-    # Given MVP constraints: We will try to APPEND if file doesn't contain it, OR return "Manual Required" if ambiguous.
-    
-    # Let's try a simple APPEND approach for now (common for 'missing function' fixes).
-    
+@app.route('/apply-fix/undo', methods=['POST'])
+def undo_fix_batch():
+    """Restores every file changed by one /apply-fix batch from its backup snapshot."""
+    backup = (request.json or {}).get('backup')
     try:
-        with open(target_file, "r", encoding="utf-8") as f:
-            content = f.read()
-            
-        # Check if code already exists (duplicates)
-        if code_to_apply.strip() in content:
-             return jsonify({"success": False, "error": "Fix seems to already exist in file."})
-
-        # Append
-        with open(target_file, "a", encoding="utf-8") as f:
-            f.write("\n\n" + code_to_apply + "\n")
-            
-        return jsonify({"success": True, "message": "Fix appended to file."})
-        
-    except Exception as e:
+        restored = fixer.restore_snapshot(main.BACKUP_DIR, backup)
+    except (ValueError, FileNotFoundError):
+        return jsonify({"success": False, "error": "Unknown backup."}), 404
+    except OSError as e:
         return jsonify({"success": False, "error": str(e)})
+    return jsonify({"success": True, "restored": restored})
 
 
-def parse_ai_response(text):
+class IssueStreamParser:
     """
-    Parses the Markdown-formatted AI response into a dict.
+    Incremental companion to parse_ai_response for streamed text.
+    Complete lines go straight into a MarkdownParser, so each character is parsed once;
+    feed() returns the issues that closed because the next issue (or a trailing section) started.
+    JSON-mode streams yield nothing here and are parsed in full once done.
     """
-    cleaned_text = re.sub(r'\x1b\[[0-9;]*m', '', text) # Remove color codes if any
-    
-    # Extract Sections
-    summary_match = re.search(r'(?:\*\*Problem Summary:\*\*|Problem Summary)([\s\S]*?)(?=(?:\*\*List of Issues|\*\*Issues|Issues:))', cleaned_text, re.IGNORECASE)
-    summary = summary_match.group(1).strip() if summary_match else ""
-    
-    issues = []
-    # Regex to find issue blocks. 
-    # We look for "Issue Description" or numbered items
-    issue_blocks = re.split(r'\d+\.\s+\*\*Issue Description\*\*:', cleaned_text)
-    
-    if len(issue_blocks) < 2:
-        # Try alternative format if numbers are missing or different headers
-        issue_blocks = re.split(r'\*\*Issue Description\*\*:', cleaned_text)
-
-    for block in issue_blocks[1:]: # Skip preamble
-        issue = {}
-        
-        # Extract fields
-        desc_match = re.search(r'(.*?)(?=\n\s*- \*\*Type\*\*|\n\s*- \*\*Severity\*\*)', block, re.DOTALL)
-        issue['description'] = desc_match.group(1).strip() if desc_match else "N/A"
-        
-        type_match = re.search(r'\*\*Type\*\*:\s*(.*)', block)
-        issue['type'] = type_match.group(1).strip() if type_match else "Unknown"
-        
-        sev_match = re.search(r'\*\*Severity\*\*:\s*([A-Z]+)', block)
-        issue['severity'] = sev_match.group(1).strip() if sev_match else "INFO"
-        
-        conf_match = re.search(r'\*\*Confidence\*\*:\s*(\d+)%', block)
-        issue['confidence'] = conf_match.group(1).strip() if conf_match else "0"
-        
-        root_match = re.search(r'\*\*Root Cause\*\*:\s*(.*?)(?=\n\s*- \*\*Fix\*\*)', block, re.DOTALL)
-        issue['root_cause'] = root_match.group(1).strip() if root_match else "N/A"
-        
-        fix_match = re.search(r'\*\*Fix\*\*:\s*(.*?)(?=\n\s*- \*\*Suggested Fix)', block, re.DOTALL)
-        issue['fix'] = fix_match.group(1).strip() if fix_match else "N/A"
-        
-        suggest_match = re.search(r'\*\*Suggested Fix \(Optional\)\*\*:(.*)', block, re.DOTALL)
-        if suggest_match:
-            raw_suggestion = suggest_match.group(1).strip()
-            issue['suggested_fix_desc'] = raw_suggestion
-            
-            # Extract Code Block if present
-            code_block_match = re.search(r'```(?:\w+)?\n([\s\S]*?)\n```', raw_suggestion)
-            if code_block_match:
-                issue['suggested_fix_code'] = code_block_match.group(1)
-            else:
-                 issue['suggested_fix_code'] = None
-        else:
-             issue['suggested_fix'] = False
 
-        issues.append(issue)
+    def __init__(self):
+        self.parser = MarkdownParser()
+        self.pending = ""
+        self.emitted = 0
 
-    return {
-        "summary": summary,
-        "issues": issues
-    }
+    def feed(self, chunk):
+        self.pending += chunk
+        cut = self.pending.rfind("\n") + 1
+        if cut:
+            self.parser.feed(self.pending[:cut])
+            self.pending = self.pending[cut:]
+        new_issues = self.parser.issues[self.emitted:]
+        self.emitted += len(new_issues)
+        return new_issues
+
+def parse_ai_response(text):
+    """
+    Parses the AI response into {"summary", "issues", "notes"}.
+    JSON-mode responses are validated directly; markdown ones go through the single-pass parser.
+    """
+    return parse_response(text)
 
 if __name__ == '__main__':
     app.run(port=5000, debug=True)
@@ -0,0 +1,231 @@
+import os
+import re
+import stat
+from concurrent.futures import ThreadPoolExecutor
+
+# Dependency and build-output directories that never contain code worth sending to the AI. Names that are
+# also common source folders (bin, env, out, obj) are left to .gitignore; virtualenvs of any name are
+# recognized by their pyvenv.cfg
+DEFAULT_EXCLUDED_DIRS = {
+    "node_modules", "bower_components", "__pycache__", "venv", "site-packages",
+    "build", "dist", "target", "coverage", "htmlcov", "vendor",
+}
+MAX_FILE_BYTES = 512 * 1024   # Larger files are almost always generated or minified
+SNIFF_BYTES = 8192            # Leading bytes checked for NUL to detect binaries
+READ_WORKERS = 8
+
+
+class GitignoreRule:
+    """One .gitignore pattern, matched against '/'-separated paths relative to the .gitignore's directory."""
+
+    def __init__(self, pattern):
+        self.negate = pattern.startswith("!")
+        if self.negate:
+            pattern = pattern[1:]
+        self.dir_only = pattern.endswith("/")
+        pattern = pattern.rstrip("/")
+        # A slash anywhere but the end anchors the pattern to the .gitignore's directory
+        anchored = "/" in pattern
+        pattern = pattern.lstrip("/")
+        body = _translate(pattern)
+        self.regex = re.compile(("^" if anchored else r"^(?:.*/)?") + body + "$")
+
+    def matches(self, rel_path, is_dir):
+        if self.dir_only and not is_dir:
+            return False
+        return bool(self.regex.match(rel_path))
+
+
+def _translate(pattern):
+    """Converts a gitignore glob into a regex fragment."""
+    out = []
+    i = 0
+    while i < len(pattern):
+        c = pattern[i]
+        if pattern.startswith("**/", i):
+            out.append(r"(?:.*/)?")
+            i += 3
+        elif pattern.startswith("/**", i):
+            out.append(r"/.*")
+            i += 3
+        elif pattern.startswith("**", i):
+            out.append(r".*")
+            i += 2
+        elif c == "*":
+            out.append(r"[^/]*")
+            i += 1
+        elif c == "?":
+            out.append(r"[^/]")
+            i += 1
+        elif c == "[":
+            end = pattern.find("]", i + 1)
+            if end == -1:
+                out.append(re.escape(c))
+                i += 1
+            else:
+                cls = pattern[i + 1:end].replace("\\", "\\\\")
+                if cls.startswith("!"):
+                    cls = "^" + cls[1:]
+                out.append(f"[{cls}]")
+                i = end + 1
+        elif c == "\\" and i + 1 < len(pattern):
+            out.append(re.escape(pattern[i + 1]))
+            i += 2
+        else:
+            out.append(re.escape(c))
+            i += 1
+    return "".join(out)
+
+
+def load_gitignore(dir_path):
+    """Parses dir_path/.gitignore into rules (empty list if there is none)."""
+    try:
+        with open(os.path.join(dir_path, ".gitignore"), "r", encoding="utf-8", errors="ignore") as f:
+            lines = f.read().splitlines()
+    except OSError:
+        return []
+    rules = []
+    for line in lines:
+        line = line.rstrip()
+        if not line or line.startswith("#"):
+            continue
+        rules.append(GitignoreRule(line))
+    return rules
+
+
+def _is_ignored(rule_sets, rel_parts, is_dir):
+    """
+    Applies every .gitignore from the root down to the entry's directory.
+    rule_sets holds (depth, rules) pairs; later matches win, so `!pattern` can re-include.
+    """
+    ignored = False
+    for depth, rules in rule_sets:
+        rel_path = "/".join(rel_parts[depth:])
+        for rule in rules:
+            if rule.matches(rel_path, is_dir):
+                ignored = not rule.negate
+    return ignored
+
+
+def is_excluded_dir(dir_path, excluded_dirs=DEFAULT_EXCLUDED_DIRS):
+    """True for hidden, dependency and build directories, and for virtualenvs (which hold a pyvenv.cfg)."""
+    name = os.path.basename(dir_path.rstrip(os.sep))
+    return name.startswith(".") or name in excluded_dirs or os.path.isfile(os.path.join(dir_path, "pyvenv.cfg"))
+
+
+def walk_project(root, extensions=None, max_bytes=MAX_FILE_BYTES, excluded_dirs=DEFAULT_EXCLUDED_DIRS):
+    """
+    Yields (file_path, rel_path, stat) for code files under root, in sorted order.
+    Skips hidden and excluded directories, anything matched by .gitignore files,
+    files whose extension is not in `extensions`, and files larger than max_bytes.
+    """
+    stack = [(root, (), [])]
+    while stack:
+        dir_path, rel_parts, rule_sets = stack.pop()
+        rules = load_gitignore(dir_path)
+        if rules:
+            rule_sets = rule_sets + [(len(rel_parts), rules)]
+        try:
+            with os.scandir(dir_path) as it:
+                entries = sorted(it, key=lambda e: e.name)
+        except OSError as e:
+            print(f"[WARN] Skipped folder {dir_path}: {e}")
+            continue
+
+        subdirs = []
+        for entry in entries:
+            name = entry.name
+            parts = rel_parts + (name,)
+            try:
+                is_dir = entry.is_dir(follow_symlinks=False)
+            except OSError:
+                continue
+            if is_dir:
+                if is_excluded_dir(entry.path, excluded_dirs) or _is_ignored(rule_sets, parts, True):
+                    continue
+                subdirs.append((entry.path, parts, rule_sets))
+                continue
+
+            if extensions is not None and os.path.splitext(name)[1].lower() not in extensions:
+                continue
+            if _is_ignored(rule_sets, parts, False):
+                continue
+            try:
+                st = entry.stat()
+            except OSError:
+                continue
+            if st.st_size > max_bytes:
+                print(f"[WARN] Skipped file {os.path.join(*parts)}: larger than {max_bytes // 1024} KB")
+                continue
+            yield entry.path, os.path.join(*parts), st
+
+        stack.extend(reversed(subdirs)) # Keep depth-first, alphabetical order
+
+
+def is_project_file(root, rel_path, extensions=None, max_bytes=MAX_FILE_BYTES, excluded_dirs=DEFAULT_EXCLUDED_DIRS):
+    """
+    True if walk_project(root, ...) would yield rel_path. Checks the one path (its directories'
+    .gitignore files included) without walking the tree; watch mode uses it to filter change events.
+    """
+    parts = tuple(part for part in rel_path.replace(os.sep, "/").split("/") if part)
+    if not parts:
+        return False
+    if extensions is not None and os.path.splitext(parts[-1])[1].lower() not in extensions:
+        return False
+    if any(is_excluded_dir(os.path.join(root, *parts[:depth + 1]), excluded_dirs) for depth in range(len(parts) - 1)):
+        return False
+    rule_sets = []
+    dir_path = root
+    for depth in range(len(parts)):
+        rules = load_gitignore(dir_path)
+        if rules:
+            rule_sets.append((depth, rules))
+        if depth < len(parts) - 1:
+            if _is_ignored(rule_sets, parts[:depth + 1], True):
+                return False
+            dir_path = os.path.join(dir_path, parts[depth])
+    if _is_ignored(rule_sets, parts, False):
+        return False
+    try:
+        st = os.stat(os.path.join(root, *parts))
+    except OSError:
+        return False
+    return stat.S_ISREG(st.st_mode) and st.st_size <= max_bytes
+
+
+def read_text_file(file_path):
+    """
+    Returns the file's text, or None if it looks binary (NUL bytes in the first SNIFF_BYTES)
+    or is not valid UTF-8. Binaries are rejected after reading only the sniff window.
+    """
+    with open(file_path, "rb") as f:
+        data = f.read(SNIFF_BYTES)
+        if b"\0" in data:
+            return None
+        data += f.read()
+    try:
+        return data.decode("utf-8")
+    except UnicodeDecodeError:
+        return None
+
+
+def collect_files(root, extensions=None, max_bytes=MAX_FILE_BYTES, max_workers=READ_WORKERS):
+    """Walks the project and reads every file on a thread pool. Returns [(rel_path, content), ...] in walk order."""
+    found = [(file_path, rel_path) for file_path, rel_path, _ in walk_project(root, extensions, max_bytes)]
+
+    def read(item):
+        file_path, rel_path = item
+        try:
+            content = read_text_file(file_path)
+        except Exception as e:
+            print(f"[WARN] Skipped file {rel_path}: {e}")
+            return None
+        if content is None:
+            print(f"[WARN] Skipped file {rel_path}: binary or not UTF-8")
+            return None
+        return rel_path, content
+
+    if not found:
+        return []
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(found)))) as pool:
+        return [item for item in pool.map(read, found) if item]
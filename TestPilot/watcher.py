@@ -0,0 +1,179 @@
+import os
+import sys
+import time
+import errno
+import select
+import struct
+import ctypes
+import ctypes.util
+
+from walker import is_excluded_dir, walk_project
+
+# inotify(7) event bits
+IN_CLOSE_WRITE = 0x8
+IN_MOVED_FROM = 0x40
+IN_MOVED_TO = 0x80
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_DELETE_SELF = 0x400
+IN_Q_OVERFLOW = 0x4000
+IN_IGNORED = 0x8000
+IN_ISDIR = 0x40000000
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+EVENT_HEADER = struct.Struct("iIII")  # wd, mask, cookie, len
+
+
+class PollingWatcher:
+    """
+    Portable fallback: re-stats the project every `interval` seconds and reports files whose
+    size or mtime changed, or that appeared or disappeared. Costs one stat per file per poll.
+    """
+
+    name = "polling"
+
+    def __init__(self, root, extensions=None, interval=1.0):
+        self.root = root
+        self.extensions = extensions
+        self.interval = interval
+        self.snapshot = self._scan()
+
+    def _scan(self):
+        return {rel_path: (st.st_size, st.st_mtime_ns) for _, rel_path, st in walk_project(self.root, self.extensions)}
+
+    def wait(self, timeout):
+        """Changed relative paths after at most `timeout` seconds (an empty set if nothing changed)."""
+        time.sleep(min(timeout, self.interval))
+        current = self._scan()
+        changed = {rel_path for rel_path, sig in current.items() if self.snapshot.get(rel_path) != sig}
+        changed.update(set(self.snapshot) - set(current))
+        self.snapshot = current
+        return changed
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher:
+    """
+    Linux watcher on inotify(7) through libc, so there is no extra dependency. Every project
+    directory gets a watch (new ones as they appear); events are reported as relative paths.
+    wait() returns None when the kernel queue overflowed and the caller should rescan everything.
+    Raises OSError if inotify is unavailable or the watch limit is reached.
+    """
+
+    name = "inotify"
+
+    def __init__(self, root, extensions=None):
+        if not sys.platform.startswith("linux"):
+            raise OSError(errno.ENOSYS, "inotify is only available on Linux")
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        if not hasattr(libc, "inotify_init1"):
+            raise OSError(errno.ENOSYS, "libc has no inotify support")
+        self._libc = libc
+        self.root = os.path.abspath(root)
+        self.extensions = extensions
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.dirs = {}  # wd -> directory path relative to root ("" for the root)
+        try:
+            self._add_tree(self.root)
+        except OSError:
+            self.close()
+            raise
+
+    def _add_watch(self, dir_path):
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(dir_path), WATCH_MASK)
+        if wd < 0:
+            err = ctypes.get_errno()
+            if err in (errno.ENOENT, errno.ENOTDIR, errno.EACCES):
+                return  # Gone or unreadable; nothing to watch
+            raise OSError(err, f"inotify_add_watch failed for {dir_path}: {os.strerror(err)}")
+        self.dirs[wd] = os.path.relpath(dir_path, self.root) if dir_path != self.root else ""
+
+    def _add_tree(self, top):
+        """Watches `top` and the directories below it that walk_project would enter."""
+        for dir_path, dir_names, _ in os.walk(top):
+            dir_names[:] = [d for d in dir_names if not is_excluded_dir(os.path.join(dir_path, d))]
+            self._add_watch(dir_path)
+
+    def _files_under(self, rel_dir):
+        return {os.path.join(rel_dir, rel_path) for _, rel_path, _ in walk_project(os.path.join(self.root, rel_dir), self.extensions)}
+
+    def wait(self, timeout):
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return set()
+        changed = set()
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                return changed
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+                name = data[offset + EVENT_HEADER.size:offset + EVENT_HEADER.size + length].rstrip(b"\0")
+                offset += EVENT_HEADER.size + length
+                if mask & IN_Q_OVERFLOW:
+                    return None
+                if mask & IN_IGNORED:
+                    self.dirs.pop(wd, None)
+                    continue
+                rel_dir = self.dirs.get(wd)
+                if rel_dir is None or not name:
+                    continue
+                rel_path = os.path.join(rel_dir, os.fsdecode(name))
+                if mask & IN_ISDIR:
+                    if is_excluded_dir(os.path.join(self.root, rel_path)):
+                        continue
+                    if mask & (IN_CREATE | IN_MOVED_TO):
+                        # A new or moved-in folder: watch it and report what it already holds
+                        self._add_tree(os.path.join(self.root, rel_path))
+                        changed.update(self._files_under(rel_path))
+                    else:
+                        changed.add(rel_path + os.sep) # Removed folder: the caller drops files under it
+                    continue
+                if self.extensions is None or os.path.splitext(rel_path)[1].lower() in self.extensions:
+                    changed.add(rel_path)
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+def open_watcher(root, extensions=None, backend="auto", poll_interval=1.0):
+    """inotify where available (backend "auto" or "inotify"), otherwise polling."""
+    if backend in ("auto", "inotify"):
+        try:
+            return InotifyWatcher(root, extensions)
+        except OSError as e:
+            if backend == "inotify":
+                raise
+            print(f"[WATCH] inotify unavailable ({e}); polling every {poll_interval:g}s")
+    return PollingWatcher(root, extensions, poll_interval)
+
+
+def watch_changes(watcher, debounce=0.5, max_delay=None, stop=None, tick=0.5):
+    """
+    Yields sets of changed relative paths, debounced: after the first event, changes keep being
+    collected until nothing happens for `debounce` seconds (or `max_delay` passes, so a
+    constantly busy tree still gets updates). A yielded None means "rescan everything".
+    A path ending in os.sep is a removed folder. Ends when `stop` (a threading.Event) is set.
+    """
+    max_delay = max_delay if max_delay is not None else max(5.0, debounce * 10)
+    while not (stop and stop.is_set()):
+        changed = watcher.wait(tick)
+        if changed is not None and not changed:
+            continue
+        deadline = time.monotonic() + max_delay
+        while changed is not None and time.monotonic() < deadline:
+            more = watcher.wait(debounce)
+            if more is None:
+                changed = None
+            elif more:
+                changed |= more
+            else:
+                break
+        yield changed
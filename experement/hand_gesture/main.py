@@ -4,12 +4,12 @@ from src.hand_detector import HandDetector
 from src.gesture_recognizer import GestureRecognizer
 from src.action_controller import ActionController
 from src.state_machine import StateMachine
+from src.frame_source import ThreadedCapture
 
 def main():
     # 1. Init
-    cap = cv2.VideoCapture(0)
-    cap.set(3, 640) # Width
-    cap.set(4, 480) # Height
+    # Capture runs on its own thread; the loop below always gets the newest frame
+    capture = ThreadedCapture(0, width=640, height=480).start()
     
     detector = HandDetector(max_hands=2, detection_con=0.7)
     recognizer = GestureRecognizer()
@@ -18,48 +18,27 @@ def main():
     
     print("Hand Gesture Control Started. Press 'q' to exit.")
 
+    # Opening the camera can take several seconds (e.g. Windows MSMF/DSHOW backends)
+    timeout = 15.0
     while True:
-        success, img = cap.read()
+        success, img, captured_at = capture.read(timeout=timeout)
         if not success:
+            if capture.alive and capture.frames_processed:
+                continue # No new frame within the timeout; keep waiting
             print("Failed to read webcam.")
             break
+        timeout = 1.0
             
         # Flip image for mirror effect (natural interaction)
         img = cv2.flip(img, 1)
         
         # 2. Detect Hands
         img = detector.find_hands(img)
-        lm_list_all = []
         
-        # We need to associate landmarks with 'Left' or 'Right' hand accurately
-        # MediaPipe's multi_handedness gives us labels.
-        # Note: If we flipped the image, the label 'Left' usually means the user's Left hand 
-        # (which appears on the Left side of the screen now). 
-        # But let's rely on the detector's output mapping.
-        
-        # HandDetector.find_hands processes the image. 
-        # We can extract data now.
-        
-        landmarks_map = {} # 'Left' -> lm_list, 'Right' -> lm_list
-        
-        if detector.results.multi_hand_landmarks:
-            for idx, hand_handedness in enumerate(detector.results.multi_handedness):
-                label = hand_handedness.classification[0].label
-                # If we flipped the image, MP still thinks in original coordinates usually?
-                # Actually, if we pass the flipped image to MP, 'Left' label means 
-                # "This looks like a Left Hand". 
-                # If you hold up your left hand to a mirror, it looks like a right hand.
-                # MP is trained on selfie mode usually? 
-                # Let's just trust the label for now and debug if swapped.
-                
-                lm_list = []
-                my_hand = detector.results.multi_hand_landmarks[idx]
-                h, w, c = img.shape
-                for id, lm in enumerate(my_hand.landmark):
-                    cx, cy = int(lm.x * w), int(lm.y * h)
-                    lm_list.append([id, cx, cy])
-                
-                landmarks_map[label] = lm_list
+        # All hands' landmarks as one (hands, 21, 3) array, with MediaPipe's 'Left'/'Right'
+        # label for each (for the flipped image; trusted as-is, as before).
+        labels, hands = detector.get_landmark_array(img)
+        landmarks_map = dict(zip(labels, hands)) # 'Left' -> (21, 3) view, 'Right' -> (21, 3) view
 
         current_gesture_text = "None"
         triggered_action_text = ""
@@ -88,13 +67,12 @@ def main():
             active_hand_label = "Right" if "Right" in landmarks_map else ("Left" if "Left" in landmarks_map else None)
             
             if active_hand_label:
-                lm_list = landmarks_map[active_hand_label]
-                gesture_name = recognizer.recognize(lm_list, active_hand_label, landmarks_map)
+                hand = landmarks_map[active_hand_label]
+                gesture_name = recognizer.recognize(hand, active_hand_label, landmarks_map)
                 
                 if gesture_name == "Two Fingers":
                     # Extract cursor coordinates (Index Tip)
-                    index_x = lm_list[8][1]
-                    index_y = lm_list[8][2]
+                    index_x, index_y = float(hand[8, 0]), float(hand[8, 1])
                     # Normalize
                     h, w, _ = img.shape
                     norm_x = index_x / w
@@ -132,13 +110,20 @@ def main():
              cv2.putText(img, triggered_action_text, (10, 100), 
                     cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 255), 2)
 
+        # Capture-to-action latency of this frame, and frames skipped because processing was slower than the camera
+        latency_ms = (time.perf_counter() - captured_at) * 1000
+        cv2.putText(img, f"Latency: {latency_ms:.0f} ms  Dropped: {capture.frames_dropped}", (10, img.shape[0] - 15),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 0), 1)
+
         cv2.imshow("Hand Gesture Control (Press 'q' to exit)", img)
         
         if cv2.waitKey(1) & 0xFF == ord('q'):
             break
 
-    cap.release()
+    capture.stop()
     cv2.destroyAllWindows()
+    stats = capture.stats()
+    print(f"Frames: {stats['captured']} captured, {stats['processed']} processed, {stats['dropped']} dropped")
 
 if __name__ == "__main__":
     main()
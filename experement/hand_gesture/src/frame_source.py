@@ -0,0 +1,89 @@
+import cv2
+import time
+import threading
+from collections import deque
+
+class ThreadedCapture:
+    """
+    Reads the webcam on its own thread so a slow processing step never leaves
+    frames queued up in the camera driver. Only the newest few frames are kept
+    in a small ring buffer; read() always hands out the latest one and counts
+    every frame that was overwritten before the loop got to it as dropped.
+    """
+    def __init__(self, src=0, width=640, height=480, buffer_size=2):
+        self.cap = cv2.VideoCapture(src)
+        self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+        self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+        # Ask the backend to keep at most one frame itself (ignored by some drivers)
+        self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+
+        self.frames = deque(maxlen=buffer_size) # (seq, captured_at, frame)
+        self.cond = threading.Condition()
+        self.running = False
+        self.failed = False
+        self.thread = None
+
+        # Counters
+        self.frames_captured = 0
+        self.frames_processed = 0
+        self.frames_dropped = 0
+        self.last_seq = 0 # Sequence number of the last frame handed to the loop
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self._update, name="capture", daemon=True)
+        self.thread.start()
+        return self
+
+    def _update(self):
+        while self.running:
+            success, frame = self.cap.read()
+            with self.cond:
+                if not success:
+                    self.failed = True
+                    self.running = False
+                else:
+                    self.frames_captured += 1
+                    self.frames.append((self.frames_captured, time.perf_counter(), frame))
+                self.cond.notify_all()
+
+    @property
+    def alive(self):
+        """False once the camera failed or stop() was called; frames may still be buffered."""
+        return self.running and not self.failed
+
+    def read(self, timeout=1.0):
+        """
+        Waits up to `timeout` seconds for a frame newer than the last one returned and
+        returns (success, frame, captured_at). Never returns the same frame twice.
+        success is False on a timeout too; check `alive` to tell that from a dead camera.
+        """
+        deadline = time.perf_counter() + timeout
+        with self.cond:
+            while self.alive and (not self.frames or self.frames[-1][0] <= self.last_seq):
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    return False, None, None
+                self.cond.wait(remaining)
+            if not self.frames or self.frames[-1][0] <= self.last_seq:
+                return False, None, None
+            seq, captured_at, frame = self.frames[-1]
+            # Everything captured since the last read but never processed was skipped
+            self.frames_dropped += seq - self.last_seq - 1
+            self.frames_processed += 1
+            self.last_seq = seq
+            return True, frame, captured_at
+
+    def stats(self):
+        with self.cond:
+            return {
+                "captured": self.frames_captured,
+                "processed": self.frames_processed,
+                "dropped": self.frames_dropped,
+            }
+
+    def stop(self):
+        self.running = False
+        if self.thread:
+            self.thread.join(timeout=1.0)
+        self.cap.release()
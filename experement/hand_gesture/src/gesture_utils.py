@@ -1,55 +1,62 @@
 import math
 import numpy as np
 
+# Landmark ids
+WRIST = 0
+THUMB_IP, THUMB_TIP = 3, 4
+INDEX_MCP, INDEX_TIP = 5, 8
+MIDDLE_TIP = 12
+FINGER_TIPS = np.array([8, 12, 16, 20])  # Index .. Pinky
+FINGER_PIPS = np.array([6, 10, 14, 18])
+
+def landmarks_to_array(multi_hand_landmarks, img_shape):
+    """
+    Converts MediaPipe's hand landmarks into one float32 array of shape (hands, 21, 3)
+    in pixel units: x * width, y * height, z * width (MediaPipe scales z like x).
+    Done once per frame; everything below works on this array.
+    """
+    if not multi_hand_landmarks:
+        return np.empty((0, 21, 3), dtype=np.float32)
+    h, w = img_shape[:2]
+    points = np.array([[(lm.x, lm.y, lm.z) for lm in hand.landmark] for hand in multi_hand_landmarks], dtype=np.float32)
+    return points * np.array([w, h, w], dtype=np.float32)
+
 def calculate_distance(p1, p2):
-    """Calculates Euclidean distance between two points (x, y)."""
-    x1, y1 = p1[1], p1[2]
-    x2, y2 = p2[1], p2[2]
-    return math.hypot(x2 - x1, y2 - y1)
-
-def get_finger_states(lm_list):
-    """
-    Returns a list of 5 booleans [Thumb, Index, Middle, Ring, Pinky]
-    indicating if the finger is extended (True) or closed (False).
-    Based on landmark positions.
-    """
-    if not lm_list:
-        return []
-
-    fingers = []
-    
-    # Tips ids: 4, 8, 12, 16, 20
-    # Pip ids: 2, 6, 10, 14, 18 (Knuckles/Lower joints for reference)
-    
-    # Thumb: Check if tip is to the right/left of knuckle depending on hand side
-    # For simplicity in rule-based (assuming palm facing camera): 
-    # Compare x-coord of tip (4) vs IP joint (3)
-    # This logic changes based on Left/Right hand, simplified here to "outwards" check 
-    # or just checking vertical for simple thumbs up/down
-    
-    # Better generic approach for Thumb:
-    # Check simple distance from wrist vs index mcp? 
-    # Let's simple check x-axis for now. 
-    # NOTE: This is ambiguous without knowing handedness.
-    # We will let Gesture Logic handle the nuances of Thumb with handedness context.
-    # Here we just return coordinates or simple vertical checks for other fingers.
-    
-    # Fingers 2-5 (Index to Pinky)
-    # Check if Tip y < Pip y (assuming Hand is upright)
-    tips = [8, 12, 16, 20]
-    pips = [6, 10, 14, 18]
-    
-    # Thumbs logic usually handled specifically in recognizer, 
-    # but here is a simple placeholder. 
-    # We will skip thumb here and let recognizer handle it properly using handedness.
-    
-    for tip, pip in zip(tips, pips):
-        if lm_list[tip][2] < lm_list[pip][2]: # Y-axis inverted in image space
-            fingers.append(True)
-        else:
-            fingers.append(False)
-            
-    return fingers
+    """
+    Euclidean (x, y) distance between points of shape (..., 2+).
+    Works on single points or whole batches (e.g. the same landmark of every hand).
+    """
+    d = np.asarray(p1)[..., :2] - np.asarray(p2)[..., :2]
+    return np.hypot(d[..., 0], d[..., 1])
+
+def get_finger_states(hands):
+    """
+    Returns booleans [Index, Middle, Ring, Pinky] per hand, True if the finger is extended
+    (tip above its PIP joint; image y grows downwards). `hands` is (21, 3) or (hands, 21, 3);
+    the result is (4,) or (hands, 4). The thumb depends on handedness, see get_thumb_states.
+    """
+    hands = np.asarray(hands)
+    return hands[..., FINGER_TIPS, 1] < hands[..., FINGER_PIPS, 1]
+
+def get_thumb_states(hands, is_right):
+    """
+    True where the thumb is open: its tip is outwards of the IP joint along x
+    (left for a right hand facing the camera, right for a left hand).
+    is_right is a bool or a per-hand bool array.
+    """
+    hands = np.asarray(hands)
+    outwards = hands[..., THUMB_TIP, 0] - hands[..., THUMB_IP, 0]
+    return np.where(is_right, outwards < 0, outwards > 0)
+
+def palm_scale(hands):
+    """Wrist to index-MCP distance per hand; the reference length for size-independent thresholds."""
+    hands = np.asarray(hands)
+    return calculate_distance(hands[..., WRIST, :], hands[..., INDEX_MCP, :])
+
+def pinch_ratio(hands):
+    """Thumb tip to index tip distance per hand, relative to the palm scale."""
+    hands = np.asarray(hands)
+    return calculate_distance(hands[..., THUMB_TIP, :], hands[..., INDEX_TIP, :]) / np.maximum(palm_scale(hands), 1e-6)
 
 def normalize_distance(dist, img_shape):
     """Normalize distance by diagonal size of image to handle depth changes somewhat."""
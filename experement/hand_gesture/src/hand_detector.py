@@ -1,5 +1,6 @@
 import cv2
 import mediapipe as mp
+from .gesture_utils import landmarks_to_array
 
 class HandDetector:
     def __init__(self, max_hands=2, detection_con=0.7, track_con=0.5):
@@ -36,6 +37,15 @@ class HandDetector:
                     lm_list.append([id, cx, cy])
         return lm_list
 
+    def get_landmark_array(self, img):
+        """
+        Landmarks of every detected hand as one (hands, 21, 3) float array in pixel units,
+        plus the matching 'Left'/'Right' labels. Built once per frame from the last result.
+        """
+        if not self.results or not self.results.multi_hand_landmarks:
+            return [], landmarks_to_array(None, img.shape)
+        return self.get_handedness(), landmarks_to_array(self.results.multi_hand_landmarks, img.shape)
+
     def get_world_landmarks(self, hand_no=0):
         """Returns the world coordinates (meters) which are better for angles/relative distances independent of screen."""
         if self.results.multi_hand_world_landmarks: